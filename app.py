@@ -1,37 +1,62 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 import logging
+import multiprocessing
+import signal
+from dataclasses import dataclass, field
 from logging.handlers import RotatingFileHandler
+from multiprocessing.process import BaseProcess
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
 
 from aiogram import Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
 
-from config import config
+from config import Config, config
 from handlers import admin as admin_handlers
 from handlers import buy as buy_handlers
 from handlers import download as download_handlers
 from handlers import main_menu as main_menu_handlers
 from handlers import membership as membership_handlers
+from handlers.callbacks import CallbackRouter
+from handlers.middleware import install_latency
+from services import files
 from services.access import AccessService
 from services.admins import AdminService
+from services.aio import AsyncFacade, IOExecutor
 from services.alerts import AlertService
+from services.broadcast import BroadcastEngine, BroadcastStore
 from services.content import ContentService
+from services.latency import LatencyRegistry
+from services.media import MediaCache
 from services.metrics import MetricsService
 from services.payments import PaymentService
-from services.settings import SettingsService
+from services.remote import RemoteFacade, StorageClient, StorageServer
+from services.settings import SettingsService, apply_overrides
+from services.state import FacadeStorage, StateStore
 from services.storage import StorageService
 from services.users import UserService
 
+logger = logging.getLogger(__name__)
+
+STORAGE_SERVICES = ("settings", "content", "access", "storage", "metrics", "users", "alerts", "admins", "media", "broadcasts")
+
 
 def setup_directories(*paths: Path) -> None:
     for path in paths:
         path.mkdir(parents=True, exist_ok=True)
 
 
-def setup_logging(logs_dir: Path) -> None:
+def setup_logging(logs_dir: Path, filename: str = "app.log") -> None:
     logs_dir.mkdir(parents=True, exist_ok=True)
-    log_file = logs_dir / "app.log"
+    log_file = logs_dir / filename
     handler = RotatingFileHandler(log_file, maxBytes=5_000_000, backupCount=5, encoding="utf-8")
     logging.basicConfig(
         level=logging.INFO,
@@ -40,58 +65,380 @@ def setup_logging(logs_dir: Path) -> None:
     )
 
 
-async def main() -> None:
-    setup_directories(config.data_dir, config.logs_dir)
-    setup_logging(config.logs_dir)
+SETTINGS_REFRESH = 5.0
+BROADCAST_POLL = 2.0
+
+
+@dataclass(slots=True)
+class Application:
+    config: Config
+    bot: Bot
+    dp: Dispatcher
+    io: IOExecutor
+    settings: Any
+    broadcasts: BroadcastEngine
+    flushers: List[Callable[[], None]]
+    latency: LatencyRegistry = field(default_factory=LatencyRegistry)
+    storage_client: Optional[StorageClient] = None
+    worker: Optional[int] = None
+    background: List[asyncio.Task] = field(default_factory=list)
+    ready: bool = False
 
-    settings = SettingsService(config.settings_file)
-    settings.apply(config)
+    async def start(self) -> None:
+        interval = self.config.storage.snapshot_interval
+        self.background = [asyncio.create_task(self.io.every(interval, flush)) for flush in self.flushers]
+        textfile = self.config.monitoring.prometheus_textfile
+        if textfile is not None:
+            labels = {}
+            if self.worker is not None:
+                textfile = textfile.with_name(f"{textfile.stem}-worker{self.worker}{textfile.suffix}")
+                labels["worker"] = str(self.worker)
+            export = functools.partial(self.latency.write_textfile, textfile, labels)
+            self.background.append(asyncio.create_task(self.io.every(self.config.monitoring.prometheus_interval, export)))
+        if self.storage_client is not None:
+            self.background.append(asyncio.create_task(self._follow_settings()))
+            if self.primary:
+                self.background.append(asyncio.create_task(self.broadcasts.watch(BROADCAST_POLL)))
+        elif self.primary:
+            await self.broadcasts.resume()
 
-    content_service = ContentService(config.content_file)
-    access_service = AccessService(config.access_file)
-    storage_service = StorageService(config.purchases_file, config.orders_file, config.ledger_file)
-    metrics_service = MetricsService(config.metrics_file)
-    user_service = UserService(config.users_file)
-    alert_service = AlertService(config.alerts_file)
-    admin_service = AdminService(config.admin_file, config.admin_ids)
+    @property
+    def primary(self) -> bool:
+        return self.worker in (None, 0)
 
-    bot = Bot(token=config.bot_token, parse_mode="HTML")
-    payment_service = PaymentService(bot, config, storage_service, access_service, metrics_service, user_service)
+    async def _follow_settings(self) -> None:
+        """Workers pick up price/URL/sales changes made through another worker."""
+        while True:
+            await asyncio.sleep(SETTINGS_REFRESH)
+            try:
+                apply_overrides(self.config, await self.settings.overrides())
+            except Exception:
+                logger.warning("Не вдалося оновити налаштування зі сховища", exc_info=True)
 
-    faq_text = content_service.get_faq()
+    async def stop(self) -> None:
+        self.ready = False
+        await self.broadcasts.stop()
+        for task in self.background:
+            task.cancel()
+        await asyncio.gather(*self.background, return_exceptions=True)
+        self.io.shutdown()
+        for flush in self.flushers:
+            flush()
+        if self.storage_client is not None:
+            await self.storage_client.close()
+        await self.bot.session.close()
+
+
+def create_services(config: Config) -> Tuple[Dict[str, Any], List[Callable[[], None]]]:
+    """Synchronous services by name, plus the flushes to run periodically and on shutdown."""
+    files.set_fsync_policy(config.storage.fsync_policy)
+    files.set_append_max_delay(config.storage.append_max_delay)
+    files.set_document_cache_interval(config.storage.doc_cache_interval)
+    if config.storage.doc_cache_inotify:
+        files.enable_document_inotify()
+    files.set_io_stats(config.storage.io_stats)
+
+    if config.storage.backend == "sqlite":
+        from services import sqlite_backend
+
+        database = sqlite_backend.Database(config.sqlite_file, fsync_policy=config.storage.fsync_policy)
+        access_service = sqlite_backend.SqliteAccessService(database)
+        storage_service = sqlite_backend.SqliteStorageService(database)
+        metrics_service = sqlite_backend.SqliteMetricsService(database)
+        user_service = sqlite_backend.SqliteUserService(database)
+        alert_service = sqlite_backend.SqliteAlertService(database)
+    else:
+        access_service = AccessService(config.access_file)
+        storage_service = StorageService(
+            config.purchases_file,
+            config.orders_file,
+            config.ledger_file,
+            config.balances_file,
+            segment_max_bytes=config.storage.segment_max_bytes,
+            segment_max_age=config.storage.segment_max_age,
+        )
+        metrics_service = MetricsService(
+            config.metrics_file,
+            unique_dir=config.unique_users_dir,
+            unique_mode=config.storage.unique_mode,
+        )
+        user_service = UserService(config.users_dir, shards=config.storage.user_shards, legacy_file=config.users_file)
+        alert_service = AlertService(config.alerts_file)
 
-    dp = Dispatcher()
+    services = {
+        "settings": SettingsService(config.settings_file),
+        "content": ContentService(config.content_file),
+        "access": access_service,
+        "storage": storage_service,
+        "metrics": metrics_service,
+        "users": user_service,
+        "alerts": alert_service,
+        "admins": AdminService(config.admin_file, config.admin_ids),
+        "media": MediaCache(config.media_cache_file),
+        "broadcasts": BroadcastStore(config.broadcasts_dir),
+    }
+    flushers = [user_service.flush, storage_service.flush, metrics_service.flush, access_service.flush]
+    if config.storage.io_stats:
+        flushers.append(functools.partial(files.dump_io_stats, config.storage.io_stats_file))
+    return services, flushers
+
+
+def _create_bot(config: Config) -> Bot:
+    server = config.server
+    session = AiohttpSession(api=TelegramAPIServer.from_base(server.bot_api_url)) if server.bot_api_url else None
+    return Bot(token=config.bot_token, session=session, default=DefaultBotProperties(parse_mode="HTML"))
+
+
+def _assemble(
+    config: Config,
+    services: Mapping[str, Any],
+    io: IOExecutor,
+    faq_text: str,
+    *,
+    flushers: List[Callable[[], None]],
+    fsm: Optional[BaseStorage] = None,
+    storage_client: Optional[StorageClient] = None,
+    worker: Optional[int] = None,
+) -> Application:
+    content = services["content"]
+    access = services["access"]
+    storage = services["storage"]
+    metrics = services["metrics"]
+    users = services["users"]
+    alerts = services["alerts"]
+    admins = services["admins"]
+
+    bot = _create_bot(config)
+    payment_service = PaymentService(bot, config, storage, access, metrics, users)
+    broadcasts = BroadcastEngine(
+        bot,
+        services["broadcasts"],
+        users,
+        alerts,
+        rate=config.broadcast.rate,
+        workers=config.broadcast.workers,
+        runner=worker in (None, 0),
+    )
+
+    dp = Dispatcher(storage=fsm)
+    latency = LatencyRegistry()
+    install_latency(dp, latency)
+    callbacks = CallbackRouter()
 
     dp.include_router(
         main_menu_handlers.create_router(
             config=config,
-            content=content_service,
-            users=user_service,
-            metrics=metrics_service,
-            admins=admin_service,
-            storage=storage_service,
+            content=content,
+            users=users,
+            metrics=metrics,
+            admins=admins,
+            storage=storage,
+            media=services["media"],
             faq_text=faq_text,
+            callbacks=callbacks,
         )
     )
-    dp.include_router(buy_handlers.create_router(config, payment_service, user_service))
-    dp.include_router(download_handlers.create_router(config, access_service))
-    dp.include_router(membership_handlers.create_router(metrics_service, user_service))
+    dp.include_router(buy_handlers.create_router(config, payment_service, users, callbacks))
+    dp.include_router(download_handlers.create_router(config, access, callbacks))
+    dp.include_router(membership_handlers.create_router(metrics, users))
 
     admin_context = admin_handlers.AdminContext(
         config=config,
-        content=content_service,
-        storage=storage_service,
-        access=access_service,
-        metrics=metrics_service,
-        alerts=alert_service,
-        users=user_service,
-        admins=admin_service,
+        io=io,
+        content=content,
+        storage=storage,
+        access=access,
+        metrics=metrics,
+        alerts=alerts,
+        users=users,
+        admins=admins,
         payments=payment_service,
-        settings=settings,
+        settings=services["settings"],
+        broadcasts=broadcasts,
+        latency=latency,
+    )
+    dp.include_router(admin_handlers.create_router(admin_context, callbacks))
+    dp.include_router(callbacks.as_router())
+
+    return Application(
+        config=config,
+        bot=bot,
+        dp=dp,
+        io=io,
+        settings=services["settings"],
+        broadcasts=broadcasts,
+        flushers=flushers,
+        latency=latency,
+        storage_client=storage_client,
+        worker=worker,
+    )
+
+
+def build_application(config: Config) -> Application:
+    services, flushers = create_services(config)
+    services["settings"].apply(config)
+    faq_text = services["content"].get_faq()
+    io = IOExecutor(config.storage.io_workers, config.storage.io_queue)
+    facades = {name: AsyncFacade(service, io) for name, service in services.items()}
+    return _assemble(config, facades, io, faq_text, flushers=flushers)
+
+
+async def build_worker_application(config: Config, client: StorageClient, *, worker: int) -> Application:
+    """A worker process: every service call goes to the storage daemon over ``client``."""
+    await client.connect()
+    services = {name: RemoteFacade(client, name) for name in (*STORAGE_SERVICES, "fsm")}
+    apply_overrides(config, await services["settings"].overrides())
+    faq_text = await services["content"].get_faq()
+    io = IOExecutor(config.storage.io_workers, config.storage.io_queue)
+    return _assemble(
+        config,
+        services,
+        io,
+        faq_text,
+        flushers=[],
+        fsm=FacadeStorage(services["fsm"]),
+        storage_client=client,
+        worker=worker,
     )
-    dp.include_router(admin_handlers.create_router(admin_context))
 
-    await dp.start_polling(bot)
+
+async def run_polling(app: Application) -> None:
+    await app.bot.delete_webhook()
+    app.ready = True
+    await app.dp.start_polling(app.bot, close_bot_session=False)
+
+
+def create_web_app(app: Application) -> web.Application:
+    server = app.config.server
+    web_app = web.Application()
+    SimpleRequestHandler(app.dp, app.bot, secret_token=server.webhook_secret).register(web_app, path=server.webhook_path)
+
+    async def healthz(request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok"})
+
+    async def readyz(request: web.Request) -> web.Response:
+        stats = app.io.stats
+        ready = app.ready and stats.depth < app.io.max_pending
+        client = app.storage_client
+        if ready and client is not None and not client.connected:
+            try:
+                await asyncio.wait_for(client.connect(), 1)
+            except (OSError, asyncio.TimeoutError):
+                ready = False
+        if not ready:
+            return web.json_response({"status": "not ready", "io_depth": stats.depth}, status=503)
+        return web.json_response({"status": "ready", "io_depth": stats.depth})
+
+    web_app.router.add_get("/healthz", healthz)
+    web_app.router.add_get("/readyz", readyz)
+    return web_app
+
+
+def _stop_event() -> asyncio.Event:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    return stop
+
+
+async def run_webhook(app: Application, *, reuse_port: bool = False, register: bool = True) -> None:
+    server = app.config.server
+    stop = _stop_event()
+    runner = web.AppRunner(create_web_app(app))
+    await runner.setup()
+    await web.TCPSite(runner, server.host, server.port, reuse_port=reuse_port or None).start()
+    logger.info("Webhook слухає %s:%s%s", server.host, server.port, server.webhook_path)
+    try:
+        if register and server.webhook_url:
+            await app.bot.set_webhook(
+                server.webhook_url + server.webhook_path,
+                secret_token=server.webhook_secret,
+                allowed_updates=app.dp.resolve_used_update_types(),
+            )
+        app.ready = True
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+
+
+def _worker_main(index: int) -> None:
+    setup_logging(config.logs_dir, f"worker-{index}.log")
+    asyncio.run(_run_worker(index))
+
+
+async def _run_worker(index: int) -> None:
+    client = StorageClient(config.server.storage_socket)
+    app = await build_worker_application(config, client, worker=index)
+    await app.start()
+    try:
+        await run_webhook(app, reuse_port=True, register=index == 0)
+    finally:
+        await app.stop()
+
+
+async def run_cluster(config: Config) -> None:
+    """Storage daemon in this process, ``WORKERS`` webhook workers sharing the port via SO_REUSEPORT.
+
+    The daemon is the only process that touches ``data/``; workers that die
+    are restarted. Worker 0 registers the webhook and runs broadcasts.
+    """
+    services, flushers = create_services(config)
+    io = IOExecutor(config.storage.io_workers, config.storage.io_queue)
+    facades: Dict[str, Any] = {name: AsyncFacade(service, io) for name, service in services.items()}
+    facades["fsm"] = AsyncFacade(StateStore(), io)
+    server = StorageServer(facades, config.server.storage_socket)
+    await server.start()
+    interval = config.storage.snapshot_interval
+    background = [asyncio.create_task(io.every(interval, flush)) for flush in flushers]
+    context = multiprocessing.get_context("spawn")
+    workers: List[Optional[BaseProcess]] = [None] * config.server.workers
+    stop = _stop_event()
+    loop = asyncio.get_running_loop()
+    try:
+        while not stop.is_set():
+            for index, process in enumerate(workers):
+                if process is not None and process.is_alive():
+                    continue
+                if process is not None:
+                    logger.warning("Воркер %s завершився з кодом %s, перезапускаю", index, process.exitcode)
+                workers[index] = context.Process(target=_worker_main, args=(index,), name=f"worker-{index}")
+                workers[index].start()
+            try:
+                await asyncio.wait_for(stop.wait(), 1)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        running = [process for process in workers if process is not None]
+        for process in running:
+            if process.is_alive():
+                process.terminate()
+        for process in running:
+            await loop.run_in_executor(None, process.join, 30)
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        await server.close()
+        io.shutdown()
+        for flush in flushers:
+            flush()
+
+
+async def main() -> None:
+    setup_directories(config.data_dir, config.logs_dir)
+    setup_logging(config.logs_dir)
+    if config.server.workers > 1:
+        await run_cluster(config)
+        return
+    app = build_application(config)
+    await app.start()
+    try:
+        if config.server.run_mode == "webhook":
+            await run_webhook(app)
+        else:
+            await run_polling(app)
+    finally:
+        await app.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,69 @@
+"""User writes from many coroutines through AsyncFacade, as handlers make them.
+
+Each coroutine calls ``register_start`` or ``mark_buy_click`` on a
+UserService behind an IOExecutor sized like the bot's (IO_WORKERS,
+IO_QUEUE). ``--blocking`` waits for the journal ack inside the pool thread,
+as before acks were deferred to the event loop, so the two group-commit batch
+sizes can be compared. Run from the repository root:
+``python -m bench.appends --coroutines 200 --writes 5000 --fsync always``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from services import files
+from services.aio import AsyncFacade, IOExecutor
+from services.users import UserService
+
+
+async def run(args: argparse.Namespace, blocking: bool) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        service = UserService(Path(tmp) / "users", shards=args.shards)
+        executor = IOExecutor(args.io_workers, args.io_queue)
+        users = AsyncFacade(service, executor)
+        before = files.appender_stats()
+        pending = iter(range(args.writes))
+
+        async def write(user_id: int) -> None:
+            if blocking:
+                await executor.run(service.register_start, user_id, f"user{user_id}")
+            else:
+                await users.register_start(user_id, f"user{user_id}")
+
+        async def worker() -> None:
+            for index in pending:
+                await write(index + 1)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.coroutines)))
+        elapsed = time.perf_counter() - started
+        records, batches = (after - was for after, was in zip(files.appender_stats(), before))
+        label = "ack in pool thread" if blocking else "ack on event loop"
+        print(
+            f"{label:<20} {args.writes / elapsed:>9.0f} writes/s, {records} records in {batches} commits "
+            f"({records / max(batches, 1):.1f} per commit)"
+        )
+        executor.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--coroutines", type=int, default=200)
+    parser.add_argument("--writes", type=int, default=5000)
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--io-workers", type=int, default=4)
+    parser.add_argument("--io-queue", type=int, default=256)
+    parser.add_argument("--fsync", choices=files.FSYNC_POLICIES, default="always")
+    args = parser.parse_args()
+    files.set_fsync_policy(args.fsync)
+    print(f"{args.coroutines} coroutines, IO_WORKERS={args.io_workers}, FSYNC_POLICY={args.fsync}, {args.shards} shard(s)")
+    for blocking in (True, False):
+        asyncio.run(run(args, blocking))
+
+
+if __name__ == "__main__":
+    main()
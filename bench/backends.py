@@ -0,0 +1,92 @@
+"""Compare the JSON-file and SQLite storage backends on the bot's hot paths.
+
+Run from the repository root: ``python -m bench.backends --users 20000``.
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict
+
+from services.access import AccessService
+from services.alerts import AlertService
+from services.metrics import MetricsService
+from services.sqlite_backend import (
+    Database,
+    SqliteAccessService,
+    SqliteAlertService,
+    SqliteMetricsService,
+    SqliteStorageService,
+    SqliteUserService,
+)
+from services.storage import StorageService
+from services.users import UserService
+
+
+def _json_services(root: Path) -> Dict[str, object]:
+    return {
+        "storage": StorageService(root / "purchases.jsonl", root / "orders.jsonl", root / "ledger.jsonl", root / "balances.json"),
+        "users": UserService(root / "users.json"),
+        "access": AccessService(root / "access.json"),
+        "metrics": MetricsService(root / "metrics.json"),
+        "alerts": AlertService(root / "alerts.json"),
+    }
+
+
+def _sqlite_services(root: Path) -> Dict[str, object]:
+    db = Database(root / "bot.sqlite3")
+    return {
+        "storage": SqliteStorageService(db),
+        "users": SqliteUserService(db),
+        "access": SqliteAccessService(db),
+        "metrics": SqliteMetricsService(db),
+        "alerts": SqliteAlertService(db),
+    }
+
+
+def _timed(label: str, count: int, threads: int, fn: Callable[[int], object]) -> float:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        for _ in pool.map(fn, range(count)):
+            pass
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed else float("inf")
+    print(f"  {label:<34}{count:>9}{rate:>14.0f}/s")
+    return rate
+
+
+def run(label: str, services: Dict[str, object], users: int, buyers: int, threads: int) -> None:
+    storage, user_service, access, metrics, alerts = (
+        services["storage"], services["users"], services["access"], services["metrics"], services["alerts"]
+    )
+    print(f"{label} ({threads} threads)")
+    _timed("register_start + ensure_user", users, threads,
+           lambda i: (user_service.register_start(i, f"user{i}"), metrics.ensure_user("unique_users_started", i)))
+    _timed("mark_buy_click + add_order", buyers, threads,
+           lambda i: (user_service.mark_buy_click(i), storage.add_order(i, "guide", 544, "створено")))
+    _timed("purchase (charge check + writes)", buyers, threads,
+           lambda i: (storage.charge_exists(f"ch{i}") or storage.add_purchase(i, f"ch{i}", 544, "guide"),
+                      access.set_access(i, f"ch{i}"), user_service.mark_purchase(i)))
+    _timed("compute_user_balance", users, threads, lambda i: storage.compute_user_balance(i))
+    _timed("has_access", users, threads, lambda i: access.has_access(i))
+    _timed("alerts.increment", buyers, threads, lambda i: alerts.increment("sent"))
+    _timed("users.stats", 20, 1, lambda i: user_service.stats())
+    _timed("read_purchases(limit=20)", 200, 1, lambda i: storage.read_purchases(limit=20))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--buyers", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+    for label, factory in (("json", _json_services), ("sqlite", _sqlite_services)):
+        with tempfile.TemporaryDirectory() as tmp:
+            run(label, factory(Path(tmp)), args.users, args.buyers, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Per-callback dispatch overhead: one lambda filter per handler vs the CallbackRouter table.
+
+The "filters" tree mirrors how handlers/ registered callbacks before the
+CallbackRouter: the same routes, routers and nesting, one
+``lambda c: c.data == ...`` per handler. Handlers do nothing, so the numbers
+are aiogram's routing cost alone. Run from the repository root:
+``python -m bench.dispatch --rounds 20000``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Update
+
+from handlers.callbacks import CallbackRouter
+
+# router name -> (exact routes, prefix namespaces), in the order app.py includes them
+TREE: Dict[str, tuple] = {
+    "main_menu": (["page:main", "page:faq"], []),
+    "buy": (["buy:start"], []),
+    "download": (["download:guide"], []),
+    "membership": ([], []),
+    "admin": (["admin:menu"], []),
+    "admin.log_menu": (
+        ["admin:logs", "admin:logs:balance", "admin:logs:payments", "admin:logs:orders",
+         "admin:logs:users", "admin:logs:system", "admin:logs:alerts", "admin:logs:latency"],
+        [],
+    ),
+    "admin.actions": (
+        ["admin:actions", "admin:actions:price", "admin:actions:url", "admin:add", "admin:actions:withdrawal",
+         "admin:actions:award", "admin:actions:correction", "admin:actions:refund"],
+        [],
+    ),
+    "admin.maintenance": (["admin:maintenance", "admin:maintenance:toggle"], []),
+    "admin.broadcast": (["admin:broadcast"], ["admin:broadcast:segment:", "admin:broadcast:cancel:"]),
+    "admin.system": (
+        ["admin:system", "admin:system:files", "admin:system:pause", "admin:system:resume", "admin:system:restart"], []
+    ),
+    "admin.edit_menu_text": (["admin:edit_text"], []),
+}
+
+PROBES = {
+    "first route": "page:main",
+    "middle route": "admin:logs:users",
+    "last route": "admin:edit_text",
+    "prefix route": "admin:broadcast:cancel:20240101-000000-abcdef",
+    "no route": "unknown:data",
+}
+
+
+async def _noop(callback) -> None:
+    return None
+
+
+def _exact_filter(data: str):
+    return lambda c: c.data == data
+
+
+def _prefix_filter(namespace: str):
+    return lambda c: c.data and c.data.startswith(namespace)
+
+
+def _filters_dispatcher() -> Dispatcher:
+    dp = Dispatcher()
+    routers: Dict[str, Router] = {}
+    for name, (exact, prefixes) in TREE.items():
+        router = routers[name] = Router(name=name)
+        for data in exact:
+            router.callback_query(_exact_filter(data))(_noop)
+        for namespace in prefixes:
+            router.callback_query(_prefix_filter(namespace))(_noop)
+        parent, _, _ = name.rpartition(".")
+        (routers[parent] if parent else dp).include_router(router)
+    return dp
+
+
+def _table_dispatcher() -> Dispatcher:
+    dp = Dispatcher()
+    callbacks = CallbackRouter()
+    for name, (exact, prefixes) in TREE.items():
+        # modules still own an aiogram Router for their message handlers
+        router = Router(name=name)
+        for data in exact:
+            callbacks.exact(data)(_noop)
+        for namespace in prefixes:
+            callbacks.prefix(namespace)(_noop)
+        if "." not in name:
+            dp.include_router(router)
+    dp.include_router(callbacks.as_router())
+    return dp
+
+
+def _update(data: str) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": 1,
+            "callback_query": {
+                "id": "1",
+                "from": {"id": 42, "is_bot": False, "first_name": "Bench"},
+                "chat_instance": "bench",
+                "data": data,
+                "message": {"message_id": 1, "date": 0, "chat": {"id": 42, "type": "private"}, "text": "menu"},
+            },
+        }
+    )
+
+
+async def _per_update(dp: Dispatcher, bot: Bot, update: Update, rounds: int) -> float:
+    for _ in range(min(rounds, 200)):
+        await dp.feed_update(bot, update)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await dp.feed_update(bot, update)
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+async def _run(rounds: int) -> None:
+    bot = Bot("123456:bench")
+    dispatchers = {"filters": _filters_dispatcher(), "table": _table_dispatcher()}
+    print(f"{sum(len(exact) + len(prefixes) for exact, prefixes in TREE.values())} callback routes, µs per update")
+    print(f"{'':<14}" + "".join(f"{name:>10}" for name in dispatchers) + f"{'speedup':>10}")
+    for label, data in PROBES.items():
+        update = _update(data)
+        results: List[float] = [await _per_update(dp, bot, update, rounds) for dp in dispatchers.values()]
+        print(f"{label:<14}" + "".join(f"{value:>10.1f}" for value in results) + f"{results[0] / results[1]:>9.1f}x")
+    await bot.session.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(_run(args.rounds))
+
+
+if __name__ == "__main__":
+    main()
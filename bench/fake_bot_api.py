@@ -0,0 +1,173 @@
+"""Local stand-in for the Telegram Bot API, for benchmarks.
+
+Serves ``/bot<token>/<method>``: ``getUpdates`` long-polls an in-memory queue
+fed by ``push_update``, every other method succeeds with a plausible result.
+``wait_reply(chat_id)`` resolves when the bot next calls a method for that
+chat, which is how benchmarks time a full update round trip. The updates
+built here use the user id as the chat id and as the pre-checkout query id,
+so ``answerPreCheckoutQuery`` counts as a reply to that user's chat.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+from aiohttp import web
+
+MESSAGE_METHODS = {
+    "sendMessage",
+    "sendPhoto",
+    "sendInvoice",
+    "editMessageMedia",
+    "editMessageCaption",
+    "editMessageText",
+    "editMessageReplyMarkup",
+}
+
+
+class FakeBotAPI:
+    def __init__(self, *, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.calls: Dict[str, int] = defaultdict(int)
+        self._updates: List[dict] = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_updates = asyncio.Event()
+        self._waiters: Dict[int, Deque[asyncio.Future]] = defaultdict(deque)
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route("*", "/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound = site._server.sockets[0].getsockname()
+        self.url = f"http://{bound[0]}:{bound[1]}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def push_update(self, update: dict) -> int:
+        update = dict(update, update_id=next(self._update_ids))
+        self._updates.append(update)
+        self._new_updates.set()
+        return update["update_id"]
+
+    def wait_reply(self, chat_id: int) -> "asyncio.Future[float]":
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[chat_id].append(future)
+        return future
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        params: Dict[str, Any] = dict(await request.post()) if request.can_read_body else {}
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method == "getUpdates":
+            return web.json_response({"ok": True, "result": await self._get_updates(params)})
+        result: Any = True
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+        elif method in MESSAGE_METHODS:
+            result = self._message(params)
+        chat_id = params.get("chat_id")
+        if chat_id is None and method == "answerPreCheckoutQuery":
+            chat_id = params.get("pre_checkout_query_id")
+        if chat_id is not None:
+            waiters = self._waiters.get(int(chat_id))
+            if waiters:
+                waiters.popleft().set_result(time.perf_counter())
+        return web.json_response({"ok": True, "result": result})
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[dict]:
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        self._updates = [update for update in self._updates if update["update_id"] >= offset]
+        if not self._updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return [update for update in self._updates if update["update_id"] >= offset][:100]
+
+    def _message(self, params: Dict[str, Any]) -> dict:
+        chat_id = int(params.get("chat_id") or 0)
+        message = {
+            "message_id": int(params.get("message_id") or next(self._message_ids)),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+        }
+        if "photo" in params or "media" in params:
+            message["photo"] = [{"file_id": "bench-photo", "file_unique_id": "bench", "width": 64, "height": 64}]
+        return message
+
+
+def start_update(user_id: int) -> dict:
+    return {
+        "message": {
+            "message_id": 1,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Bench", "username": f"bench{user_id}"},
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        }
+    }
+
+
+def callback_update(user_id: int, data: str) -> dict:
+    return {
+        "callback_query": {
+            "id": str(user_id),
+            "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+            "chat_instance": "bench",
+            "data": data,
+            "message": {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"},
+                "photo": [{"file_id": "bench-photo", "file_unique_id": "bench", "width": 64, "height": 64}],
+            },
+        }
+    }
+
+
+def pre_checkout_update(user_id: int, payload: str, amount: int) -> dict:
+    return {
+        "pre_checkout_query": {
+            "id": str(user_id),
+            "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+            "currency": "XTR",
+            "total_amount": amount,
+            "invoice_payload": payload,
+        }
+    }
+
+
+def payment_update(user_id: int, payload: str, amount: int, charge_id: str) -> dict:
+    return {
+        "message": {
+            "message_id": 2,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Bench", "username": f"bench{user_id}"},
+            "successful_payment": {
+                "currency": "XTR",
+                "total_amount": amount,
+                "invoice_payload": payload,
+                "telegram_payment_charge_id": charge_id,
+                "provider_payment_charge_id": f"provider-{charge_id}",
+            },
+        }
+    }
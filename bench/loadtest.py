@@ -0,0 +1,197 @@
+"""Purchase-funnel load test: N simulated users through the real Dispatcher against a local Bot API stand-in.
+
+Every user sends ``/start``, presses «Купити», answers the pre-checkout query
+and pays; each step is timed from delivery until the bot's reply reaches the
+fake API (``sendPhoto``, ``sendInvoice``, ``answerPreCheckoutQuery``,
+``sendMessage``). ``--concurrency`` users are in flight at once. The bot runs
+on a temporary DATA_DIR, fully offline; the report covers throughput, latency
+percentiles per step and how much each data file grew. Exits with status 1 if
+any step timed out. Run from the repository root:
+``python -m bench.loadtest --users 500 --concurrency 50 --mode polling``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Tuple
+
+from aiohttp import ClientSession, web
+
+from bench.fake_bot_api import FakeBotAPI, callback_update, payment_update, pre_checkout_update, start_update
+
+SECRET = "bench-secret"
+FIRST_USER = 5_000_000
+STEPS = ("start", "buy", "pre_checkout", "payment")
+
+Deliver = Callable[[dict], Awaitable[None]]
+
+
+@contextlib.asynccontextmanager
+async def _polling(api: FakeBotAPI) -> AsyncIterator[Deliver]:
+    from app import build_application, run_polling
+    from config import config
+
+    app = build_application(config)
+    await app.start()
+    polling = asyncio.create_task(run_polling(app))
+
+    async def deliver(update: dict) -> None:
+        api.push_update(update)
+
+    try:
+        yield deliver
+    finally:
+        await app.dp.stop_polling()
+        await polling
+        await app.stop()
+
+
+@contextlib.asynccontextmanager
+async def _webhook(api: FakeBotAPI) -> AsyncIterator[Deliver]:
+    from app import build_application, create_web_app
+    from config import config
+
+    app = build_application(config)
+    await app.start()
+    runner = web.AppRunner(create_web_app(app), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}{config.server.webhook_path}"
+    app.ready = True
+    update_ids = itertools.count(1)
+
+    async with ClientSession(headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as client:
+
+        async def deliver(update: dict) -> None:
+            async with client.post(url, json=dict(update, update_id=next(update_ids))) as response:
+                response.raise_for_status()
+
+        try:
+            yield deliver
+        finally:
+            await runner.cleanup()
+            await app.stop()
+
+
+def _sizes(root: Path) -> Dict[str, int]:
+    return {
+        str(path.relative_to(root)): path.stat().st_size
+        for path in root.rglob("*")
+        if path.is_file() and not path.name.startswith(".")
+    }
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 if ordered else 0.0
+
+
+async def _load(
+    api: FakeBotAPI, deliver: Deliver, args: argparse.Namespace, payload: str, amount: int
+) -> Tuple[Dict[str, List[float]], int, float]:
+    samples: Dict[str, List[float]] = {step: [] for step in STEPS}
+    failed = 0
+    limit = asyncio.Semaphore(args.concurrency)
+
+    async def flow(user_id: int) -> None:
+        nonlocal failed
+        updates = (
+            start_update(user_id),
+            callback_update(user_id, "buy:start"),
+            pre_checkout_update(user_id, payload, amount),
+            payment_update(user_id, payload, amount, f"bench-{user_id}"),
+        )
+        async with limit:
+            for step, update in zip(STEPS, updates):
+                reply = api.wait_reply(user_id)
+                started = time.perf_counter()
+                await deliver(update)
+                try:
+                    samples[step].append(await asyncio.wait_for(reply, args.timeout) - started)
+                except asyncio.TimeoutError:
+                    failed += 1
+                    return
+
+    started = time.perf_counter()
+    await asyncio.gather(*(flow(FIRST_USER + index) for index in range(args.users)))
+    return samples, failed, time.perf_counter() - started
+
+
+def _report(
+    samples: Dict[str, List[float]], failed: int, elapsed: float, before: Dict[str, int], after: Dict[str, int], api: FakeBotAPI
+) -> None:
+    flows = len(samples[STEPS[-1]])
+    updates = sum(len(values) for values in samples.values())
+    print(f"{flows} flows in {elapsed:.2f} s: {flows / elapsed:.1f} flows/s, {updates / elapsed:.0f} updates/s, {failed} timed out")
+    print(f"{'step':<14} {'count':>7} {'mean ms':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for step in STEPS:
+        ordered = sorted(samples[step])
+        mean = sum(ordered) / len(ordered) * 1000 if ordered else 0.0
+        print(
+            f"{step:<14} {len(ordered):>7} {mean:>8.2f} {_percentile(ordered, 0.5):>8.2f} {_percentile(ordered, 0.95):>8.2f}"
+            f" {_percentile(ordered, 0.99):>8.2f} {(ordered[-1] * 1000 if ordered else 0.0):>8.2f}"
+        )
+    growth = sorted(((after.get(name, 0) - before.get(name, 0), name) for name in set(before) | set(after)), reverse=True)
+    total = sum(delta for delta, _ in growth)
+    print(f"data growth: {total / 1024:.1f} KB total, {total / max(flows, 1):.0f} B per flow")
+    for delta, name in growth[:12]:
+        if delta:
+            print(f"  {name:<36} {before.get(name, 0) / 1024:>9.1f} → {after.get(name, 0) / 1024:>9.1f} KB")
+    print("Bot API calls: " + ", ".join(f"{method} {count}" for method, count in sorted(api.calls.items())))
+
+
+async def _run(args: argparse.Namespace, root: Path) -> int:
+    api = FakeBotAPI(latency=args.api_latency / 1000)
+    url = await api.start()
+    data_dir = root / "data"
+    data_dir.mkdir(parents=True)
+    os.environ.update(
+        BOT_TOKEN="123456:bench",
+        BOT_API_URL=url,
+        RUN_MODE=args.mode,
+        WEBHOOK_SECRET=SECRET,
+        DATA_DIR=str(data_dir),
+        LOGS_DIR=str(root / "logs"),
+    )
+    from config import config
+
+    try:
+        async with (_polling if args.mode == "polling" else _webhook)(api) as deliver:
+            before = _sizes(data_dir)
+            samples, failed, elapsed = await _load(api, deliver, args, config.guide.payload, config.guide.price_stars)
+        # after app.stop(), so the final snapshots are on disk
+        _report(samples, failed, elapsed, before, _sizes(data_dir), api)
+    finally:
+        await api.stop()
+    return 1 if failed else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--mode", choices=("polling", "webhook"), default="polling")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="extra delay per Bot API call, ms")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for each reply")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary DATA_DIR and print its path")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    if args.keep:
+        root = Path(tempfile.mkdtemp(prefix="bench-loadtest-"))
+        print(f"DATA_DIR: {root / 'data'}", file=sys.stderr)
+        sys.exit(asyncio.run(_run(args, root)))
+    with tempfile.TemporaryDirectory(prefix="bench-loadtest-") as tmp:
+        code = asyncio.run(_run(args, Path(tmp)))
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Read throughput of services.files.read_json under shared vs exclusive locking.
+
+Run from the repository root: ``python -m bench.locks``.
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from services import files
+
+
+def _reader(path: Path, shared: bool, deadline: float, counts: list, index: int) -> None:
+    done = 0
+    while time.perf_counter() < deadline:
+        with files.locked_file(path, "r", shared=shared) as file_obj:
+            file_obj.read()
+            # keep the lock for a moment, as a slow disk or a big parse would
+            time.sleep(0.0005)
+        done += 1
+    counts[index] = done
+
+
+def _run_threads(path: Path, shared: bool, workers: int, seconds: float) -> int:
+    counts = [0] * workers
+    deadline = time.perf_counter() + seconds
+    threads = [
+        threading.Thread(target=_reader, args=(path, shared, deadline, counts, index)) for index in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts)
+
+
+def _process_entry(path: Path, shared: bool, seconds: float, queue) -> None:
+    counts = [0]
+    _reader(path, shared, time.perf_counter() + seconds, counts, 0)
+    queue.put(counts[0])
+
+
+def _run_processes(path: Path, shared: bool, workers: int, seconds: float) -> int:
+    queue = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_process_entry, args=(path, shared, seconds, queue)) for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+    total = sum(queue.get() for _ in procs)
+    for proc in procs:
+        proc.join()
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=1.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "admins.json"
+        files.write_json(path, {"extra": list(range(1000))})
+        print(f"{'mode':<10}{'workers':>8}{'LOCK_EX ops/s':>16}{'LOCK_SH ops/s':>16}{'speedup':>10}")
+        for label, runner in (("threads", _run_threads), ("processes", _run_processes)):
+            for workers in args.workers:
+                exclusive = runner(path, False, workers, args.seconds) / args.seconds
+                shared = runner(path, True, workers, args.seconds) / args.seconds
+                print(f"{label:<10}{workers:>8}{exclusive:>16.0f}{shared:>16.0f}{shared / exclusive:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
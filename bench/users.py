@@ -0,0 +1,93 @@
+"""UserService with one shard vs many at 10k, 100k and 1M users.
+
+For each size the user base is seeded directly into shard snapshots, then
+the service is opened (journal replay and segment index) and hit with
+register_start/mark_buy_click from several threads. Writes that trigger a
+shard compaction show up in the max latency. Run from the repository root:
+``python -m bench.users --sizes 10000 100000 1000000 --shards 1 16``.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from services.journal import ShardedTable
+from services.users import UserService
+
+
+def _population(size: int) -> Iterator[Tuple[str, dict]]:
+    for user_id in range(1, size + 1):
+        entry = {"first_seen": 1_700_000_000 + user_id, "username": f"user{user_id}", "started": True, "is_blocked": False}
+        if user_id % 7 == 0:
+            entry["buy_clicks"] = 1
+        if user_id % 31 == 0:
+            entry["purchased"] = 1
+        yield str(user_id), entry
+
+
+def _timed(fn) -> float:
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def _writes(service: UserService, size: int, count: int, threads: int) -> Tuple[float, List[float]]:
+    rng = random.Random(size)
+    # every call changes its record: clicks by existing users, /start by new ones
+    targets = [rng.randint(1, size) if index % 3 else size + index for index in range(count)]
+
+    def one(index: int) -> float:
+        user_id = targets[index]
+        started = time.perf_counter()
+        if index % 3:
+            service.mark_buy_click(user_id)
+        else:
+            service.register_start(user_id, f"user{user_id}")
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        latencies = sorted(pool.map(one, range(count)))
+    return time.perf_counter() - started, latencies
+
+
+def run(size: int, shards: int, writes: int, threads: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp) / "users"
+        seed = _timed(lambda: ShardedTable.build(directory, shards, _population(size)))
+        holder: List[UserService] = []
+        load = _timed(lambda: holder.append(UserService(directory, shards=shards)))
+        service = holder[0]
+        elapsed, latencies = _writes(service, size, writes, threads)
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000
+        worst = latencies[-1] * 1000
+        stats = _timed(service.stats)
+        scan = _timed(lambda: sum(1 for _ in service.iter_user_ids()))
+        flush = _timed(service.flush)
+        print(
+            f"{size:>9} {shards:>6} {seed:8.2f} {load:8.2f} {writes / elapsed:10.0f} {p99:8.2f} {worst:9.1f}"
+            f" {stats * 1000:9.1f} {scan * 1000:9.1f} {flush * 1000:9.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--writes", type=int, default=20_000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+    print(f"{'users':>9} {'shards':>6} {'seed s':>8} {'open s':>8} {'writes/s':>10} {'p99 ms':>8} {'max ms':>9}"
+          f" {'stats ms':>9} {'scan ms':>9} {'flush ms':>9}")
+    for size in args.sizes:
+        for shards in args.shards:
+            run(size, shards, args.writes, args.threads)
+
+
+if __name__ == "__main__":
+    main()
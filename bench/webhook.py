@@ -0,0 +1,134 @@
+"""Update round-trip latency in polling vs webhook mode against a local Bot API stand-in.
+
+Each sample is a ``/start`` from a new user, timed from delivery until the
+bot's ``sendPhoto`` reaches the fake API. Run from the repository root:
+``python -m bench.webhook --updates 500 --concurrency 20``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+from typing import Awaitable, Callable, List
+
+from aiohttp import ClientSession, web
+
+from bench.fake_bot_api import FakeBotAPI, start_update
+
+SECRET = "bench-secret"
+
+
+async def _measure(
+    api: FakeBotAPI,
+    deliver: Callable[[int, dict], Awaitable[None]],
+    updates: int,
+    concurrency: int,
+    first_user: int,
+) -> List[float]:
+    samples: List[float] = []
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(user_id: int) -> None:
+        async with limit:
+            reply = api.wait_reply(user_id)
+            started = time.perf_counter()
+            await deliver(user_id, start_update(user_id))
+            samples.append(await asyncio.wait_for(reply, 30) - started)
+
+    await asyncio.gather(*(one(first_user + index) for index in range(updates)))
+    return samples
+
+
+async def _polling(api: FakeBotAPI, args: argparse.Namespace) -> List[float]:
+    from app import build_application, run_polling
+    from config import config
+
+    app = build_application(config)
+    await app.start()
+    polling = asyncio.create_task(run_polling(app))
+
+    async def deliver(user_id: int, update: dict) -> None:
+        api.push_update(update)
+
+    try:
+        return await _measure(api, deliver, args.updates, args.concurrency, first_user=1_000_000)
+    finally:
+        await app.dp.stop_polling()
+        await polling
+        await app.stop()
+
+
+async def _webhook(api: FakeBotAPI, args: argparse.Namespace) -> List[float]:
+    from app import build_application, create_web_app
+    from config import config
+
+    app = build_application(config)
+    await app.start()
+    runner = web.AppRunner(create_web_app(app), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}{config.server.webhook_path}"
+    app.ready = True
+
+    async with ClientSession(headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as client:
+
+        async def deliver(user_id: int, update: dict) -> None:
+            update = dict(update, update_id=user_id)
+            async with client.post(url, json=update) as response:
+                response.raise_for_status()
+
+        try:
+            return await _measure(api, deliver, args.updates, args.concurrency, first_user=2_000_000)
+        finally:
+            await runner.cleanup()
+            await app.stop()
+
+
+def _report(name: str, samples: List[float], elapsed: float) -> None:
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    print(
+        f"{name:8} {len(samples) / elapsed:8.0f} upd/s  mean {statistics.fmean(ordered) * 1000:6.2f} ms  "
+        f"p50 {pick(0.5):6.2f}  p95 {pick(0.95):6.2f}  p99 {pick(0.99):6.2f}"
+    )
+
+
+async def _run(args: argparse.Namespace) -> None:
+    api = FakeBotAPI(latency=args.api_latency / 1000)
+    url = await api.start()
+    root = tempfile.mkdtemp(prefix="bench-webhook-")
+    os.environ.update(
+        BOT_TOKEN="123456:bench",
+        BOT_API_URL=url,
+        WEBHOOK_SECRET=SECRET,
+        DATA_DIR=os.path.join(root, "data"),
+        LOGS_DIR=os.path.join(root, "logs"),
+    )
+    os.makedirs(os.environ["DATA_DIR"])
+    try:
+        for name, runner in (("polling", _polling), ("webhook", _webhook)):
+            started = time.perf_counter()
+            samples = await runner(api, args)
+            _report(name, samples, time.perf_counter() - started)
+    finally:
+        await api.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--api-latency", type=float, default=0.0, help="extra delay per Bot API call, ms")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
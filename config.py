@@ -61,6 +61,49 @@ class AdminSystemConfig:
     service_name: str
 
 
+@dataclass(slots=True)
+class StorageConfig:
+    backend: str
+    snapshot_interval: float
+    io_workers: int
+    io_queue: int
+    fsync_policy: str
+    append_max_delay: float
+    segment_max_bytes: int
+    segment_max_age: float
+    unique_mode: str
+    doc_cache_interval: float
+    doc_cache_inotify: bool
+    user_shards: int
+    io_stats: bool
+    io_stats_file: Path
+
+
+@dataclass(slots=True)
+class BroadcastConfig:
+    rate: float
+    workers: int
+
+
+@dataclass(slots=True)
+class ServerConfig:
+    run_mode: str
+    bot_api_url: Optional[str]
+    webhook_url: Optional[str]
+    webhook_path: str
+    webhook_secret: Optional[str]
+    host: str
+    port: int
+    workers: int
+    storage_socket: Path
+
+
+@dataclass(slots=True)
+class MonitoringConfig:
+    prometheus_textfile: Optional[Path]
+    prometheus_interval: float
+
+
 @dataclass(slots=True)
 class Config:
     bot_token: str
@@ -73,14 +116,24 @@ class Config:
     admin_file: Path
     alerts_file: Path
     users_file: Path
+    users_dir: Path
     access_file: Path
     purchases_file: Path
     orders_file: Path
     ledger_file: Path
+    balances_file: Path
+    sqlite_file: Path
     metrics_file: Path
+    unique_users_dir: Path
     content_file: Path
     settings_file: Path
+    media_cache_file: Path
+    broadcasts_dir: Path
     admin_system: AdminSystemConfig
+    storage: StorageConfig
+    broadcast: BroadcastConfig
+    server: ServerConfig
+    monitoring: MonitoringConfig
 
     @classmethod
     def load(cls) -> "Config":
@@ -98,6 +151,56 @@ class Config:
         sales_enabled = _parse_bool(os.getenv("SALES_ENABLED"), default=True)
         allow_systemd = _parse_bool(os.getenv("ALLOW_SYSTEMD"), default=False)
         service_name = os.getenv("SERVICE_NAME", "xtrbot.service")
+        storage_backend = os.getenv("STORAGE_BACKEND", "json").strip().lower()
+        if storage_backend not in {"json", "sqlite"}:
+            raise ConfigError(f"Unknown STORAGE_BACKEND '{storage_backend}', expected 'json' or 'sqlite'")
+        snapshot_interval = float(os.getenv("SNAPSHOT_INTERVAL", "60"))
+        io_workers = int(os.getenv("IO_WORKERS", "4"))
+        io_queue = int(os.getenv("IO_QUEUE", "256"))
+        fsync_policy = os.getenv("FSYNC_POLICY", "on-rename").strip().lower()
+        if fsync_policy not in {"never", "on-rename", "always"}:
+            raise ConfigError(f"Unknown FSYNC_POLICY '{fsync_policy}', expected 'never', 'on-rename' or 'always'")
+        append_max_delay = float(os.getenv("APPEND_MAX_DELAY_MS", "0")) / 1000
+        segment_max_bytes = int(float(os.getenv("SEGMENT_MAX_MB", "4")) * 1_000_000)
+        segment_max_age = float(os.getenv("SEGMENT_MAX_AGE_HOURS", "0")) * 3600
+        unique_mode = os.getenv("UNIQUE_USERS_MODE", "exact").strip().lower()
+        if unique_mode not in {"exact", "hll"}:
+            raise ConfigError(f"Unknown UNIQUE_USERS_MODE '{unique_mode}', expected 'exact' or 'hll'")
+        doc_cache_interval = float(os.getenv("DOC_CACHE_INTERVAL_MS", "1000")) / 1000
+        doc_cache_inotify = _parse_bool(os.getenv("DOC_CACHE_INOTIFY"), default=False)
+        user_shards = int(os.getenv("USER_SHARDS", "16"))
+        if user_shards < 1:
+            raise ConfigError("USER_SHARDS must be at least 1")
+        io_stats = _parse_bool(os.getenv("IO_STATS"), default=False)
+        io_stats_file = os.getenv("IO_STATS_FILE")
+
+        broadcast_rate = float(os.getenv("BROADCAST_RATE", "25"))
+        broadcast_workers = int(os.getenv("BROADCAST_WORKERS", "8"))
+        if broadcast_rate <= 0 or broadcast_workers < 1:
+            raise ConfigError("BROADCAST_RATE must be positive and BROADCAST_WORKERS at least 1")
+
+        run_mode = os.getenv("RUN_MODE", "polling").strip().lower()
+        if run_mode not in {"polling", "webhook"}:
+            raise ConfigError(f"Unknown RUN_MODE '{run_mode}', expected 'polling' or 'webhook'")
+        webhook_path = os.getenv("WEBHOOK_PATH", "/webhook")
+        if not webhook_path.startswith("/"):
+            webhook_path = "/" + webhook_path
+        workers = int(os.getenv("WORKERS", "1"))
+        if workers < 1:
+            raise ConfigError("WORKERS must be at least 1")
+        if workers > 1 and run_mode != "webhook":
+            raise ConfigError("WORKERS > 1 requires RUN_MODE=webhook")
+        bot_api_url = os.getenv("BOT_API_URL") or None
+        webhook_url = (os.getenv("WEBHOOK_URL") or "").rstrip("/") or None
+        webhook_secret = os.getenv("WEBHOOK_SECRET") or None
+        host = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+        port = int(os.getenv("WEBHOOK_PORT", "8080"))
+        storage_socket = os.getenv("STORAGE_SOCKET")
+
+        prometheus_textfile = os.getenv("PROMETHEUS_TEXTFILE")
+        prometheus_interval = float(os.getenv("PROMETHEUS_INTERVAL", "15"))
+        if prometheus_interval <= 0:
+            raise ConfigError("PROMETHEUS_INTERVAL must be positive")
 
         base_data_dir = Path(os.getenv("DATA_DIR", "data"))
         base_logs_dir = Path(os.getenv("LOGS_DIR", "logs"))
@@ -122,17 +225,58 @@ class Config:
             admin_file=base_data_dir / "admins.json",
             alerts_file=base_data_dir / "alerts.json",
             users_file=base_data_dir / "users.json",
+            users_dir=base_data_dir / "users",
             access_file=base_data_dir / "access.json",
             purchases_file=base_data_dir / "purchases.jsonl",
             orders_file=base_data_dir / "orders.jsonl",
             ledger_file=base_data_dir / "ledger.jsonl",
+            balances_file=base_data_dir / "balances.json",
+            sqlite_file=base_data_dir / "bot.sqlite3",
             metrics_file=base_data_dir / "metrics.json",
+            unique_users_dir=base_data_dir / "unique",
             content_file=base_data_dir / "content.json",
             settings_file=base_data_dir / "settings.json",
+            media_cache_file=base_data_dir / "media_cache.json",
+            broadcasts_dir=base_data_dir / "broadcasts",
             admin_system=AdminSystemConfig(
                 allow_systemd=allow_systemd,
                 service_name=service_name,
             ),
+            storage=StorageConfig(
+                backend=storage_backend,
+                snapshot_interval=snapshot_interval,
+                io_workers=io_workers,
+                io_queue=io_queue,
+                fsync_policy=fsync_policy,
+                append_max_delay=append_max_delay,
+                segment_max_bytes=segment_max_bytes,
+                segment_max_age=segment_max_age,
+                unique_mode=unique_mode,
+                doc_cache_interval=doc_cache_interval,
+                doc_cache_inotify=doc_cache_inotify,
+                user_shards=user_shards,
+                io_stats=io_stats,
+                io_stats_file=Path(io_stats_file or base_logs_dir / "io_stats.json"),
+            ),
+            broadcast=BroadcastConfig(
+                rate=broadcast_rate,
+                workers=broadcast_workers,
+            ),
+            server=ServerConfig(
+                run_mode=run_mode,
+                bot_api_url=bot_api_url,
+                webhook_url=webhook_url,
+                webhook_path=webhook_path,
+                webhook_secret=webhook_secret,
+                host=host,
+                port=port,
+                workers=workers,
+                storage_socket=Path(storage_socket or base_data_dir / "storage.sock"),
+            ),
+            monitoring=MonitoringConfig(
+                prometheus_textfile=Path(prometheus_textfile) if prometheus_textfile else None,
+                prometheus_interval=prometheus_interval,
+            ),
         )
 
 
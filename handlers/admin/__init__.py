@@ -6,10 +6,14 @@ from aiogram import Router
 from aiogram.types import CallbackQuery
 
 from config import Config
+from handlers.callbacks import CallbackRouter
 from services.access import AccessService
 from services.admins import AdminService
+from services.aio import AsyncFacade, IOExecutor
 from services.alerts import AlertService
+from services.broadcast import BroadcastEngine
 from services.content import ContentService
+from services.latency import LatencyRegistry
 from services.metrics import MetricsService
 from services.payments import PaymentService
 from services.settings import SettingsService
@@ -17,30 +21,33 @@ from services.storage import StorageService
 from services.users import UserService
 from ui import pages
 
-from . import actions, broadcast, edit_menu_text, log_menu, maintenance, system
-
 
 @dataclass(slots=True)
 class AdminContext:
     config: Config
-    content: ContentService
-    storage: StorageService
-    access: AccessService
-    metrics: MetricsService
-    alerts: AlertService
-    users: UserService
-    admins: AdminService
+    io: IOExecutor
+    content: AsyncFacade[ContentService]
+    storage: AsyncFacade[StorageService]
+    access: AsyncFacade[AccessService]
+    metrics: AsyncFacade[MetricsService]
+    alerts: AsyncFacade[AlertService]
+    users: AsyncFacade[UserService]
+    admins: AsyncFacade[AdminService]
     payments: PaymentService
-    settings: SettingsService
+    settings: AsyncFacade[SettingsService]
+    broadcasts: BroadcastEngine
+    latency: LatencyRegistry
 
-    def is_admin(self, user_id: int) -> bool:
-        return user_id in self.admins.get_admin_ids()
+    async def is_admin(self, user_id: int) -> bool:
+        return user_id in await self.admins.get_admin_ids()
 
 
 MAIN_TEXT = "Адмін-меню 🤖\nОберіть потрібний розділ"
 
 
-def create_router(context: AdminContext) -> Router:
+def create_router(context: AdminContext, callbacks: CallbackRouter) -> Router:
+    from . import actions, broadcast, edit_menu_text, log_menu, maintenance, system
+
     router = Router()
 
     def admin_keyboard():
@@ -58,21 +65,21 @@ def create_router(context: AdminContext) -> Router:
         builder.adjust(2, 2, 2, 1, 1)
         return builder.as_markup()
 
-    @router.callback_query(lambda c: c.data == "admin:menu")
+    @callbacks.exact("admin:menu")
     async def open_admin(callback: CallbackQuery) -> None:
         if not callback.message or not callback.from_user:
             return
-        if not context.is_admin(callback.from_user.id):
+        if not await context.is_admin(callback.from_user.id):
             await callback.answer("Доступ заборонено", show_alert=True)
             return
         await callback.message.edit_caption(MAIN_TEXT, reply_markup=admin_keyboard())
         await callback.answer()
 
-    router.include_router(log_menu.create_router(context))
-    router.include_router(actions.create_router(context))
-    router.include_router(maintenance.create_router(context))
-    router.include_router(broadcast.create_router(context))
-    router.include_router(system.create_router(context))
-    router.include_router(edit_menu_text.create_router(context))
+    router.include_router(log_menu.create_router(context, callbacks))
+    router.include_router(actions.create_router(context, callbacks))
+    router.include_router(maintenance.create_router(context, callbacks))
+    router.include_router(broadcast.create_router(context, callbacks))
+    router.include_router(system.create_router(context, callbacks))
+    router.include_router(edit_menu_text.create_router(context, callbacks))
 
     return router
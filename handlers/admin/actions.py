@@ -6,6 +6,9 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from handlers.callbacks import CallbackRouter
+from ui import pages
+
 from . import AdminContext
 
 
@@ -19,7 +22,7 @@ class ActionStates(StatesGroup):
     waiting_correction = State()
 
 
-def create_router(context: AdminContext) -> Router:
+def create_router(context: AdminContext, callbacks: CallbackRouter) -> Router:
     router = Router()
 
     def _keyboard():
@@ -35,7 +38,7 @@ def create_router(context: AdminContext) -> Router:
         return builder.as_markup()
 
     async def _ensure_admin(callback: CallbackQuery) -> bool:
-        if not callback.from_user or not context.is_admin(callback.from_user.id):
+        if not callback.from_user or not await context.is_admin(callback.from_user.id):
             await callback.answer("Доступ заборонено", show_alert=True)
             return False
         return True
@@ -50,7 +53,7 @@ def create_router(context: AdminContext) -> Router:
             f"GUIDE_URL: {context.config.guide.url}"
         )
 
-    @router.callback_query(lambda c: c.data == "admin:actions")
+    @callbacks.exact("admin:actions")
     async def open_actions(callback: CallbackQuery, state: FSMContext) -> None:
         if not callback.message or not await _ensure_admin(callback):
             return
@@ -58,21 +61,21 @@ def create_router(context: AdminContext) -> Router:
         await callback.message.edit_caption(_format_info(), reply_markup=_keyboard())
         await callback.answer()
 
-    @router.callback_query(lambda c: c.data == "admin:actions:price")
+    @callbacks.exact("admin:actions:price")
     async def ask_price(callback: CallbackQuery, state: FSMContext) -> None:
         if not callback.message or not await _ensure_admin(callback):
             return
         await state.set_state(ActionStates.waiting_price)
         await callback.answer("Введіть нову ціну у форматі '299,699'", show_alert=True)
 
-    @router.callback_query(lambda c: c.data == "admin:actions:url")
+    @callbacks.exact("admin:actions:url")
     async def ask_url(callback: CallbackQuery, state: FSMContext) -> None:
         if not callback.message or not await _ensure_admin(callback):
             return
         await state.set_state(ActionStates.waiting_url)
         await callback.answer("Надішліть новий GUIDE_URL", show_alert=True)
 
-    @router.callback_query(lambda c: c.data == "admin:add")
+    @callbacks.exact("admin:add")
     async def ask_admin(callback: CallbackQuery, state: FSMContext) -> None:
         if not callback.message or not await _ensure_admin(callback):
             return
@@ -85,7 +88,7 @@ def create_router(context: AdminContext) -> Router:
         await state.set_state(target_state)
         await callback.answer(prompt, show_alert=True)
 
-    @router.callback_query(lambda c: c.data == "admin:actions:withdrawal")
+    @callbacks.exact("admin:actions:withdrawal")
     async def ask_withdrawal(callback: CallbackQuery, state: FSMContext) -> None:
         await _ask_manual(
             callback,
@@ -94,7 +97,7 @@ def create_router(context: AdminContext) -> Router:
             "Формат: user_id, сума, коментар (необов'язково)",
         )
 
-    @router.callback_query(lambda c: c.data == "admin:actions:award")
+    @callbacks.exact("admin:actions:award")
     async def ask_award(callback: CallbackQuery, state: FSMContext) -> None:
         await _ask_manual(
             callback,
@@ -103,7 +106,7 @@ def create_router(context: AdminContext) -> Router:
             "Формат: user_id, сума, коментар (необов'язково)",
         )
 
-    @router.callback_query(lambda c: c.data == "admin:actions:correction")
+    @callbacks.exact("admin:actions:correction")
     async def ask_correction(callback: CallbackQuery, state: FSMContext) -> None:
         await _ask_manual(
             callback,
@@ -112,7 +115,7 @@ def create_router(context: AdminContext) -> Router:
             "Формат: user_id, +/-сума, коментар",
         )
 
-    @router.callback_query(lambda c: c.data == "admin:actions:refund")
+    @callbacks.exact("admin:actions:refund")
     async def ask_refund(callback: CallbackQuery, state: FSMContext) -> None:
         if not callback.message or not await _ensure_admin(callback):
             return
@@ -130,7 +133,7 @@ def create_router(context: AdminContext) -> Router:
 
     @router.message(ActionStates.waiting_price)
     async def set_price(message: Message, state: FSMContext) -> None:
-        if not context.is_admin(message.from_user.id):
+        if not await context.is_admin(message.from_user.id):
             return
         parts = [part.strip() for part in message.text.split(",") if part.strip()]
         if not parts:
@@ -144,7 +147,8 @@ def create_router(context: AdminContext) -> Router:
             return
         context.config.guide.price_uah = price
         context.config.guide.old_price_uah = old_price
-        context.settings.set_price(price, old_price)
+        await context.settings.set_price(price, old_price)
+        pages.invalidate()
         await message.answer(
             f"Ціну оновлено. Нова вартість: {context.config.guide.price_uah} UAH / {context.config.guide.price_stars}⭐️"
         )
@@ -152,29 +156,29 @@ def create_router(context: AdminContext) -> Router:
 
     @router.message(ActionStates.waiting_url)
     async def set_url(message: Message, state: FSMContext) -> None:
-        if not context.is_admin(message.from_user.id):
+        if not await context.is_admin(message.from_user.id):
             return
         url = message.text.strip()
         context.config.guide.url = url
-        context.settings.set_guide_url(url)
+        await context.settings.set_guide_url(url)
         await message.answer("GUIDE_URL оновлено")
         await state.clear()
 
     @router.message(ActionStates.waiting_admin)
     async def set_admin(message: Message, state: FSMContext) -> None:
-        if not context.is_admin(message.from_user.id):
+        if not await context.is_admin(message.from_user.id):
             return
         try:
             user_id = int(message.text.strip())
         except ValueError:
             await message.answer("Очікую ціле число")
             return
-        admins = context.admins.add_admin(user_id)
+        admins = await context.admins.add_admin(user_id)
         await message.answer(f"Адмінів тепер: {', '.join(map(str, sorted(admins)))}")
         await state.clear()
 
     async def _handle_manual(message: Message, state: FSMContext, *, kind: str, expect_positive: bool | None) -> None:
-        if not context.is_admin(message.from_user.id):
+        if not await context.is_admin(message.from_user.id):
             return
         try:
             user_id, amount, comment = _parse_manual_payload(message.text)
@@ -192,7 +196,7 @@ def create_router(context: AdminContext) -> Router:
         elif kind == "correction":
             adjusted_amount = amount
 
-        record = context.storage.add_ledger_entry(
+        record = await context.storage.add_ledger_entry(
             user_id,
             adjusted_amount,
             kind,
@@ -217,7 +221,7 @@ def create_router(context: AdminContext) -> Router:
 
     @router.message(ActionStates.waiting_refund)
     async def process_refund(message: Message, state: FSMContext) -> None:
-        if not context.is_admin(message.from_user.id):
+        if not await context.is_admin(message.from_user.id):
             return
         charge_id = message.text.strip()
         success = await context.payments.refund(message.from_user.id, charge_id)
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
-import asyncio
-
 from aiogram import Router
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from handlers.callbacks import CallbackRouter
+from services.users import SEGMENTS
 
 from . import AdminContext
 
@@ -14,43 +16,60 @@ class BroadcastStates(StatesGroup):
     waiting_message = State()
 
 
-def create_router(context: AdminContext) -> Router:
+def create_router(context: AdminContext, callbacks: CallbackRouter) -> Router:
     router = Router()
 
     async def _ensure_admin(callback: CallbackQuery) -> bool:
-        if not callback.from_user or not context.is_admin(callback.from_user.id):
+        if not callback.from_user or not await context.is_admin(callback.from_user.id):
             await callback.answer("Доступ заборонено", show_alert=True)
             return False
         return True
 
-    @router.callback_query(lambda c: c.data == "admin:broadcast")
+    @callbacks.exact("admin:broadcast")
+    async def choose_segment(callback: CallbackQuery) -> None:
+        if not callback.message or not await _ensure_admin(callback):
+            return
+        sizes = await context.users.segment_sizes()
+        builder = InlineKeyboardBuilder()
+        for name, label in SEGMENTS.items():
+            builder.button(text=f"{label} ({sizes.get(name, 0)})", callback_data=f"admin:broadcast:segment:{name}")
+        builder.button(text="⬅️ Назад", callback_data="admin:menu")
+        builder.adjust(1)
+        await callback.message.edit_caption("Кому надіслати розсилку?", reply_markup=builder.as_markup())
+        await callback.answer()
+
+    @callbacks.prefix("admin:broadcast:segment:")
     async def ask_message(callback: CallbackQuery, state: FSMContext) -> None:
         if not await _ensure_admin(callback):
             return
+        segment = callback.data.rsplit(":", 1)[1]
+        if segment not in SEGMENTS:
+            await callback.answer("Невідомий сегмент", show_alert=True)
+            return
         await state.set_state(BroadcastStates.waiting_message)
-        await callback.answer("Надішліть повідомлення для розсилки", show_alert=True)
+        await state.update_data(segment=segment)
+        await callback.answer(f"Надішліть повідомлення для розсилки: {SEGMENTS[segment]}", show_alert=True)
+
+    @callbacks.prefix("admin:broadcast:cancel:")
+    async def cancel_broadcast(callback: CallbackQuery) -> None:
+        if not await _ensure_admin(callback):
+            return
+        job_id = callback.data.rsplit(":", 1)[1]
+        if await context.broadcasts.cancel(job_id):
+            await callback.answer("Зупиняю розсилку")
+        else:
+            await callback.answer("Розсилка вже не виконується", show_alert=True)
 
     @router.message(BroadcastStates.waiting_message)
     async def send_broadcast(message: Message, state: FSMContext) -> None:
-        if not context.is_admin(message.from_user.id):
+        if not await context.is_admin(message.from_user.id):
             return
         text = message.text or message.caption
         if not text:
             await message.answer("Порожнє повідомлення")
             return
-        user_ids = context.users.all_user_ids()
-        sent = 0
-        failed = 0
-        for user_id in user_ids:
-            try:
-                await message.bot.send_message(user_id, text)
-                sent += 1
-                context.alerts.increment("sent")
-            except Exception:
-                failed += 1
-                context.alerts.increment("failed")
-            await asyncio.sleep(0.1)
-        await message.answer(f"Розсилку завершено. Успішно: {sent}, помилки: {failed}")
+        data = await state.get_data()
         await state.clear()
+        await context.broadcasts.start(text, message.chat.id, data.get("segment", "reachable"))
 
     return router
@@ -5,6 +5,9 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
 
+from handlers.callbacks import CallbackRouter
+from ui import pages
+
 from . import AdminContext
 
 
@@ -12,16 +15,16 @@ class EditStates(StatesGroup):
     waiting_page_one = State()
 
 
-def create_router(context: AdminContext) -> Router:
+def create_router(context: AdminContext, callbacks: CallbackRouter) -> Router:
     router = Router()
 
     async def _ensure_admin(callback: CallbackQuery) -> bool:
-        if not callback.from_user or not context.is_admin(callback.from_user.id):
+        if not callback.from_user or not await context.is_admin(callback.from_user.id):
             await callback.answer("Доступ заборонено", show_alert=True)
             return False
         return True
 
-    @router.callback_query(lambda c: c.data == "admin:edit_text")
+    @callbacks.exact("admin:edit_text")
     async def ask_text(callback: CallbackQuery, state: FSMContext) -> None:
         if not await _ensure_admin(callback):
             return
@@ -30,13 +33,14 @@ def create_router(context: AdminContext) -> Router:
 
     @router.message(EditStates.waiting_page_one)
     async def set_text(message: Message, state: FSMContext) -> None:
-        if not context.is_admin(message.from_user.id):
+        if not await context.is_admin(message.from_user.id):
             return
         text = message.text
         if not text:
             await message.answer("Очікую текст")
             return
-        context.content.update_page_one(text)
+        await context.content.update_page_one(text)
+        pages.invalidate()
         await message.answer("Текст оновлено")
         await state.clear()
 
@@ -1,15 +1,28 @@
 from __future__ import annotations
 
+import time
+
 from aiogram import Router
 from aiogram.types import CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from handlers.callbacks import CallbackRouter
 from services.files import tail
 
 from . import AdminContext
 
+METRIC_LABELS = (
+    ("unique_users_started", "Start"),
+    ("buy_clicks", "Buy clicks"),
+    ("purchases_success", "Success"),
+    ("purchases_fail", "Fail"),
+    ("blocked_bot", "Blocked"),
+)
+METRIC_WINDOWS = (15 * 60, 3600, 86400, 7 * 86400)
+LATENCY_TOP = 8
+
 
-def create_router(context: AdminContext) -> Router:
+def create_router(context: AdminContext, callbacks: CallbackRouter) -> Router:
     router = Router()
 
     def _keyboard() -> InlineKeyboardBuilder:
@@ -20,44 +33,52 @@ def create_router(context: AdminContext) -> Router:
         builder.button(text="Користувачі", callback_data="admin:logs:users")
         builder.button(text="Системний лог", callback_data="admin:logs:system")
         builder.button(text="Алерти", callback_data="admin:logs:alerts")
+        builder.button(text="⏱ Затримки", callback_data="admin:logs:latency")
         builder.button(text="⬅️ Назад", callback_data="admin:menu")
-        builder.adjust(2, 2, 2, 1)
+        builder.adjust(2, 2, 2, 1, 1)
         return builder
 
     async def _ensure_admin(callback: CallbackQuery) -> bool:
-        if not callback.from_user or not context.is_admin(callback.from_user.id):
+        if not callback.from_user or not await context.is_admin(callback.from_user.id):
             await callback.answer("Доступ заборонено", show_alert=True)
             return False
         return True
 
-    @router.callback_query(lambda c: c.data == "admin:logs")
+    @callbacks.exact("admin:logs")
     async def open_logs(callback: CallbackQuery) -> None:
         if not callback.message or not await _ensure_admin(callback):
             return
         await callback.message.edit_caption("Логи та статистика", reply_markup=_keyboard().as_markup())
         await callback.answer()
 
-    @router.callback_query(lambda c: c.data == "admin:logs:balance")
+    @callbacks.exact("admin:logs:balance")
     async def balance(callback: CallbackQuery) -> None:
         if not callback.message or not await _ensure_admin(callback):
             return
-        balance_stars = context.storage.compute_balance()
+        balance_stars = await context.storage.compute_balance()
         ton = balance_stars * context.config.guide.ton_per_star
         text = f"Баланс: {balance_stars} ⭐️\n≈ {ton:.4f} TON"
+        now = int(time.time())
+        for label, seconds in (("24 год", 86400), ("7 днів", 7 * 86400)):
+            report = await context.storage.report(now - seconds)
+            text += (
+                f"\nЗа {label}: оплат {report['purchases'].count} на {report['purchases'].amount} ⭐️, "
+                f"інвойсів {report['orders'].count}, ручних операцій {report['ledger'].count} ({report['ledger'].amount:+d} ⭐️)"
+            )
         if context.config.guide.ton_wallet:
             text += f"\nTON гаманець: {context.config.guide.ton_wallet}"
         await callback.message.edit_caption(text, reply_markup=_keyboard().as_markup())
         await callback.answer()
 
-    @router.callback_query(lambda c: c.data == "admin:logs:payments")
+    @callbacks.exact("admin:logs:payments")
     async def payments(callback: CallbackQuery) -> None:
         if not callback.message or not await _ensure_admin(callback):
             return
-        purchases = context.storage.read_purchases(limit=20)
+        purchases = await context.storage.read_purchases(limit=20)
         lines = ["Успішні оплати:"]
         for item in reversed(purchases):
             lines.append(f"• user={item['user_id']} amount={item['amount']} payload={item['payload']} ts={item['ts']}")
-        orders = [o for o in context.storage.read_orders(limit=20) if o.get("status") != "успіх"]
+        orders = [o for o in await context.storage.read_orders(limit=20) if o.get("status") != "успіх"]
         if orders:
             lines.append("\nНевдалі/очікувані:")
             for item in reversed(orders):
@@ -69,11 +90,11 @@ def create_router(context: AdminContext) -> Router:
         await callback.message.edit_caption("\n".join(lines), reply_markup=_keyboard().as_markup())
         await callback.answer()
 
-    @router.callback_query(lambda c: c.data == "admin:logs:orders")
+    @callbacks.exact("admin:logs:orders")
     async def orders(callback: CallbackQuery) -> None:
         if not callback.message or not await _ensure_admin(callback):
             return
-        orders = context.storage.read_orders(limit=100)
+        orders = await context.storage.read_orders(limit=100)
         lines = ["Останні інвойси:"]
         for item in reversed(orders):
             reason = item.get("reason")
@@ -84,12 +105,13 @@ def create_router(context: AdminContext) -> Router:
         await callback.message.edit_caption("\n".join(lines), reply_markup=_keyboard().as_markup())
         await callback.answer()
 
-    @router.callback_query(lambda c: c.data == "admin:logs:users")
+    @callbacks.exact("admin:logs:users")
     async def users(callback: CallbackQuery) -> None:
         if not callback.message or not await _ensure_admin(callback):
             return
-        stats = context.users.stats()
-        metrics = context.metrics.snapshot()
+        stats = await context.users.stats()
+        metrics = await context.metrics.snapshot()
+        windows = await context.metrics.windows(METRIC_WINDOWS)
         text = (
             "Користувачі:\n"
             f"Всього: {stats['total']}\n"
@@ -97,32 +119,51 @@ def create_router(context: AdminContext) -> Router:
             f"Натиснули «Купити»: {stats['buy_clicked']}\n"
             f"Придбали: {stats['purchased']}\n"
             f"Відписались: {stats['blocked']}\n\n"
-            "Метрики:\n"
-            f"Start: {metrics.unique_users_started}\n"
-            f"Buy clicks: {metrics.buy_clicks}\n"
-            f"Success: {metrics.purchases_success}\n"
-            f"Fail: {metrics.purchases_fail}\n"
-            f"Blocked: {metrics.blocked_bot}\n"
+            "Метрики (всього | 15 хв, /хв | 1 год | 24 год | 7 днів):\n"
         )
+        for key, label in METRIC_LABELS:
+            quarter, hour, day, week = windows.get(key, [0] * len(METRIC_WINDOWS))
+            text += f"{label}: {getattr(metrics, key)} | {quarter / 15:.1f} | {hour} | {day} | {week}\n"
         await callback.message.edit_caption(text, reply_markup=_keyboard().as_markup())
         await callback.answer()
 
-    @router.callback_query(lambda c: c.data == "admin:logs:system")
+    @callbacks.exact("admin:logs:system")
     async def system_log(callback: CallbackQuery) -> None:
         if not callback.message or not await _ensure_admin(callback):
             return
-        lines = tail(context.config.logs_dir / "app.log", 40)
+        lines = await context.io.run(tail, context.config.logs_dir / "app.log", 40)
         content = "Останні записи:\n" + "".join(lines[-40:]) if lines else "Логи порожні"
         await callback.message.edit_caption(content[-1024:], reply_markup=_keyboard().as_markup())
         await callback.answer()
 
-    @router.callback_query(lambda c: c.data == "admin:logs:alerts")
+    @callbacks.exact("admin:logs:alerts")
     async def alerts(callback: CallbackQuery) -> None:
         if not callback.message or not await _ensure_admin(callback):
             return
-        data = context.alerts.snapshot()
+        data = await context.alerts.snapshot()
         text = f"Алерти: доставлено={data.get('sent', 0)} помилки={data.get('failed', 0)}"
         await callback.message.edit_caption(text, reply_markup=_keyboard().as_markup())
         await callback.answer()
 
+    @callbacks.exact("admin:logs:latency")
+    async def latency(callback: CallbackQuery) -> None:
+        if not callback.message or not await _ensure_admin(callback):
+            return
+        handlers = context.latency.summary("handlers", limit=LATENCY_TOP)
+        if not handlers:
+            text = "Затримки: ще немає даних"
+        else:
+            lines = ["Найповільніші обробники (p50 / p95 / p99, мс | викликів | помилок):"]
+            for row in handlers:
+                lines.append(
+                    f"• {row.name}: {row.p50 * 1000:.0f} / {row.p95 * 1000:.0f} / {row.p99 * 1000:.0f}"
+                    f" | {row.count} | {row.errors}"
+                )
+            lines.append("\nОновлення за типом:")
+            for row in context.latency.summary("updates"):
+                lines.append(f"• {row.name}: {row.p50 * 1000:.0f} / {row.p95 * 1000:.0f} / {row.p99 * 1000:.0f} | {row.count}")
+            text = "\n".join(lines)
+        await callback.message.edit_caption(caption=text[:1024], reply_markup=_keyboard().as_markup())
+        await callback.answer()
+
     return router
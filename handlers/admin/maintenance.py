@@ -4,10 +4,12 @@ from aiogram import Router
 from aiogram.types import CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from handlers.callbacks import CallbackRouter
+
 from . import AdminContext
 
 
-def create_router(context: AdminContext) -> Router:
+def create_router(context: AdminContext, callbacks: CallbackRouter) -> Router:
     router = Router()
 
     def _keyboard():
@@ -19,7 +21,7 @@ def create_router(context: AdminContext) -> Router:
         return builder.as_markup()
 
     async def _ensure_admin(callback: CallbackQuery) -> bool:
-        if not callback.from_user or not context.is_admin(callback.from_user.id):
+        if not callback.from_user or not await context.is_admin(callback.from_user.id):
             await callback.answer("Доступ заборонено", show_alert=True)
             return False
         return True
@@ -28,19 +30,19 @@ def create_router(context: AdminContext) -> Router:
         state = "увімкнено" if context.config.sales_enabled else "вимкнено"
         return f"Продаж зараз {state}."
 
-    @router.callback_query(lambda c: c.data == "admin:maintenance")
+    @callbacks.exact("admin:maintenance")
     async def open_menu(callback: CallbackQuery) -> None:
         if not callback.message or not await _ensure_admin(callback):
             return
         await callback.message.edit_caption(_text(), reply_markup=_keyboard())
         await callback.answer()
 
-    @router.callback_query(lambda c: c.data == "admin:maintenance:toggle")
+    @callbacks.exact("admin:maintenance:toggle")
     async def toggle(callback: CallbackQuery) -> None:
         if not callback.message or not await _ensure_admin(callback):
             return
         context.config.sales_enabled = not context.config.sales_enabled
-        context.settings.set_sales_enabled(context.config.sales_enabled)
+        await context.settings.set_sales_enabled(context.config.sales_enabled)
         await callback.message.edit_caption(_text(), reply_markup=_keyboard())
         await callback.answer("Стан оновлено")
 
@@ -1,15 +1,22 @@
 from __future__ import annotations
 
 import subprocess
+import time
+from pathlib import Path
 
 from aiogram import Router
 from aiogram.types import CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from handlers.callbacks import CallbackRouter
+from services import files
+
 from . import AdminContext
 
+IO_TOP = 8
+
 
-def create_router(context: AdminContext) -> Router:
+def create_router(context: AdminContext, callbacks: CallbackRouter) -> Router:
     router = Router()
 
     def _keyboard():
@@ -20,13 +27,15 @@ def create_router(context: AdminContext) -> Router:
         if context.config.admin_system.allow_systemd:
             builder.button(text="🔁 Перезапуск", callback_data="admin:system:restart")
             layout.append(1)
+        builder.button(text="📂 Файли", callback_data="admin:system:files")
+        layout.append(1)
         builder.button(text="⬅️ Назад", callback_data="admin:menu")
         layout.append(1)
         builder.adjust(*layout)
         return builder.as_markup()
 
     async def _ensure_admin(callback: CallbackQuery) -> bool:
-        if not callback.from_user or not context.is_admin(callback.from_user.id):
+        if not callback.from_user or not await context.is_admin(callback.from_user.id):
             await callback.answer("Доступ заборонено", show_alert=True)
             return False
         return True
@@ -34,34 +43,82 @@ def create_router(context: AdminContext) -> Router:
     def _text() -> str:
         state = "увімкнено" if context.config.sales_enabled else "на паузі"
         extra = "systemd доступний" if context.config.admin_system.allow_systemd else "systemd заборонено"
-        return f"Стан продажу: {state}\nSystemd: {extra}"
+        io = context.io.stats
+        text = (
+            f"Стан продажу: {state}\nSystemd: {extra}\n\n"
+            f"I/O: черга {io.depth}/{context.io.max_pending} (макс. {io.max_depth}), потоків {context.io.max_workers}\n"
+            f"Очікування: сер. {io.wait_avg * 1000:.1f} мс, макс. {io.wait_max * 1000:.1f} мс\n"
+            f"Виконання: сер. {io.run_avg * 1000:.1f} мс, викликів {io.completed}, помилок {io.failed}\n\n"
+        )
+        if context.config.server.workers > 1:
+            # snapshots, appends and the document cache live in the storage daemon, not this worker
+            return text + "Файли веде демон сховища: див. «📂 Файли»"
+        snap = files.snapshot_stats
+        appended, batches = files.appender_stats()
+        docs = files.document_cache_stats
+        return text + (
+            f"Знімки ({files.get_fsync_policy()}): {snap.writes} записів, {snap.bytes / 1024:.1f} КБ, "
+            f"сер. {snap.avg_seconds * 1000:.2f} мс, макс. {snap.max_seconds * 1000:.2f} мс\n"
+            f"JSONL: {appended} рядків у {batches} групових записах\n"
+            f"Кеш документів: влучань {docs.hits}, перевірок {docs.revalidations}, "
+            f"промахів {docs.misses}, скидань {docs.invalidations}"
+        )
+
+    async def _files_text() -> str:
+        if not context.config.storage.io_stats:
+            return "Статистика файлів вимкнена (IO_STATS=false)"
+        if context.config.server.workers > 1:
+            # files belong to the storage daemon; read its latest dump
+            dumped, entries = await context.io.run(files.load_io_stats, context.config.storage.io_stats_file)
+            if not dumped:
+                return "Файли: демон сховища ще не записав статистику"
+            header = f"Файли (знімок демона {int(time.time()) - dumped} с тому)"
+        else:
+            entries, header = files.io_stats(), "Файли"
+        entries.sort(key=lambda entry: entry.seconds, reverse=True)
+        lines = [f"{header}, мс (очікування flock / утримання / парсинг / серіалізація | прочитано / записано КБ):"]
+        for entry in entries[:IO_TOP]:
+            lines.append(
+                f"• {Path(entry.path).name}: {entry.lock_wait * 1000:.1f} (макс. {entry.max_lock_wait * 1000:.1f})"
+                f" / {entry.lock_held * 1000:.1f} / {entry.parse * 1000:.1f} / {entry.serialize * 1000:.1f}"
+                f" | {entry.bytes_read / 1024:.0f} / {entry.bytes_written / 1024:.0f}"
+            )
+        return "\n".join(lines)
 
-    @router.callback_query(lambda c: c.data == "admin:system")
+    @callbacks.exact("admin:system")
     async def open_menu(callback: CallbackQuery) -> None:
         if not callback.message or not await _ensure_admin(callback):
             return
         await callback.message.edit_caption(_text(), reply_markup=_keyboard())
         await callback.answer()
 
-    @router.callback_query(lambda c: c.data == "admin:system:pause")
+    @callbacks.exact("admin:system:files")
+    async def files_stats(callback: CallbackQuery) -> None:
+        if not callback.message or not await _ensure_admin(callback):
+            return
+        text = await _files_text()
+        await callback.message.edit_caption(caption=text[:1024], reply_markup=_keyboard())
+        await callback.answer()
+
+    @callbacks.exact("admin:system:pause")
     async def pause(callback: CallbackQuery) -> None:
         if not callback.message or not await _ensure_admin(callback):
             return
         context.config.sales_enabled = False
-        context.settings.set_sales_enabled(False)
+        await context.settings.set_sales_enabled(False)
         await callback.message.edit_caption(_text(), reply_markup=_keyboard())
         await callback.answer("Продаж поставлено на паузу")
 
-    @router.callback_query(lambda c: c.data == "admin:system:resume")
+    @callbacks.exact("admin:system:resume")
     async def resume(callback: CallbackQuery) -> None:
         if not callback.message or not await _ensure_admin(callback):
             return
         context.config.sales_enabled = True
-        context.settings.set_sales_enabled(True)
+        await context.settings.set_sales_enabled(True)
         await callback.message.edit_caption(_text(), reply_markup=_keyboard())
         await callback.answer("Продаж відновлено")
 
-    @router.callback_query(lambda c: c.data == "admin:system:restart")
+    @callbacks.exact("admin:system:restart")
     async def restart(callback: CallbackQuery) -> None:
         if not callback.message or not await _ensure_admin(callback):
             return
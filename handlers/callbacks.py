@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Optional, TypeVar, Union
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.types import CallbackQuery
+
+HandlerT = TypeVar("HandlerT", bound=Callable[..., Any])
+
+
+class CallbackRouter:
+    """Callback queries dispatched by ``callback_data`` through dicts instead of one filter per handler.
+
+    ``exact`` routes match the whole string. ``prefix`` routes match a namespace
+    ending in ``:`` followed by one argument without ``:`` (``admin:broadcast:cancel:<id>``).
+    Resolving a callback costs one dict lookup, plus one more for a prefix route.
+    """
+
+    def __init__(self) -> None:
+        self._exact: Dict[str, CallableObject] = {}
+        self._prefixes: Dict[str, CallableObject] = {}
+
+    def exact(self, data: str) -> Callable[[HandlerT], HandlerT]:
+        return self._register(self._exact, data)
+
+    def prefix(self, namespace: str) -> Callable[[HandlerT], HandlerT]:
+        if not namespace.endswith(":"):
+            raise ValueError(f"Callback namespace {namespace!r} must end with ':'")
+        return self._register(self._prefixes, namespace)
+
+    @staticmethod
+    def _register(table: Dict[str, CallableObject], key: str) -> Callable[[HandlerT], HandlerT]:
+        def register(handler: HandlerT) -> HandlerT:
+            if key in table:
+                raise ValueError(f"Callback route {key!r} is registered twice")
+            table[key] = CallableObject(handler)
+            return handler
+
+        return register
+
+    def resolve(self, data: Optional[str]) -> Optional[CallableObject]:
+        if not data:
+            return None
+        handler = self._exact.get(data)
+        if handler is None:
+            head, separator, _ = data.rpartition(":")
+            if separator:
+                handler = self._prefixes.get(head + separator)
+        return handler
+
+    def routes(self) -> List[str]:
+        return sorted(self._exact) + sorted(namespace + "*" for namespace in self._prefixes)
+
+    def as_router(self) -> Router:
+        """A single aiogram callback handler that looks the route up and calls it with the usual injected kwargs."""
+        router = Router(name="callbacks")
+
+        async def route(callback: CallbackQuery) -> Union[bool, Dict[str, Any]]:
+            handler = self.resolve(callback.data)
+            return False if handler is None else {"callback_handler": handler}
+
+        @router.callback_query(route)
+        async def dispatch(callback: CallbackQuery, callback_handler: CallableObject, **kwargs: Any) -> Any:
+            return await callback_handler.call(callback, **kwargs)
+
+        return router
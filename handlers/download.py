@@ -4,19 +4,21 @@ from aiogram import Router
 from aiogram.types import CallbackQuery
 
 from config import Config
+from handlers.callbacks import CallbackRouter
 from services.access import AccessService
+from services.aio import AsyncFacade
 from ui.pages import download_keyboard
 
 
-def create_router(config: Config, access: AccessService):
+def create_router(config: Config, access: AsyncFacade[AccessService], callbacks: CallbackRouter):
     router = Router()
 
-    @router.callback_query(lambda c: c.data == "download:guide")
+    @callbacks.exact("download:guide")
     async def on_download(callback: CallbackQuery) -> None:
         if not callback.from_user or not callback.message:
             return
         user_id = callback.from_user.id
-        if access.has_access(user_id):
+        if await access.has_access(user_id):
             await callback.message.edit_reply_markup(
                 reply_markup=download_keyboard(True, config.guide.url if config.guide.mode == "url" else None)
             )
@@ -1,31 +1,66 @@
 from __future__ import annotations
 
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
 from aiogram import Router
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import CommandStart
 from aiogram.types import CallbackQuery, Message
 
+from services.aio import AsyncFacade
 from services.content import ContentService
+from services.media import MediaCache, MediaRef
 from services.users import UserService
 from services.metrics import MetricsService
 from services.admins import AdminService
 from services.storage import StorageService
 from ui import pages
 from config import Config
+from handlers.callbacks import CallbackRouter
+
+logger = logging.getLogger(__name__)
 
 
 def create_router(
     config: Config,
-    content: ContentService,
-    users: UserService,
-    metrics: MetricsService,
-    admins: AdminService,
-    storage: StorageService,
+    content: AsyncFacade[ContentService],
+    users: AsyncFacade[UserService],
+    metrics: AsyncFacade[MetricsService],
+    admins: AsyncFacade[AdminService],
+    storage: AsyncFacade[StorageService],
+    media: AsyncFacade[MediaCache],
     faq_text: str,
+    callbacks: CallbackRouter,
 ):
     router = Router()
 
-    def _has_admin(user_id: int) -> bool:
-        return user_id in admins.get_admin_ids()
+    async def _has_admin(user_id: int) -> bool:
+        return user_id in await admins.get_admin_ids()
+
+    async def _show(
+        asset: pages.MediaAsset,
+        build: Callable[[Optional[str]], pages.PageData],
+        send: Callable[[pages.PageData], Awaitable[Any]],
+    ) -> None:
+        ref = await media.lookup(asset.path, asset.placeholder)
+        try:
+            sent = await send(build(ref.file_id))
+        except TelegramBadRequest as error:
+            if ref.file_id is None or "file" not in error.message.lower():
+                raise
+            logger.warning("Telegram відхилив file_id для %s, завантажую знову", asset.filename)
+            await media.forget(ref.key)
+            ref = MediaRef(key=ref.key, file_id=None)
+            sent = await send(build(None))
+        if ref.file_id is None and isinstance(sent, Message) and sent.photo:
+            await media.remember(ref.key, sent.photo[-1].file_id)
+
+    def _edit(callback: CallbackQuery) -> Callable[[pages.PageData], Awaitable[Any]]:
+        async def send(page: pages.PageData) -> Any:
+            return await callback.message.edit_media(page.media, reply_markup=page.reply_markup)
+
+        return send
 
     def _username(message: Message) -> str:
         user = message.from_user
@@ -38,43 +73,49 @@ def create_router(
         user = message.from_user
         if not user:
             return
-        metrics.ensure_user("unique_users_started", user.id)
-        users.register_start(user.id, user.username)
-        balance = storage.compute_user_balance(user.id)
-        page = pages.main_page(
-            config,
-            content,
-            _username(message),
-            balance=balance,
-            has_admin=_has_admin(user.id),
-        )
-        await message.answer_photo(
-            photo=page.media.media,
-            caption=page.media.caption,
-            reply_markup=page.reply_markup,
-        )
-
-    @router.callback_query(lambda c: c.data == "page:main")
+        await metrics.ensure_user("unique_users_started", user.id)
+        await users.register_start(user.id, user.username)
+        balance = await storage.compute_user_balance(user.id)
+        template = await content.get_page_one()
+        has_admin = await _has_admin(user.id)
+
+        def build(file_id: Optional[str]) -> pages.PageData:
+            return pages.main_page(config, template, _username(message), balance, has_admin, file_id)
+
+        async def send(page: pages.PageData) -> Message:
+            return await message.answer_photo(
+                photo=page.media.media,
+                caption=page.media.caption,
+                reply_markup=page.reply_markup,
+            )
+
+        await _show(pages.MAIN_ASSET, build, send)
+
+    @callbacks.exact("page:main")
     async def to_main(callback: CallbackQuery) -> None:
         if not callback.message or not callback.from_user:
             return
-        balance = storage.compute_user_balance(callback.from_user.id)
-        page = pages.main_page(
-            config,
-            content,
-            callback.from_user.username or callback.from_user.full_name or "гість",
-            balance=balance,
-            has_admin=_has_admin(callback.from_user.id),
-        )
-        await callback.message.edit_media(page.media, reply_markup=page.reply_markup)
+        balance = await storage.compute_user_balance(callback.from_user.id)
+        template = await content.get_page_one()
+        username = callback.from_user.username or callback.from_user.full_name or "гість"
+        has_admin = await _has_admin(callback.from_user.id)
+
+        def build(file_id: Optional[str]) -> pages.PageData:
+            return pages.main_page(config, template, username, balance, has_admin, file_id)
+
+        await _show(pages.MAIN_ASSET, build, _edit(callback))
         await callback.answer()
 
-    @router.callback_query(lambda c: c.data == "page:faq")
+    @callbacks.exact("page:faq")
     async def to_faq(callback: CallbackQuery) -> None:
         if not callback.message or not callback.from_user:
             return
-        page = pages.faq_page(config, faq_text, has_admin=_has_admin(callback.from_user.id))
-        await callback.message.edit_media(page.media, reply_markup=page.reply_markup)
+        has_admin = await _has_admin(callback.from_user.id)
+
+        def build(file_id: Optional[str]) -> pages.PageData:
+            return pages.faq_page(config, faq_text, has_admin, file_id)
+
+        await _show(pages.FAQ_ASSET, build, _edit(callback))
         await callback.answer()
 
     return router
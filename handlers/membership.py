@@ -4,19 +4,22 @@ from aiogram import Router
 from aiogram.enums import ChatMemberStatus
 from aiogram.types import ChatMemberUpdated
 
+from services.aio import AsyncFacade
 from services.metrics import MetricsService
 from services.users import UserService
 
 
-def create_router(metrics: MetricsService, users: UserService) -> Router:
+def create_router(metrics: AsyncFacade[MetricsService], users: AsyncFacade[UserService]) -> Router:
     router = Router()
 
     @router.my_chat_member()
     async def on_my_chat_member(event: ChatMemberUpdated) -> None:
         new_status = event.new_chat_member.status
         if new_status in {ChatMemberStatus.BANNED, ChatMemberStatus.LEFT, ChatMemberStatus.RESTRICTED}:
-            metrics.increment("blocked_bot")
+            await metrics.increment("blocked_bot")
             if event.from_user:
-                users.mark_blocked(event.from_user.id)
+                await users.mark_blocked(event.from_user.id)
+        elif new_status == ChatMemberStatus.MEMBER and event.from_user:
+            await users.mark_unblocked(event.from_user.id)
 
     return router
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject, Update
+
+from services.latency import LatencyRegistry
+
+Handler = Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]]
+
+
+class UpdateLatencyMiddleware(BaseMiddleware):
+    """Outer ``update`` middleware: the whole update, routing included, per update type."""
+
+    def __init__(self, registry: LatencyRegistry) -> None:
+        self.registry = registry
+
+    async def __call__(self, handler: Handler, event: TelegramObject, data: Dict[str, Any]) -> Any:
+        started = time.perf_counter()
+        error = False
+        try:
+            return await handler(event, data)
+        except Exception:
+            error = True
+            raise
+        finally:
+            update_type = event.event_type if isinstance(event, Update) else type(event).__name__
+            self.registry.observe_update(update_type, time.perf_counter() - started, error)
+
+
+class HandlerLatencyMiddleware(BaseMiddleware):
+    """Inner middleware: the matched handler only, named ``<module under handlers>.<function>``."""
+
+    def __init__(self, registry: LatencyRegistry) -> None:
+        self.registry = registry
+        self._names: Dict[Callable[..., Any], str] = {}
+
+    def _name(self, callback: Callable[..., Any]) -> str:
+        name = self._names.get(callback)
+        if name is None:
+            module = getattr(callback, "__module__", "") or ""
+            name = self._names[callback] = f"{module.removeprefix('handlers.')}.{getattr(callback, '__name__', callback)}"
+        return name
+
+    async def __call__(self, handler: Handler, event: TelegramObject, data: Dict[str, Any]) -> Any:
+        # a CallbackRouter route is dispatched through one shared aiogram handler
+        target = data.get("callback_handler") or data["handler"]
+        started = time.perf_counter()
+        error = False
+        try:
+            return await handler(event, data)
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.registry.observe_handler(self._name(target.callback), time.perf_counter() - started, error)
+
+
+def install_latency(dp: Dispatcher, registry: LatencyRegistry) -> None:
+    dp.update.outer_middleware(UpdateLatencyMiddleware(registry))
+    handlers = HandlerLatencyMiddleware(registry)
+    for name, observer in dp.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(handlers)
@@ -1,11 +1,11 @@
 from __future__ import annotations
 
 import time
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Set
 
-from services.files import locked_file, read_json, write_json
+from services.journal import JournaledTable
 
 
 @dataclass(slots=True)
@@ -16,31 +16,32 @@ class AccessRecord:
 
 
 class AccessService:
+    """Access records resident in a ``JournaledTable``; ``has_access`` is a set lookup."""
+
     def __init__(self, path: Path) -> None:
         self.path = path
+        self.table = JournaledTable(path)
+        self._granted: Set[int] = {
+            int(user_id) for user_id, record in self.table.items() if record.get("has_access")
+        }
 
     def load(self) -> Dict[str, dict]:
-        return read_json(self.path, default={})
+        return dict(self.table.items())
 
     def set_access(self, user_id: int, charge_id: str) -> AccessRecord:
-        now = int(time.time())
-        data = self.load()
-        record = {
-            "has_access": True,
-            "last_charge_id": charge_id,
-            "ts": now,
-        }
-        data[str(user_id)] = record
-        write_json(self.path, data)
-        return AccessRecord(**record)
+        record = AccessRecord(has_access=True, last_charge_id=charge_id, ts=int(time.time()))
+        self.table.put(str(user_id), asdict(record))
+        self._granted.add(user_id)
+        return record
 
     def has_access(self, user_id: int) -> bool:
-        data = self.load()
-        return data.get(str(user_id), {}).get("has_access", False)
+        return user_id in self._granted
 
     def get(self, user_id: int) -> AccessRecord | None:
-        data = self.load()
-        record = data.get(str(user_id))
+        record = self.table.get(str(user_id))
         if not record:
             return None
         return AccessRecord(**record)
+
+    def flush(self) -> None:
+        self.table.compact()
@@ -1,26 +1,31 @@
 from __future__ import annotations
 
+import threading
 from pathlib import Path
-from typing import List, Set
+from typing import Any, FrozenSet, Set, Tuple
 
-from services.files import read_json, write_json
+from services.files import read_json, read_json_cached, write_json
 
 
 class AdminService:
     def __init__(self, path: Path, initial: Set[int]) -> None:
         self.path = path
         self.initial = set(initial)
+        self._lock = threading.Lock()
+        self._cached: Tuple[Any, FrozenSet[int]] = (None, frozenset(self.initial))
 
-    def _load(self) -> Set[int]:
-        data = read_json(self.path, default={"extra": []})
-        return self.initial | set(data.get("extra", []))
+    def get_admin_ids(self) -> FrozenSet[int]:
+        data = read_json_cached(self.path, default={"extra": []})
+        source, ids = self._cached
+        if data is not source:
+            ids = frozenset(self.initial | set(data.get("extra", [])))
+            self._cached = (data, ids)
+        return ids
 
-    def get_admin_ids(self) -> Set[int]:
-        return self._load()
-
-    def add_admin(self, user_id: int) -> Set[int]:
-        data = read_json(self.path, default={"extra": []})
-        extra = set(data.get("extra", []))
-        extra.add(user_id)
-        write_json(self.path, {"extra": sorted(extra)})
-        return self._load()
+    def add_admin(self, user_id: int) -> FrozenSet[int]:
+        with self._lock:
+            data = read_json(self.path, default={"extra": []})
+            extra = set(data.get("extra", []))
+            extra.add(user_id)
+            write_json(self.path, {"extra": sorted(extra)})
+        return self.get_admin_ids()
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Generic, Optional, TypeVar
+
+from services.files import deferred_acks
+
+logger = logging.getLogger(__name__)
+
+ServiceT = TypeVar("ServiceT")
+ResultT = TypeVar("ResultT")
+
+
+@dataclass(slots=True)
+class IOStats:
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    depth: int = 0
+    max_depth: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+    run_total: float = 0.0
+
+    @property
+    def wait_avg(self) -> float:
+        return self.wait_total / self.completed if self.completed else 0.0
+
+    @property
+    def run_avg(self) -> float:
+        return self.run_total / self.completed if self.completed else 0.0
+
+
+class IOExecutor:
+    """Bounded thread pool for blocking storage calls made from handlers.
+
+    At most ``max_pending`` calls are queued or running; further callers wait
+    on a semaphore. Depth and wait time are tracked on the event loop thread.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int) -> None:
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="storage-io")
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.stats = IOStats()
+
+    async def run(self, fn: Callable[..., ResultT], *args: Any, **kwargs: Any) -> ResultT:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        stats = self.stats
+        enqueued = time.perf_counter()
+        stats.submitted += 1
+        stats.depth += 1
+        stats.max_depth = max(stats.max_depth, stats.depth)
+        started: list[float] = []
+
+        def job() -> ResultT:
+            started.append(time.perf_counter())
+            return fn(*args, **kwargs)
+
+        try:
+            async with self._slots:
+                return await asyncio.get_running_loop().run_in_executor(self._pool, job)
+        except BaseException:
+            stats.failed += 1
+            raise
+        finally:
+            finished = time.perf_counter()
+            stats.depth -= 1
+            stats.completed += 1
+            if started:
+                wait = started[0] - enqueued
+                stats.wait_total += wait
+                stats.wait_max = max(stats.wait_max, wait)
+                stats.run_total += finished - started[0]
+
+    async def every(self, interval: float, fn: Callable[[], Any]) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.run(fn)
+            except Exception:
+                logger.exception("Фонове завдання %s завершилось помилкою", getattr(fn, "__qualname__", fn))
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+class AsyncFacade(Generic[ServiceT]):
+    """Awaitable view of a synchronous service: every method call runs on the I/O executor.
+
+    Journal acks the call queues are awaited on the event loop after it
+    returns, so the pool thread is free while the group commit is pending and
+    appends from many coroutines share one write.
+    """
+
+    def __init__(self, service: ServiceT, executor: IOExecutor) -> None:
+        self.sync = service
+        self.executor = executor
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.sync, name)
+        if not callable(attr):
+            return attr
+
+        def run(*args: Any, **kwargs: Any) -> Any:
+            with deferred_acks() as acks:
+                return attr(*args, **kwargs), acks
+
+        @functools.wraps(attr)
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            result, acks = await self.executor.run(run, *args, **kwargs)
+            for ack in acks:
+                await asyncio.wrap_future(ack)
+            return result
+
+        setattr(self, name, call)
+        return call
@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from services.aio import AsyncFacade
+from services.alerts import AlertService
+from services.files import read_json, write_json
+from services.users import UserService
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class BroadcastJob:
+    job_id: str
+    text: str
+    admin_chat_id: int
+    progress_message_id: Optional[int]
+    total: int
+    segment: str = "reachable"
+    cursor: int = 0
+    sent: int = 0
+    failed: int = 0
+    status: str = "running"
+    created: int = 0
+
+
+class BroadcastStore:
+    """Jobs in ``directory``: ``<id>.json`` is the checkpoint, ``<id>.users.json`` the recipient list.
+
+    Finished and cancelled jobs are moved to ``archive/``, so polling for
+    unfinished jobs reads only the live ones.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.archive = directory / "archive"
+
+    def _path(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.json"
+
+    def _users_path(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.users.json"
+
+    def create(self, job: BroadcastJob, user_ids: List[int]) -> None:
+        write_json(self._users_path(job.job_id), user_ids)
+        self.save(job)
+
+    def save(self, job: BroadcastJob) -> None:
+        write_json(self._path(job.job_id), asdict(job))
+        if job.status != "running":
+            self._archive(job.job_id)
+
+    def _archive(self, job_id: str) -> None:
+        # the final checkpoint is already on disk: a crash here leaves a finished job in place, archived next poll
+        self.archive.mkdir(parents=True, exist_ok=True)
+        for path in (self._users_path(job_id), self._path(job_id)):
+            if path.exists():
+                os.replace(path, self.archive / path.name)
+        self._cancel_marker(job_id).unlink(missing_ok=True)
+
+    def _cancel_marker(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.cancel"
+
+    def request_cancel(self, job_id: str) -> bool:
+        """Ask whichever process runs ``job_id`` to stop it at its next checkpoint."""
+        data = read_json(self._path(job_id), default=None)
+        if not data or data.get("status") != "running":
+            return False
+        self._cancel_marker(job_id).touch()
+        return True
+
+    def cancel_requested(self, job_id: str) -> bool:
+        return self._cancel_marker(job_id).exists()
+
+    def recipients(self, job_id: str) -> List[int]:
+        return read_json(self._users_path(job_id), default=[])
+
+    def unfinished(self) -> List[BroadcastJob]:
+        jobs = []
+        for path in sorted(self.directory.glob("*.json")):
+            if path.name.endswith(".users.json"):
+                continue
+            data = read_json(path, default=None)
+            if data and data.get("status") == "running":
+                jobs.append(BroadcastJob(**data))
+            elif data:
+                self._archive(path.stem)
+        return jobs
+
+
+class TokenBucket:
+    """``rate`` tokens per second, up to ``burst`` at once; ``pause`` blocks every taker."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class _Progress:
+    """Low watermark over out-of-order completions: every index below ``cursor`` is done."""
+
+    def __init__(self, cursor: int) -> None:
+        self.cursor = cursor
+        self._done: Set[int] = set()
+
+    def complete(self, index: int) -> None:
+        self._done.add(index)
+        while self.cursor in self._done:
+            self._done.remove(self.cursor)
+            self.cursor += 1
+
+
+class BroadcastEngine:
+    """Background broadcasts: ``workers`` senders share one token bucket.
+
+    Progress (a low-watermark cursor and counters) is checkpointed every
+    ``progress_interval`` seconds together with the alert counters and the
+    admin's progress message, so a restart resumes from the last checkpoint;
+    recipients between the checkpoint and the crash may get the message twice.
+    A cancel made in another process reaches the job at its next checkpoint.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        store: AsyncFacade[BroadcastStore],
+        users: AsyncFacade[UserService],
+        alerts: AsyncFacade[AlertService],
+        *,
+        rate: float = 25.0,
+        workers: int = 8,
+        progress_interval: float = 5.0,
+        runner: bool = True,
+    ) -> None:
+        self.bot = bot
+        self.store = store
+        self.users = users
+        self.alerts = alerts
+        self.bucket = TokenBucket(rate, burst=max(1, int(rate)))
+        self.workers = workers
+        self.progress_interval = progress_interval
+        self.runner = runner
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._cancelled: Set[str] = set()
+
+    async def start(self, text: str, admin_chat_id: int, segment: str = "reachable") -> BroadcastJob:
+        user_ids = await self.users.segment(segment)
+        job = BroadcastJob(
+            job_id=time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6],
+            text=text,
+            admin_chat_id=admin_chat_id,
+            progress_message_id=None,
+            total=len(user_ids),
+            segment=segment,
+            created=int(time.time()),
+        )
+        progress = await self.bot.send_message(
+            admin_chat_id, self._progress_text(job, None), reply_markup=self._markup(job)
+        )
+        job.progress_message_id = progress.message_id
+        await self.store.create(job, user_ids)
+        if self.runner:
+            self._spawn(job, user_ids)
+        return job
+
+    async def resume(self) -> None:
+        for job in await self.store.unfinished():
+            if job.job_id in self._tasks:
+                continue
+            logger.info("Продовжую розсилку %s з %s/%s", job.job_id, job.cursor, job.total)
+            self._spawn(job, await self.store.recipients(job.job_id))
+
+    async def watch(self, interval: float) -> None:
+        """Pick up jobs created by engines with ``runner=False`` (other worker processes)."""
+        while True:
+            try:
+                await self.resume()
+            except Exception:
+                logger.exception("Не вдалося перевірити чергу розсилок")
+            await asyncio.sleep(interval)
+
+    async def cancel(self, job_id: str) -> bool:
+        if job_id in self._tasks:
+            self._cancelled.add(job_id)
+            return True
+        return await self.store.request_cancel(job_id)
+
+    def active(self) -> List[str]:
+        return list(self._tasks)
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _spawn(self, job: BroadcastJob, user_ids: List[int]) -> None:
+        task = asyncio.create_task(self._run(job, user_ids))
+        self._tasks[job.job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.job_id, None))
+
+    async def _deliver(self, user_id: int, text: str) -> bool:
+        while True:
+            await self.bucket.acquire()
+            try:
+                await self.bot.send_message(user_id, text)
+                return True
+            except TelegramRetryAfter as error:
+                logger.warning("Telegram просить зачекати %s с під час розсилки", error.retry_after)
+                self.bucket.pause(error.retry_after)
+            except TelegramForbiddenError:
+                try:
+                    await self.users.mark_blocked(user_id)
+                except Exception:
+                    logger.exception("Не вдалося позначити користувача %s як заблокованого", user_id)
+                return False
+            except TelegramAPIError as error:
+                logger.info("Розсилка користувачу %s не вдалася: %s", user_id, error)
+                return False
+            except Exception:
+                # one recipient must not stop the job: an escaped error would leave it "running" below its cursor
+                logger.exception("Розсилка користувачу %s завершилась помилкою", user_id)
+                return False
+
+    async def _run(self, job: BroadcastJob, user_ids: List[int]) -> None:
+        progress = _Progress(job.cursor)
+        pending: Iterator[int] = iter(range(job.cursor, len(user_ids)))
+        counts = {"sent": 0, "failed": 0}
+        started = time.monotonic()
+        start_cursor = job.cursor
+
+        async def worker() -> None:
+            for index in pending:
+                if job.job_id in self._cancelled:
+                    return
+                key = "sent" if await self._deliver(user_ids[index], job.text) else "failed"
+                counts[key] += 1
+                progress.complete(index)
+
+        async def checkpoint() -> None:
+            if await self.store.cancel_requested(job.job_id):
+                self._cancelled.add(job.job_id)
+            job.cursor = progress.cursor
+            job.sent += counts["sent"]
+            job.failed += counts["failed"]
+            for key, amount in counts.items():
+                if amount:
+                    await self.alerts.increment(key, amount)
+                counts[key] = 0
+            await self.store.save(job)
+            rate = (job.cursor - start_cursor) / max(time.monotonic() - started, 1e-6)
+            await self._report(job, rate)
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.workers)]
+        try:
+            while not all(task.done() for task in workers):
+                await asyncio.wait(workers, timeout=self.progress_interval)
+                if not all(task.done() for task in workers):
+                    await checkpoint()
+            await asyncio.gather(*workers)
+            job.status = "cancelled" if job.job_id in self._cancelled else "done"
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            try:
+                await asyncio.shield(checkpoint())
+            finally:
+                # after the checkpoint, which re-adds the id when a cancel was requested
+                self._cancelled.discard(job.job_id)
+
+    def _progress_text(self, job: BroadcastJob, rate: Optional[float]) -> str:
+        done = job.sent + job.failed
+        text = f"Розсилка {job.job_id}: {job.cursor}/{job.total}, успішно {job.sent}, помилки {job.failed}"
+        if job.status == "done":
+            return f"Розсилку завершено. Успішно: {job.sent}, помилки: {job.failed}"
+        if job.status == "cancelled":
+            return f"Розсилку зупинено на {job.cursor}/{job.total}. Успішно: {job.sent}, помилки: {job.failed}"
+        if rate:
+            eta = (job.total - job.cursor) / rate
+            text += f"\n{rate:.1f} повідомл./с, залишилось ≈ {int(eta // 60)} хв {int(eta % 60)} с"
+        elif not done:
+            text += "\nПочинаю…"
+        return text
+
+    def _markup(self, job: BroadcastJob) -> Optional[InlineKeyboardMarkup]:
+        if job.status != "running":
+            return None
+        builder = InlineKeyboardBuilder()
+        builder.button(text="⏹ Зупинити", callback_data=f"admin:broadcast:cancel:{job.job_id}")
+        return builder.as_markup()
+
+    async def _report(self, job: BroadcastJob, rate: float) -> None:
+        if job.progress_message_id is None:
+            return
+        try:
+            await self.bot.edit_message_text(
+                self._progress_text(job, rate),
+                chat_id=job.admin_chat_id,
+                message_id=job.progress_message_id,
+                reply_markup=self._markup(job),
+            )
+        except Exception:
+            logger.debug("Не вдалося оновити прогрес розсилки %s", job.job_id, exc_info=True)
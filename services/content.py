@@ -1,8 +1,9 @@
 from __future__ import annotations
 
+import threading
 from pathlib import Path
 
-from services.files import read_json, write_json
+from services.files import read_json, read_json_cached, write_json
 
 DEFAULT_PAGE_ONE = (
     "✨ Ласкаво просимо, {username}!\n"
@@ -26,21 +27,24 @@ DEFAULT_FAQ = (
 class ContentService:
     def __init__(self, path: Path) -> None:
         self.path = path
+        self._lock = threading.Lock()
 
     def get_page_one(self) -> str:
-        data = read_json(self.path, default={})
+        data = read_json_cached(self.path, default={})
         return data.get("page_one", DEFAULT_PAGE_ONE)
 
     def get_faq(self) -> str:
-        data = read_json(self.path, default={})
+        data = read_json_cached(self.path, default={})
         return data.get("faq", DEFAULT_FAQ)
 
     def update_page_one(self, text: str) -> None:
-        data = read_json(self.path, default={})
-        data["page_one"] = text
-        write_json(self.path, data)
+        with self._lock:
+            data = read_json(self.path, default={})
+            data["page_one"] = text
+            write_json(self.path, data)
 
     def update_faq(self, text: str) -> None:
-        data = read_json(self.path, default={})
-        data["faq"] = text
-        write_json(self.path, data)
+        with self._lock:
+            data = read_json(self.path, default={})
+            data["faq"] = text
+            write_json(self.path, data)
@@ -1,54 +1,683 @@
 from __future__ import annotations
 
 import fcntl
+import logging
+import os
+import struct
+import threading
+import time
+from concurrent.futures import Future
 from contextlib import contextmanager
+from dataclasses import asdict, dataclass, replace
 from pathlib import Path
-from typing import Generator, IO
+from typing import Any, Dict, Generator, IO, Iterator, List, Optional, Tuple
 
+logger = logging.getLogger(__name__)
 
-@contextmanager
-def locked_file(path: Path, mode: str) -> Generator[IO[str], None, None]:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open(mode, encoding="utf-8") as file_obj:
-        fcntl.flock(file_obj.fileno(), fcntl.LOCK_EX)
+
+class PathLock:
+    """In-process reader/writer lock for one path, taken before ``flock``.
+
+    Threads of this process queue here on a condition variable, so ``flock``
+    only arbitrates between processes. Waiting writers block new readers.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def shared(self) -> Generator[None, None, None]:
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self) -> Generator[None, None, None]:
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
         try:
-            yield file_obj
+            yield
         finally:
-            fcntl.flock(file_obj.fileno(), fcntl.LOCK_UN)
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+_path_locks: Dict[str, PathLock] = {}
+_path_locks_guard = threading.Lock()
+
+
+def path_lock(path: Path) -> PathLock:
+    key = os.path.abspath(path)
+    lock = _path_locks.get(key)
+    if lock is None:
+        with _path_locks_guard:
+            lock = _path_locks.setdefault(key, PathLock())
+    return lock
+
+
+@dataclass(slots=True)
+class PathIOStats:
+    """Per-path totals: flock wait vs hold, bytes moved, JSON parse/serialize time."""
+
+    path: str
+    locks: int = 0
+    lock_wait: float = 0.0
+    max_lock_wait: float = 0.0
+    lock_held: float = 0.0
+    max_lock_held: float = 0.0
+    reads: int = 0
+    bytes_read: int = 0
+    writes: int = 0
+    bytes_written: int = 0
+    parse: float = 0.0
+    serialize: float = 0.0
+
+    @property
+    def seconds(self) -> float:
+        return self.lock_wait + self.lock_held + self.parse + self.serialize
+
+
+# None while disabled: every hook below is then a single global lookup
+_io_stats: Optional[Dict[str, PathIOStats]] = None
+_io_stats_lock = threading.Lock()
+
+
+def set_io_stats(enabled: bool) -> None:
+    global _io_stats
+    if enabled and _io_stats is None:
+        _io_stats = {}
+    elif not enabled:
+        _io_stats = None
+
+
+def io_stats_enabled() -> bool:
+    return _io_stats is not None
+
+
+def io_stats() -> List[PathIOStats]:
+    stats = _io_stats
+    if stats is None:
+        return []
+    with _io_stats_lock:
+        return [replace(entry) for entry in stats.values()]
+
+
+def reset_io_stats() -> None:
+    with _io_stats_lock:
+        if _io_stats is not None:
+            _io_stats.clear()
+
+
+def _io_entry(stats: Dict[str, PathIOStats], path: Path) -> PathIOStats:
+    name = path.name
+    # write_bytes locks ``.<name>.lock``: account it to the file it guards
+    if name.startswith(".") and name.endswith(".lock"):
+        path = path.with_name(name[1:-5])
+    key = str(path)
+    entry = stats.get(key)
+    if entry is None:
+        entry = stats[key] = PathIOStats(key)
+    return entry
+
+
+def _account_lock(path: Path, wait: float, held: float) -> None:
+    stats = _io_stats
+    if stats is None:
+        return
+    with _io_stats_lock:
+        entry = _io_entry(stats, path)
+        entry.locks += 1
+        entry.lock_wait += wait
+        entry.max_lock_wait = max(entry.max_lock_wait, wait)
+        entry.lock_held += held
+        entry.max_lock_held = max(entry.max_lock_held, held)
+
+
+def _account_read(path: Path, size: int, parse: float = 0.0) -> None:
+    stats = _io_stats
+    if stats is None:
+        return
+    with _io_stats_lock:
+        entry = _io_entry(stats, path)
+        entry.reads += 1
+        entry.bytes_read += size
+        entry.parse += parse
+
+
+def _account_write(path: Path, size: int, serialize: float = 0.0, *, count: int = 1) -> None:
+    stats = _io_stats
+    if stats is None:
+        return
+    with _io_stats_lock:
+        entry = _io_entry(stats, path)
+        entry.writes += count
+        entry.bytes_written += size
+        entry.serialize += serialize
+
+
+def dump_io_stats(path: Path) -> None:
+    """Write the current per-path totals for ``tools.io_stats`` and the admin screen of other processes."""
+    if _io_stats is None:
+        return
+    import ujson
+
+    payload = {"pid": os.getpid(), "ts": int(time.time()), "paths": [asdict(entry) for entry in io_stats()]}
+    write_bytes(path, ujson.dumps(payload, ensure_ascii=False).encode("utf-8"))
+
+
+def load_io_stats(path: Path) -> Tuple[int, List[PathIOStats]]:
+    """(dump timestamp, entries) from ``dump_io_stats``; (0, []) if there is no dump yet."""
+    data = read_json(path, default=None)
+    if not data:
+        return 0, []
+    return data.get("ts", 0), [PathIOStats(**entry) for entry in data.get("paths", [])]
+
+
+def _is_read_mode(mode: str) -> bool:
+    return not any(flag in mode for flag in "wax+")
+
+
+@contextmanager
+def locked_file(path: Path, mode: str, *, shared: Optional[bool] = None) -> Generator[IO, None, None]:
+    """Open ``path`` under a shared lock for read modes and an exclusive one otherwise."""
+    if shared is None:
+        shared = _is_read_mode(mode)
+    if not _is_read_mode(mode):
+        path.parent.mkdir(parents=True, exist_ok=True)
+    local = path_lock(path)
+    started = time.perf_counter() if _io_stats is not None else 0.0
+    with local.shared() if shared else local.exclusive():
+        encoding = None if "b" in mode else "utf-8"
+        with path.open(mode, encoding=encoding) as file_obj:
+            fcntl.flock(file_obj.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            acquired = time.perf_counter() if started else 0.0
+            try:
+                yield file_obj
+            finally:
+                fcntl.flock(file_obj.fileno(), fcntl.LOCK_UN)
+                if started:
+                    _account_lock(path, acquired - started, time.perf_counter() - acquired)
 
 
 def read_json(path: Path, *, default):
     if not path.exists():
         return default
-    with locked_file(path, "r") as file_obj:
+    with locked_file(path, "rb") as file_obj:
         content = file_obj.read()
     if not content:
         return default
     import ujson
 
-    return ujson.loads(content)
+    if _io_stats is None:
+        return ujson.loads(content)
+    started = time.perf_counter()
+    value = ujson.loads(content)
+    _account_read(path, len(content), time.perf_counter() - started)
+    return value
+
+
+FSYNC_POLICIES = ("never", "on-rename", "always")
+_fsync_policy = "on-rename"
+
+
+def set_fsync_policy(policy: str) -> None:
+    """``never``: rely on the page cache; ``on-rename``: fsync a snapshot before it
+    replaces the old one; ``always``: also fsync the directory and every JSONL append."""
+    global _fsync_policy
+    if policy not in FSYNC_POLICIES:
+        raise ValueError(f"Unknown fsync policy '{policy}', expected one of {', '.join(FSYNC_POLICIES)}")
+    _fsync_policy = policy
+
+
+def get_fsync_policy() -> str:
+    return _fsync_policy
+
+
+@dataclass(slots=True)
+class SnapshotWriteStats:
+    writes: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    @property
+    def avg_seconds(self) -> float:
+        return self.seconds / self.writes if self.writes else 0.0
+
+
+snapshot_stats = SnapshotWriteStats()
+_snapshot_stats_lock = threading.Lock()
+
+
+def _fsync_dir(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
 
 
 def write_json(path: Path, data) -> None:
+    """Replace ``path`` atomically: readers see either the old or the new document."""
+    import ujson
+
+    started = time.perf_counter()
+    payload = ujson.dumps(data, ensure_ascii=False).encode("utf-8")
+    write_bytes(path, payload, serialize=time.perf_counter() - started)
+
+
+def write_bytes(path: Path, payload: bytes, *, serialize: float = 0.0) -> None:
+    started = time.perf_counter()
+    policy = _fsync_policy
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lock_path = path.with_name(f".{path.name}.lock")
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with locked_file(lock_path, "a"):
+        try:
+            with tmp_path.open("wb") as file_obj:
+                file_obj.write(payload)
+                file_obj.flush()
+                if policy != "never":
+                    os.fsync(file_obj.fileno())
+            os.replace(tmp_path, path)
+            invalidate_document(path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        if policy == "always":
+            _fsync_dir(path.parent)
+    elapsed = time.perf_counter() - started
+    with _snapshot_stats_lock:
+        snapshot_stats.writes += 1
+        snapshot_stats.bytes += len(payload)
+        snapshot_stats.seconds += elapsed
+        snapshot_stats.max_seconds = max(snapshot_stats.max_seconds, elapsed)
+    _account_write(path, len(payload), serialize)
+
+
+@dataclass(slots=True)
+class DocumentCacheStats:
+    hits: int = 0
+    misses: int = 0
+    revalidations: int = 0
+    invalidations: int = 0
+
+
+@dataclass(slots=True)
+class _CachedDocument:
+    key: Optional[Tuple[int, int, int]]
+    value: Any
+    checked: float
+    watched: bool
+
+
+document_cache_stats = DocumentCacheStats()
+_documents: Dict[Path, _CachedDocument] = {}
+_document_generations: Dict[Path, int] = {}
+_documents_lock = threading.Lock()
+_document_interval = 1.0
+_inotify: Optional["_InotifyWatcher"] = None
+
+
+def set_document_cache_interval(seconds: float) -> None:
+    global _document_interval
+    _document_interval = seconds
+
+
+def _stat_key(path: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def invalidate_document(path: Path) -> None:
+    with _documents_lock:
+        _document_generations[path] = _document_generations.get(path, 0) + 1
+        if _documents.pop(path, None) is not None:
+            document_cache_stats.invalidations += 1
+
+
+def read_json_cached(path: Path, *, default):
+    """Like ``read_json``, but keeps the parsed document until the file changes.
+
+    The file is stat-ed at most once per ``set_document_cache_interval`` and
+    re-read only when its (inode, mtime_ns, size) differs; with inotify enabled
+    a watched file is not stat-ed at all. ``write_json`` invalidates the entry,
+    so writes from this process are visible immediately. The returned object is
+    shared between callers and must not be mutated.
+    """
+    now = time.monotonic()
+    with _documents_lock:
+        entry = _documents.get(path)
+        if entry is not None and (entry.watched or now - entry.checked < _document_interval):
+            document_cache_stats.hits += 1
+            return default if entry.key is None else entry.value
+        generation = _document_generations.get(path, 0)
+    key = _stat_key(path)
+    if entry is not None and key == entry.key:
+        with _documents_lock:
+            entry.checked = now
+            document_cache_stats.revalidations += 1
+        return default if key is None else entry.value
+    value = read_json(path, default=None) if key is not None else None
+    watched = _inotify is not None and _inotify.watch(path.parent)
+    with _documents_lock:
+        document_cache_stats.misses += 1
+        if _document_generations.get(path, 0) == generation:
+            _documents[path] = _CachedDocument(key=key, value=value, checked=now, watched=watched)
+    return default if value is None else value
+
+
+class _InotifyWatcher:
+    """Invalidates cached documents when files in watched directories change (Linux only)."""
+
+    _MASK = 0x00000008 | 0x00000080 | 0x00000100 | 0x00000200 | 0x00000002  # CLOSE_WRITE MOVED_TO CREATE DELETE MODIFY
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self) -> None:
+        import ctypes
+        import ctypes.util
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, Path] = {}
+        self._watched: Dict[Path, bool] = {}
+        self._lock = threading.Lock()
+        threading.Thread(target=self._run, name="doc-cache-inotify", daemon=True).start()
+
+    def watch(self, directory: Path) -> bool:
+        with self._lock:
+            watched = self._watched.get(directory)
+            if watched is None:
+                descriptor = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), self._MASK)
+                watched = descriptor >= 0
+                if watched:
+                    self._dirs[descriptor] = directory
+                self._watched[directory] = watched
+            return watched
+
+    def _run(self) -> None:
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except OSError:
+                return
+            position = 0
+            while position + self._EVENT.size <= len(data):
+                descriptor, _, _, length = self._EVENT.unpack_from(data, position)
+                position += self._EVENT.size
+                name = data[position:position + length].rstrip(b"\0")
+                position += length
+                directory = self._dirs.get(descriptor)
+                if directory is not None and name:
+                    invalidate_document(directory / os.fsdecode(name))
+
+
+def enable_document_inotify() -> bool:
+    """Switch the document cache to inotify invalidation; False if unavailable."""
+    global _inotify
+    if _inotify is not None:
+        return True
+    try:
+        _inotify = _InotifyWatcher()
+    except (OSError, AttributeError):
+        logger.warning("inotify недоступний, кеш документів перевірятиме mtime")
+        return False
+    with _documents_lock:
+        _documents.clear()
+    return True
+
+
+class GroupCommitAppender:
+    """Single writer thread for one JSONL file that coalesces concurrent appends.
+
+    ``submit`` queues a record and returns a future that resolves to the line's
+    byte offset once the batch holding it has been written and flushed (and
+    fsynced under the ``always`` policy). The writer waits up to ``max_delay``
+    after the first queued record so that appends arriving meanwhile share one
+    write.
+    """
+
+    def __init__(self, path: Path, *, max_delay: float, max_batch: int = 1024) -> None:
+        self.path = path
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.batches = 0
+        self.records = 0
+        self._cond = threading.Condition(threading.Lock())
+        self._queue: List[Tuple[bytes, Future]] = []
+        self._thread = threading.Thread(target=self._run, name=f"append-{path.name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, data) -> "Future[int]":
+        import ujson
+
+        started = time.perf_counter() if _io_stats is not None else 0.0
+        line = ujson.dumps(data, ensure_ascii=False).encode("utf-8") + b"\n"
+        if started:
+            _account_write(self.path, 0, time.perf_counter() - started, count=0)
+        future: Future = Future()
+        with self._cond:
+            self._queue.append((line, future))
+            if len(self._queue) == 1 or len(self._queue) >= self.max_batch:
+                self._cond.notify()
+        return future
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                if self.max_delay > 0:
+                    deadline = time.monotonic() + self.max_delay
+                    while len(self._queue) < self.max_batch:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                batch, self._queue = self._queue, []
+            try:
+                self._commit(batch)
+            except Exception:
+                logger.exception("Груповий запис у %s завершився помилкою", self.path)
+
+    def _commit(self, batch: List[Tuple[bytes, Future]]) -> None:
+        # an ack cancelled by its awaiter is left unresolved, but its line is still
+        # written: the caller has already applied the change in memory
+        live = [future.set_running_or_notify_cancel() for _, future in batch]
+        try:
+            with locked_file(self.path, "ab") as file_obj:
+                offset = os.fstat(file_obj.fileno()).st_size
+                file_obj.write(b"".join(line for line, _ in batch))
+                file_obj.flush()
+                if _fsync_policy == "always":
+                    os.fsync(file_obj.fileno())
+        except BaseException as exc:
+            for (_, future), running in zip(batch, live):
+                if running:
+                    future.set_exception(exc)
+            return
+        self.batches += 1
+        self.records += len(batch)
+        if _io_stats is not None:
+            _account_write(self.path, sum(len(line) for line, _ in batch))
+        for (line, future), running in zip(batch, live):
+            if running:
+                future.set_result(offset)
+            offset += len(line)
+
+
+_append_max_delay = 0.0
+_appenders: Dict[str, GroupCommitAppender] = {}
+_appenders_guard = threading.Lock()
+
+
+def set_append_max_delay(seconds: float) -> None:
+    global _append_max_delay
+    _append_max_delay = max(0.0, seconds)
+    for appender in list(_appenders.values()):
+        appender.max_delay = _append_max_delay
+
+
+def appender_for(path: Path) -> GroupCommitAppender:
+    key = os.path.abspath(path)
+    appender = _appenders.get(key)
+    if appender is None:
+        with _appenders_guard:
+            appender = _appenders.get(key)
+            if appender is None:
+                appender = _appenders[key] = GroupCommitAppender(path, max_delay=_append_max_delay)
+    return appender
+
+
+def appender_stats() -> Tuple[int, int]:
+    appenders = list(_appenders.values())
+    return sum(item.records for item in appenders), sum(item.batches for item in appenders)
+
+
+def submit_jsonl(path: Path, data) -> "Future[int]":
+    """Queue one JSONL record; await the result with ``asyncio.wrap_future`` or ``.result()``."""
+    return appender_for(path).submit(data)
+
+
+def append_jsonl(path: Path, data) -> int:
+    return submit_jsonl(path, data).result()
+
+
+_deferred = threading.local()
+
+
+@contextmanager
+def deferred_acks() -> Generator[List[Future], None, None]:
+    """Inside the block ``wait_ack`` collects acks instead of blocking; the caller awaits the yielded list."""
+    previous = getattr(_deferred, "acks", None)
+    _deferred.acks = acks = []
+    try:
+        yield acks
+    finally:
+        _deferred.acks = previous
+
+
+def wait_ack(ack: "Future[int]") -> None:
+    """Block until ``ack`` resolves, or hand it to the enclosing ``deferred_acks`` block."""
+    acks = getattr(_deferred, "acks", None)
+    if acks is None:
+        ack.result()
+    else:
+        acks.append(ack)
+
+
+def iter_jsonl(path: Path, offset: int = 0) -> Iterator[Tuple[int, int, Any]]:
+    """Yield (start, end, record) for every complete line from byte ``offset`` on."""
+    if not path.exists():
+        return
     import ujson
 
-    with locked_file(path, "w") as file_obj:
-        file_obj.write(ujson.dumps(data, ensure_ascii=False, indent=2))
-        file_obj.flush()
+    with locked_file(path, "rb") as file_obj:
+        file_obj.seek(offset)
+        position = offset
+        try:
+            for line in file_obj:
+                if not line.endswith(b"\n"):
+                    break
+                start, position = position, position + len(line)
+                if line.strip():
+                    yield start, position, ujson.loads(line)
+        finally:
+            _account_read(path, position - offset)
 
 
-def append_jsonl(path: Path, data) -> None:
+def read_jsonl_at(path: Path, offset: int) -> Any:
     import ujson
 
-    with locked_file(path, "a") as file_obj:
-        file_obj.write(ujson.dumps(data, ensure_ascii=False))
-        file_obj.write("\n")
-        file_obj.flush()
+    with locked_file(path, "rb") as file_obj:
+        file_obj.seek(offset)
+        line = file_obj.readline()
+    _account_read(path, len(line))
+    if not line.strip():
+        return None
+    return ujson.loads(line)
 
 
-def tail(path: Path, lines: int) -> list[str]:
+def reverse_lines(file_obj: IO[bytes], block_size: int = 64 * 1024) -> Iterator[bytes]:
+    file_obj.seek(0, os.SEEK_END)
+    position = file_obj.tell()
+    buffer = b""
+    while position > 0:
+        step = min(block_size, position)
+        position -= step
+        file_obj.seek(position)
+        buffer = file_obj.read(step) + buffer
+        end = len(buffer)
+        cut = buffer.rfind(b"\n", 0, end - 1)
+        while cut != -1:
+            yield buffer[cut + 1 : end]
+            end = cut + 1
+            cut = buffer.rfind(b"\n", 0, end - 1)
+        buffer = buffer[:end]
+    if buffer:
+        yield buffer
+
+
+def iter_lines_reversed(path: Path) -> Iterator[bytes]:
+    """Yield raw lines from the end of the file backwards, reading it in blocks."""
     if not path.exists():
-        return []
-    with locked_file(path, "r") as file_obj:
-        content = file_obj.readlines()
-    return content[-lines:]
+        return
+    with locked_file(path, "rb") as file_obj:
+        if _io_stats is None:
+            yield from reverse_lines(file_obj)
+            return
+        size = 0
+        try:
+            for line in reverse_lines(file_obj):
+                size += len(line)
+                yield line
+        finally:
+            _account_read(path, size)
+
+
+def tail(path: Path, lines: int) -> list[str]:
+    result: list[bytes] = []
+    if lines > 0:
+        for line in iter_lines_reversed(path):
+            result.append(line)
+            if len(result) == lines:
+                break
+    return [line.decode("utf-8", errors="replace") for line in reversed(result)]
+
+
+def tail_jsonl(path: Path, limit: int) -> list:
+    import ujson
+
+    records = []
+    if limit > 0:
+        for line in iter_lines_reversed(path):
+            if not line.endswith(b"\n") or not line.strip():
+                continue
+            records.append(ujson.loads(line))
+            if len(records) == limit:
+                break
+    records.reverse()
+    return records
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import hashlib
+import heapq
+import logging
+import math
+import os
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import IO, Iterable, Iterator, Optional, Set
+
+from services.files import get_fsync_policy, write_bytes
+
+logger = logging.getLogger(__name__)
+
+_ID = struct.Struct("<q")
+
+
+def _to_bytes(ids: array) -> bytes:
+    if sys.byteorder == "little":
+        return ids.tobytes()
+    swapped = array("q", ids)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def _from_bytes(data: bytes) -> array:
+    ids = array("q")
+    ids.frombytes(data[: len(data) - len(data) % _ID.size])
+    if sys.byteorder != "little":
+        ids.byteswap()
+    return ids
+
+
+class IdSet:
+    """Persistent exact set of integer ids.
+
+    The snapshot at ``path`` is a sorted array of little-endian int64. Ids added
+    after it are appended to ``<path>.log`` (8 bytes each) and kept in a small
+    in-memory set, so membership is a bisect or a hash lookup and an add writes
+    one record. Once ``compact_every`` ids have accumulated (or on ``compact``)
+    they are merged into a new snapshot and the log is truncated.
+    """
+
+    def __init__(self, path: Path, *, compact_every: int = 65536) -> None:
+        self.path = path
+        self.log_path = path.with_name(path.name + ".log")
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._base = _from_bytes(path.read_bytes()) if path.exists() else array("q")
+        self._recent: Set[int] = set()
+        self._log: Optional[IO[bytes]] = None
+        self._replay()
+
+    def _replay(self) -> None:
+        if not self.log_path.exists():
+            return
+        data = self.log_path.read_bytes()
+        torn = len(data) % _ID.size
+        if torn:
+            logger.warning("Відкидаю обрізаний запис у %s", self.log_path)
+            os.truncate(self.log_path, len(data) - torn)
+        for user_id in _from_bytes(data):
+            if not self._in_base(user_id):
+                self._recent.add(user_id)
+
+    def _in_base(self, user_id: int) -> bool:
+        index = bisect_left(self._base, user_id)
+        return index < len(self._base) and self._base[index] == user_id
+
+    def __contains__(self, user_id: int) -> bool:
+        with self._lock:
+            return user_id in self._recent or self._in_base(user_id)
+
+    def __len__(self) -> int:
+        return len(self._base) + len(self._recent)
+
+    def __iter__(self) -> Iterator[int]:
+        with self._lock:
+            recent = sorted(self._recent)
+            base = self._base
+        return heapq.merge(base, recent)
+
+    def add(self, user_id: int) -> bool:
+        """Add ``user_id``; True if it was not in the set yet."""
+        with self._lock:
+            if user_id in self._recent or self._in_base(user_id):
+                return False
+            self._write_log(user_id)
+            self._recent.add(user_id)
+            if len(self._recent) >= self.compact_every:
+                self._compact_locked()
+            return True
+
+    def update(self, ids: Iterable[int]) -> int:
+        added = 0
+        with self._lock:
+            for user_id in ids:
+                if user_id not in self._recent and not self._in_base(user_id):
+                    self._recent.add(user_id)
+                    added += 1
+            if added:
+                self._compact_locked()
+        return added
+
+    def _write_log(self, user_id: int) -> None:
+        if self._log is None:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            self._log = self.log_path.open("ab")
+        self._log.write(_ID.pack(user_id))
+        self._log.flush()
+        if get_fsync_policy() == "always":
+            os.fsync(self._log.fileno())
+
+    def compact(self) -> None:
+        with self._lock:
+            if self._recent:
+                self._compact_locked()
+
+    def _compact_locked(self) -> None:
+        merged = array("q", heapq.merge(self._base, sorted(self._recent)))
+        write_bytes(self.path, _to_bytes(merged))
+        self._base = merged
+        self._recent = set()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        if self.log_path.exists():
+            os.truncate(self.log_path, 0)
+
+
+class HyperLogLog:
+    """Approximate distinct counter with ``2 ** precision`` one-byte registers.
+
+    The standard error is about ``1.04 / sqrt(2 ** precision)``: 0.8 % for the
+    default 14 bits, which take 16 KiB on disk. Registers are written by
+    ``compact``; updates since the last one are lost on a crash.
+    """
+
+    def __init__(self, path: Path, *, precision: int = 14) -> None:
+        self.path = path
+        self.precision = precision
+        size = 1 << precision
+        data = path.read_bytes() if path.exists() else b""
+        if data and len(data) != size:
+            logger.warning("Розмір %s не відповідає точності %s, лічильник скинуто", path, precision)
+            data = b""
+        self._registers = bytearray(data) if data else bytearray(size)
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def add(self, user_id: int) -> bool:
+        """Record ``user_id``; True if a register changed (the id is certainly new)."""
+        digest = hashlib.blake2b(_ID.pack(user_id), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        index = value & ((1 << self.precision) - 1)
+        rest = value >> self.precision
+        rank = 64 - self.precision - rest.bit_length() + 1
+        with self._lock:
+            if rank <= self._registers[index]:
+                return False
+            self._registers[index] = rank
+            self._dirty = True
+            return True
+
+    def update(self, ids: Iterable[int]) -> int:
+        changed = sum(self.add(user_id) for user_id in ids)
+        self.compact()
+        return changed
+
+    def __len__(self) -> int:
+        size = len(self._registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum(2.0 ** -rank for rank in self._registers)
+        zeros = self._registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            estimate = size * math.log(size / zeros)
+        return int(round(estimate))
+
+    def compact(self) -> None:
+        with self._lock:
+            if self._dirty:
+                write_bytes(self.path, bytes(self._registers))
+                self._dirty = False
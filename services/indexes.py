@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+from services.files import append_jsonl, iter_jsonl, locked_file, read_json, write_json
+from services.segments import Position, SegmentedLog
+
+logger = logging.getLogger(__name__)
+
+
+class ChargeIndex:
+    """charge_id -> (segment, offset) of the purchase line, persisted next to the log."""
+
+    def __init__(self, log: SegmentedLog) -> None:
+        self.log = log
+        self.path = log.path.with_name(f"{log.path.stem}.idx.jsonl")
+        self._positions: Dict[str, Position] = {}
+        self.watermark: Position = (0, 0)
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self) -> None:
+        last: Optional[dict] = None
+        indexed = 0
+        for _, indexed, entry in iter_jsonl(self.path):
+            if "s" not in entry:
+                last = None
+                break
+            self._positions[entry["c"]] = (entry["s"], entry["o"])
+            last = entry
+        torn = self.path.exists() and self.path.stat().st_size != indexed
+        if torn or (self.path.exists() and indexed and last is None) or (last is not None and not self._validate(last)):
+            logger.warning("Індекс %s застарів, перебудовую", self.path)
+            self.rebuild()
+            return
+        self.catch_up()
+
+    def _validate(self, last: dict) -> bool:
+        for _, end, record in self.log.iter_from((last["s"], last["o"])):
+            if record.get("charge_id") != last["c"]:
+                return False
+            self.watermark = end
+            return True
+        return False
+
+    def rebuild(self) -> None:
+        with self._lock:
+            self._positions.clear()
+            self.watermark = (0, 0)
+            with locked_file(self.path, "w"):
+                pass
+            self.catch_up()
+
+    def catch_up(self) -> None:
+        if self.log.end_position() == self.watermark:
+            return
+        with self._lock:
+            tip = self.log.end_position()
+            if tip < self.watermark:
+                self.rebuild()
+                return
+            for start, end, record in self.log.iter_from(self.watermark):
+                self._remember(record.get("charge_id"), start)
+                self.watermark = end
+            self.watermark = max(self.watermark, (tip[0], 0))
+
+    def _remember(self, charge_id: Optional[str], position: Position) -> None:
+        if not charge_id or charge_id in self._positions:
+            return
+        self._positions[charge_id] = position
+        append_jsonl(self.path, {"c": charge_id, "s": position[0], "o": position[1]})
+
+    def __contains__(self, charge_id: str) -> bool:
+        self.catch_up()
+        return charge_id in self._positions
+
+    def lookup(self, charge_id: str) -> Optional[Dict[str, Any]]:
+        self.catch_up()
+        position = self._positions.get(charge_id)
+        if position is None:
+            return None
+        record = self.log.read_at(position)
+        if not record or record.get("charge_id") != charge_id:
+            with self._lock:
+                self.rebuild()
+                position = self._positions.get(charge_id)
+            return self.log.read_at(position) if position is not None else None
+        return record
+
+
+class BalanceView:
+    """Per-user and global star balances folded from purchase and ledger logs.
+
+    The view is checkpointed together with a (segment, offset) watermark per
+    source log, so startup only replays records appended after the checkpoint.
+    """
+
+    def __init__(self, path: Path, sources: Sequence[SegmentedLog]) -> None:
+        self.path = path
+        self.sources = list(sources)
+        self.total = 0
+        self._users: Dict[int, int] = {}
+        self._watermarks: Dict[str, Position] = {}
+        self._dirty = False
+        self._lock = threading.RLock()
+        state = read_json(path, default={})
+        watermarks = {name: _position(value) for name, value in state.get("watermarks", {}).items()}
+        if all(watermarks.get(log.path.name, (0, 0)) <= log.end_position() for log in self.sources):
+            self.total = int(state.get("total", 0))
+            self._users = {int(user_id): int(amount) for user_id, amount in state.get("users", {}).items()}
+            self._watermarks = {log.path.name: watermarks.get(log.path.name, (0, 0)) for log in self.sources}
+        else:
+            logger.warning("Контрольна точка %s застаріла, перераховую баланси", path)
+            self._reset()
+        self.catch_up()
+
+    def _reset(self) -> None:
+        self.total = 0
+        self._users.clear()
+        self._watermarks = {log.path.name: (0, 0) for log in self.sources}
+        self._dirty = True
+
+    def catch_up(self) -> None:
+        if self._ends() == self._watermarks:
+            return
+        with self._lock:
+            self._catch_up(self._ends())
+
+    def _ends(self) -> Dict[str, Position]:
+        return {log.path.name: log.end_position() for log in self.sources}
+
+    def _catch_up(self, ends: Dict[str, Position]) -> None:
+        if any(ends[name] < self._watermarks[name] for name in ends):
+            self._reset()
+        for log in self.sources:
+            watermark = self._watermarks[log.path.name]
+            if ends[log.path.name] == watermark:
+                continue
+            for _, end, record in log.iter_from(watermark):
+                amount = int(record.get("amount", 0))
+                user_id = int(record.get("user_id", 0))
+                self.total += amount
+                self._users[user_id] = self._users.get(user_id, 0) + amount
+                watermark = end
+            self._watermarks[log.path.name] = max(watermark, (ends[log.path.name][0], 0))
+            self._dirty = True
+
+    def user_balance(self, user_id: int) -> int:
+        self.catch_up()
+        return self._users.get(user_id, 0)
+
+    def balance(self) -> int:
+        self.catch_up()
+        return self.total
+
+    def checkpoint(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            state = {
+                "watermarks": {name: list(position) for name, position in self._watermarks.items()},
+                "total": self.total,
+                "users": {str(user_id): amount for user_id, amount in self._users.items()},
+            }
+            self._dirty = False
+        write_json(self.path, state)
+
+
+def _position(value) -> Position:
+    # checkpoints written before logs were segmented hold a plain offset into segment 1
+    if isinstance(value, int):
+        return (1, value) if value else (0, 0)
+    return int(value[0]), int(value[1])
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import logging
+import threading
+import zlib
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from services.files import locked_file, read_json, submit_jsonl, wait_ack, write_json
+
+logger = logging.getLogger(__name__)
+
+
+class JournaledTable:
+    """Resident dict of records: JSON snapshot on disk plus an append-only change journal."""
+
+    def __init__(self, path: Path, *, compact_every: int = 5000) -> None:
+        self.path = path
+        self.journal_path = path.with_name(f"{path.stem}.journal.jsonl")
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._data: Dict[str, dict] = read_json(path, default={})
+        self._pending = 0
+        self._replay()
+
+    def _replay(self) -> None:
+        if not self.journal_path.exists():
+            return
+        import ujson
+
+        good = 0
+        torn = False
+        with locked_file(self.journal_path, "rb") as file_obj:
+            for line in file_obj:
+                # a line without its newline is an append that never finished
+                if not line.endswith(b"\n"):
+                    torn = True
+                    break
+                if line.strip():
+                    try:
+                        entry = ujson.loads(line)
+                    except ValueError:
+                        torn = True
+                        break
+                    self._data[entry["k"]] = entry["v"]
+                    self._pending += 1
+                good += len(line)
+        if torn:
+            # cut the journal back to the last whole record, or new appends would follow the fragment
+            logger.warning("Пошкоджений запис у %s, журнал обрізано до %s байт", self.journal_path, good)
+            with locked_file(self.journal_path, "r+b") as file_obj:
+                file_obj.truncate(good)
+        if self._pending:
+            logger.info("Відновлено %s змін із %s", self._pending, self.journal_path)
+
+    def get(self, key: str) -> Optional[dict]:
+        return self._data.get(key)
+
+    def _put_locked(self, key: str, record: dict) -> Optional[Future]:
+        if self._data.get(key) == record:
+            return None
+        record = dict(record)
+        ack = submit_jsonl(self.journal_path, {"k": key, "v": record})
+        self._data[key] = record
+        self._pending += 1
+        if self._pending >= self.compact_every:
+            self.compact()
+        return ack
+
+    def put(self, key: str, record: dict) -> bool:
+        # queued under the lock to keep journal order, acknowledged outside it so
+        # concurrent writers share one group commit; through AsyncFacade the ack is
+        # awaited on the event loop rather than in the pool thread
+        with self._lock:
+            ack = self._put_locked(key, record)
+        if ack is None:
+            return False
+        wait_ack(ack)
+        return True
+
+    def update(self, key: str, mutate: Callable[[dict], None]) -> bool:
+        with self._lock:
+            record = dict(self._data.get(key) or {})
+            mutate(record)
+            ack = self._put_locked(key, record)
+        if ack is None:
+            return False
+        wait_ack(ack)
+        return True
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._data.keys())
+
+    def values(self) -> List[dict]:
+        with self._lock:
+            return list(self._data.values())
+
+    def items(self) -> List[Tuple[str, dict]]:
+        with self._lock:
+            return list(self._data.items())
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def dirty(self) -> bool:
+        return self._pending > 0
+
+    def compact(self) -> None:
+        with self._lock:
+            if not self._pending:
+                return
+            write_json(self.path, self._data)
+            with locked_file(self.journal_path, "w"):
+                pass
+            self._pending = 0
+
+
+class ShardLayoutError(RuntimeError):
+    """The shard directory was written with a different shard count."""
+
+
+def shard_index(key: str, shards: int) -> int:
+    # crc32 rather than hash(): string hashing is salted per process
+    return zlib.crc32(key.encode("utf-8")) % shards
+
+
+class ShardedTable:
+    """``JournaledTable`` split across ``shards`` snapshot/journal pairs in ``directory`` by key hash.
+
+    A write appends to and compacts only its own shard. ``keys``/``values``/
+    ``items`` are generators that copy one shard at a time. ``shards.json``
+    records the shard count; changing it needs ``tools.reshard_users``.
+    """
+
+    MANIFEST = "shards.json"
+
+    def __init__(self, directory: Path, shards: Optional[int] = None, *, stem: str = "users", compact_every: int = 5000) -> None:
+        self.directory = directory
+        self.stem = stem
+        stored = self.stored_shards(directory)
+        if shards is None:
+            if stored is None:
+                raise ShardLayoutError(f"{directory / self.MANIFEST} не знайдено")
+            shards = stored
+        elif stored is None:
+            directory.mkdir(parents=True, exist_ok=True)
+            write_json(directory / self.MANIFEST, {"shards": shards})
+        elif stored != shards:
+            raise ShardLayoutError(
+                f"{directory} поділено на {stored} шардів, а налаштовано {shards}; "
+                f"запустіть python -m tools.reshard_users --shards {shards}"
+            )
+        self.tables = [
+            JournaledTable(self.shard_path(directory, stem, index), compact_every=compact_every)
+            for index in range(shards)
+        ]
+
+    @classmethod
+    def stored_shards(cls, directory: Path) -> Optional[int]:
+        manifest = read_json(directory / cls.MANIFEST, default=None)
+        return int(manifest["shards"]) if manifest else None
+
+    @staticmethod
+    def shard_path(directory: Path, stem: str, index: int) -> Path:
+        return directory / f"{stem}-{index:03d}.json"
+
+    @classmethod
+    def build(cls, directory: Path, shards: int, items: Iterable[Tuple[str, dict]], *, stem: str = "users") -> int:
+        """Write snapshots for ``items`` into an empty ``directory`` (no journals); returns the record count."""
+        buckets: List[Dict[str, dict]] = [{} for _ in range(shards)]
+        count = 0
+        for key, record in items:
+            buckets[shard_index(key, shards)][key] = record
+            count += 1
+        directory.mkdir(parents=True, exist_ok=True)
+        for index, bucket in enumerate(buckets):
+            write_json(cls.shard_path(directory, stem, index), bucket)
+        write_json(directory / cls.MANIFEST, {"shards": shards})
+        return count
+
+    def shard(self, key: str) -> JournaledTable:
+        return self.tables[shard_index(key, len(self.tables))]
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.shard(key).get(key)
+
+    def put(self, key: str, record: dict) -> bool:
+        return self.shard(key).put(key, record)
+
+    def update(self, key: str, mutate: Callable[[dict], None]) -> bool:
+        return self.shard(key).update(key, mutate)
+
+    def keys(self) -> Iterator[str]:
+        for table in self.tables:
+            yield from table.keys()
+
+    def values(self) -> Iterator[dict]:
+        for table in self.tables:
+            yield from table.values()
+
+    def items(self) -> Iterator[Tuple[str, dict]]:
+        for table in self.tables:
+            yield from table.items()
+
+    def __len__(self) -> int:
+        return sum(len(table) for table in self.tables)
+
+    @property
+    def dirty(self) -> bool:
+        return any(table.dirty for table in self.tables)
+
+    def compact(self) -> None:
+        for table in self.tables:
+            table.compact()
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from services.files import write_bytes
+
+# upper bounds in seconds: 1 ms · √2^i up to ~65 s, the same for every histogram
+BOUNDS: Tuple[float, ...] = tuple(round(0.001 * 2 ** (index / 2), 6) for index in range(33))
+
+
+class Histogram:
+    """Counts per fixed log-scale bucket, plus the sum and the number of errors."""
+
+    __slots__ = ("counts", "total", "count", "errors")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.errors = 0
+
+    def observe(self, seconds: float, error: bool = False) -> None:
+        self.counts[bisect_left(BOUNDS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        self.errors += error
+
+    def copy(self) -> "Histogram":
+        clone = Histogram()
+        clone.counts = list(self.counts)
+        clone.total, clone.count, clone.errors = self.total, self.count, self.errors
+        return clone
+
+    def quantile(self, q: float) -> float:
+        """Linear interpolation inside the bucket holding the q-th observation, as histogram_quantile does."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, amount in enumerate(self.counts):
+            if seen + amount >= rank and amount:
+                if index == len(BOUNDS):
+                    return BOUNDS[-1]
+                lower = BOUNDS[index - 1] if index else 0.0
+                return lower + (BOUNDS[index] - lower) * (rank - seen) / amount
+            seen += amount
+        return BOUNDS[-1]
+
+
+@dataclass(slots=True)
+class LatencySummary:
+    name: str
+    count: int
+    errors: int
+    p50: float
+    p95: float
+    p99: float
+
+
+class LatencyRegistry:
+    """Histograms per handler and per update type, updated in memory on every update."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.handlers: Dict[str, Histogram] = {}
+        self.updates: Dict[str, Histogram] = {}
+
+    def observe(self, family: Dict[str, Histogram], name: str, seconds: float, error: bool = False) -> None:
+        with self._lock:
+            histogram = family.get(name)
+            if histogram is None:
+                histogram = family[name] = Histogram()
+            histogram.observe(seconds, error)
+
+    def observe_handler(self, name: str, seconds: float, error: bool = False) -> None:
+        self.observe(self.handlers, name, seconds, error)
+
+    def observe_update(self, update_type: str, seconds: float, error: bool = False) -> None:
+        self.observe(self.updates, update_type, seconds, error)
+
+    def _copy(self, family: Dict[str, Histogram]) -> Dict[str, Histogram]:
+        with self._lock:
+            return {name: histogram.copy() for name, histogram in family.items()}
+
+    def summary(self, family: str, *, limit: Optional[int] = None) -> List[LatencySummary]:
+        """Slowest first by p95."""
+        rows = [
+            LatencySummary(name, item.count, item.errors, item.quantile(0.5), item.quantile(0.95), item.quantile(0.99))
+            for name, item in self._copy(getattr(self, family)).items()
+        ]
+        rows.sort(key=lambda row: row.p95, reverse=True)
+        return rows[:limit] if limit else rows
+
+    def prometheus_text(self, labels: Optional[Mapping[str, str]] = None) -> str:
+        lines: List[str] = []
+        for family, label, metric, subject in (
+            ("handlers", "handler", "xtrbot_handler", "handler call"),
+            ("updates", "type", "xtrbot_update", "update"),
+        ):
+            histograms = self._copy(getattr(self, family))
+            lines.append(f"# HELP {metric}_duration_seconds Time spent on one {subject}.")
+            lines.append(f"# TYPE {metric}_duration_seconds histogram")
+            for name, histogram in sorted(histograms.items()):
+                base = _labels({**(labels or {}), label: name})
+                cumulative = 0
+                for bound, amount in zip(BOUNDS, histogram.counts):
+                    cumulative += amount
+                    lines.append(f'{metric}_duration_seconds_bucket{{{base},le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_duration_seconds_bucket{{{base},le="+Inf"}} {histogram.count}')
+                lines.append(f"{metric}_duration_seconds_sum{{{base}}} {histogram.total:.6f}")
+                lines.append(f"{metric}_duration_seconds_count{{{base}}} {histogram.count}")
+            lines.append(f"# HELP {metric}_errors_total Exceptions raised while handling.")
+            lines.append(f"# TYPE {metric}_errors_total counter")
+            for name, histogram in sorted(histograms.items()):
+                lines.append(f"{metric}_errors_total{{{_labels({**(labels or {}), label: name})}}} {histogram.errors}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: Path, labels: Optional[Mapping[str, str]] = None) -> None:
+        """Atomic write, so node_exporter's textfile collector never reads a partial file."""
+        write_bytes(path, self.prometheus_text(labels).encode("utf-8"))
+
+
+def _labels(values: Mapping[str, str]) -> str:
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in values.items())
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
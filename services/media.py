@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from services.files import read_json, write_json
+
+
+@dataclass(slots=True)
+class MediaRef:
+    key: str
+    file_id: Optional[str]
+
+
+class MediaCache:
+    """Telegram ``file_id`` of each uploaded menu image, keyed by the SHA-256 of its bytes.
+
+    An asset's digest is recomputed only when its (inode, mtime_ns, size)
+    changes, so replacing ``assets/*.jpg`` leads to exactly one new upload.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._file_ids: Dict[str, str] = read_json(path, default={})
+        self._digests: Dict[Path, Tuple[Optional[Tuple[int, int, int]], str]] = {}
+
+    def _digest(self, path: Path, fallback: bytes) -> str:
+        try:
+            stat = path.stat()
+            stamp: Optional[Tuple[int, int, int]] = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            stamp = None
+        cached = self._digests.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        data = path.read_bytes() if stamp is not None else fallback
+        digest = hashlib.sha256(data).hexdigest()
+        self._digests[path] = (stamp, digest)
+        return digest
+
+    def lookup(self, path: Path, fallback: bytes) -> MediaRef:
+        """Reference for the asset at ``path`` (or ``fallback`` bytes when it is missing)."""
+        key = self._digest(path, fallback)
+        return MediaRef(key=key, file_id=self._file_ids.get(key))
+
+    def remember(self, key: str, file_id: str) -> None:
+        with self._lock:
+            if self._file_ids.get(key) == file_id:
+                return
+            self._file_ids[key] = file_id
+            write_json(self.path, self._file_ids)
+
+    def forget(self, key: str) -> None:
+        with self._lock:
+            if self._file_ids.pop(key, None) is not None:
+                write_json(self.path, self._file_ids)
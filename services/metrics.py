@@ -1,10 +1,19 @@
 from __future__ import annotations
 
+import logging
+import threading
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
 
 from services.files import read_json, write_json
+from services.idset import HyperLogLog, IdSet
+from services.timeseries import CounterRegistry
+
+logger = logging.getLogger(__name__)
+
+UNIQUE_MODES = ("exact", "hll")
+LEGACY_PREFIX = "__users_"
 
 
 @dataclass(slots=True)
@@ -17,42 +26,89 @@ class MetricsSnapshot:
 
 
 class MetricsService:
-    def __init__(self, path: Path) -> None:
-        self.path = path
+    """Counters kept in a ``CounterRegistry`` and flushed to ``metrics.json``.
 
-    def _load(self) -> Dict[str, int]:
-        return read_json(
-            self.path,
-            default={
-                "unique_users_started": 0,
-                "buy_clicks": 0,
-                "purchases_success": 0,
-                "purchases_fail": 0,
-                "blocked_bot": 0,
-            },
-        )
+    Per-key sets of seen users live in ``unique_dir``: in ``exact`` mode
+    ``ensure_user`` counts a user once per key using an ``IdSet``; in ``hll``
+    mode the key's total is a HyperLogLog estimate and has no time series.
+    Either way the total reported for such a key is the size of its set: ids
+    are durable on ``add`` while counter increments wait for ``flush``.
+    """
 
-    def _save(self, data: Dict[str, int]) -> None:
-        write_json(self.path, data)
+    def __init__(self, path: Path, *, unique_dir: Optional[Path] = None, unique_mode: str = "exact") -> None:
+        if unique_mode not in UNIQUE_MODES:
+            raise ValueError(f"Unknown unique mode {unique_mode!r}")
+        self.path = path
+        self.unique_dir = unique_dir or path.with_name("unique")
+        self.unique_mode = unique_mode
+        self._unique_lock = threading.Lock()
+        self._unique_sets: Dict[str, Union[IdSet, HyperLogLog]] = {}
+        self._migrate_legacy()
+        self.counters = CounterRegistry(path)
+        if unique_mode == "exact":
+            # ids added after the last flush survive a crash, their increments do not
+            for key in self._unique_keys():
+                self.counters.raise_total(key, len(self._unique(key)))
 
     def increment(self, key: str, amount: int = 1) -> None:
-        data = self._load()
-        data[key] = data.get(key, 0) + amount
-        self._save(data)
+        self.counters.increment(key, amount)
 
-    def ensure_user(self, key: str, user_id: int) -> None:
-        marker_key = f"__users_{key}"
-        data = self._load()
-        seen = set(data.get(marker_key, []))
-        if user_id in seen:
+    def _unique(self, key: str) -> Union[IdSet, HyperLogLog]:
+        with self._unique_lock:
+            users = self._unique_sets.get(key)
+            if users is None:
+                exact_path = self.unique_dir / f"{key}.ids"
+                if self.unique_mode == "exact":
+                    users = IdSet(exact_path)
+                else:
+                    hll_path = self.unique_dir / f"{key}.hll"
+                    seed = not hll_path.exists() and exact_path.exists()
+                    users = HyperLogLog(hll_path)
+                    if seed:
+                        users.update(IdSet(exact_path))
+                self._unique_sets[key] = users
+            return users
+
+    def _unique_keys(self) -> Set[str]:
+        suffix = ".ids" if self.unique_mode == "exact" else ".hll"
+        stored = {path.name.split(".", 1)[0] for path in self.unique_dir.glob(f"*{suffix}*")}
+        with self._unique_lock:
+            return stored | set(self._unique_sets)
+
+    def _migrate_legacy(self) -> None:
+        data = read_json(self.path, default={})
+        legacy = [name for name in data if name.startswith(LEGACY_PREFIX)]
+        if not legacy:
             return
-        seen.add(user_id)
-        data[marker_key] = list(seen)
-        data[key] = data.get(key, 0) + 1
-        self._save(data)
+        for name in legacy:
+            key = name[len(LEGACY_PREFIX):]
+            self._unique(key).update(int(user_id) for user_id in data[name])
+            logger.info("Перенесено %s користувачів %s з %s", len(data[name]), key, self.path.name)
+            del data[name]
+        write_json(self.path, data)
+
+    def ensure_user(self, key: str, user_id: int) -> None:
+        if self._unique(key).add(user_id) and self.unique_mode == "exact":
+            self.increment(key)
+
+    def flush(self) -> None:
+        self.counters.flush()
+        with self._unique_lock:
+            sets = list(self._unique_sets.values())
+        for users in sets:
+            users.compact()
+
+    def windows(self, seconds: Sequence[int]) -> Dict[str, List[int]]:
+        """Event counts per counter over each of the trailing windows."""
+        return {key: [self.counters.count(key, window) for window in seconds] for key in self.counters.snapshot()}
+
+    def buckets(self, key: str, seconds: int) -> List[Tuple[int, int]]:
+        return self.counters.buckets(key, seconds)
 
     def snapshot(self) -> MetricsSnapshot:
-        data = self._load()
+        data = self.counters.snapshot()
+        for key in self._unique_keys():
+            data[key] = len(self._unique(key))
         return MetricsSnapshot(
             unique_users_started=data.get("unique_users_started", 0),
             buy_clicks=data.get("buy_clicks", 0),
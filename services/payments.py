@@ -7,6 +7,7 @@ from aiogram.types import LabeledPrice, Message, PreCheckoutQuery
 
 from config import Config
 from services.access import AccessService
+from services.aio import AsyncFacade
 from services.metrics import MetricsService
 from services.storage import StorageService
 from services.users import UserService
@@ -20,10 +21,10 @@ class PaymentService:
         self,
         bot: Bot,
         config: Config,
-        storage: StorageService,
-        access: AccessService,
-        metrics: MetricsService,
-        users: UserService,
+        storage: AsyncFacade[StorageService],
+        access: AsyncFacade[AccessService],
+        metrics: AsyncFacade[MetricsService],
+        users: AsyncFacade[UserService],
     ) -> None:
         self.bot = bot
         self.config = config
@@ -37,10 +38,10 @@ class PaymentService:
         if not user:
             return
 
-        self.metrics.ensure_user("buy_clicks", user.id)
+        await self.metrics.ensure_user("buy_clicks", user.id)
         price = self.config.guide.price_stars
         payload = self.config.guide.payload
-        self.storage.add_order(user_id=user.id, payload=payload, amount=price, status="створено")
+        await self.storage.add_order(user_id=user.id, payload=payload, amount=price, status="створено")
 
         prices = [LabeledPrice(label="Guide", amount=price)]
         try:
@@ -54,14 +55,14 @@ class PaymentService:
             )
         except Exception as exc:
             logger.exception("Не вдалося відправити інвойс")
-            self.storage.add_order(
+            await self.storage.add_order(
                 user.id,
                 payload,
                 price,
                 status="помилка",
                 reason=str(exc),
             )
-            self.metrics.increment("purchases_fail")
+            await self.metrics.increment("purchases_fail")
             return
 
     async def handle_pre_checkout(self, query: PreCheckoutQuery) -> None:
@@ -74,17 +75,16 @@ class PaymentService:
             return
 
         charge_id = payment.telegram_payment_charge_id
-        if self.storage.charge_exists(charge_id):
+        payload = payment.invoice_payload
+        amount = self.config.guide.price_stars
+        if await self.storage.add_purchase_if_new(user.id, charge_id, amount, payload) is None:
             logger.info("Повторний платіж %s проігноровано", charge_id)
             return
 
-        payload = payment.invoice_payload
-        amount = self.config.guide.price_stars
-        self.storage.add_purchase(user.id, charge_id, amount, payload)
-        self.storage.add_order(user.id, payload, amount, status="успіх")
-        self.access.set_access(user.id, charge_id)
-        self.metrics.increment("purchases_success")
-        self.users.mark_purchase(user.id)
+        await self.storage.add_order(user.id, payload, amount, status="успіх")
+        await self.access.set_access(user.id, charge_id)
+        await self.metrics.increment("purchases_success")
+        await self.users.mark_purchase(user.id)
 
         await message.answer(
             "Оплата успішна ✅",
@@ -92,7 +92,7 @@ class PaymentService:
         )
 
     async def refund(self, _requester_id: int, charge_id: str) -> bool:
-        purchase = self.storage.find_purchase(charge_id)
+        purchase = await self.storage.find_purchase(charge_id)
         if not purchase:
             logger.warning("Чардж %s не знайдено для повернення", charge_id)
             return False
@@ -103,5 +103,5 @@ class PaymentService:
             logger.exception("Не вдалося виконати повернення для %s", charge_id)
             return False
         if result:
-            self.storage.add_ledger_entry(user_id, -self.config.guide.price_stars, "refund", charge_id=charge_id)
+            await self.storage.add_ledger_entry(user_id, -self.config.guide.price_stars, "refund", charge_id=charge_id)
         return bool(result)
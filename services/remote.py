@@ -0,0 +1,326 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import builtins
+import dataclasses
+import itertools
+import logging
+import os
+import struct
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional
+
+from services.access import AccessRecord
+from services.broadcast import BroadcastJob
+from services.media import MediaRef
+from services.metrics import MetricsSnapshot
+from services.segments import SegmentSummary
+from services.storage import LedgerRecord, OrderRecord, PurchaseRecord
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">I")
+MAX_FRAME = 64 * 1024 * 1024
+
+# Dataclasses that may cross the socket, by name; nothing else is ever instantiated from a frame.
+_TYPES = {
+    cls.__name__: cls
+    for cls in (AccessRecord, BroadcastJob, LedgerRecord, MediaRef, MetricsSnapshot, OrderRecord, PurchaseRecord, SegmentSummary)
+}
+
+
+class RemoteError(RuntimeError):
+    """A storage call failed inside the daemon with an exception the worker cannot rebuild."""
+
+
+class StorageConnectionError(ConnectionError):
+    """The connection to the storage daemon is down; the call was not delivered or its reply was lost."""
+
+
+def _pack(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_pack(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _pack(item) for key, item in value.items()}
+    if isinstance(value, (set, frozenset)):
+        return {"$set": [_pack(item) for item in value]}
+    if isinstance(value, Path):
+        return {"$path": str(value)}
+    if isinstance(value, bytes):
+        return {"$bytes": base64.b64encode(value).decode("ascii")}
+    if dataclasses.is_dataclass(value) and type(value).__name__ in _TYPES:
+        fields = {field.name: _pack(getattr(value, field.name)) for field in dataclasses.fields(value)}
+        return {"$type": type(value).__name__, "fields": fields}
+    raise TypeError(f"Cannot send {type(value).__name__} to the storage daemon")
+
+
+def _unpack(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_unpack(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "$set" in value:
+        return frozenset(_unpack(item) for item in value["$set"])
+    if "$path" in value:
+        return Path(value["$path"])
+    if "$bytes" in value:
+        return base64.b64decode(value["$bytes"])
+    if "$type" in value:
+        return _TYPES[value["$type"]](**{key: _unpack(item) for key, item in value["fields"].items()})
+    return {key: _unpack(item) for key, item in value.items()}
+
+
+def encode_frame(message: List[Any]) -> bytes:
+    import ujson
+
+    body = ujson.dumps(_pack(message), ensure_ascii=False).encode("utf-8")
+    return _HEADER.pack(len(body)) + body
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[List[Any]]:
+    import ujson
+
+    try:
+        header = await reader.readexactly(_HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_FRAME:
+        raise ConnectionError(f"Frame of {size} bytes exceeds the limit")
+    return _unpack(ujson.loads(await reader.readexactly(size)))
+
+
+class _Outbox:
+    """Frames queued while the previous batch is written go out in a single write.
+
+    Every batch is drained before the next; once more than ``limit`` bytes are
+    queued, ``send`` waits for the peer to catch up instead of buffering more.
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter, *, limit: int = 1024 * 1024) -> None:
+        self.writer = writer
+        self.limit = limit
+        self.closed = False
+        self._frames: List[bytes] = []
+        self._queued = 0
+        self._flusher: Optional[asyncio.Task] = None
+        self._space = asyncio.Event()
+        self._space.set()
+
+    async def send(self, frame: bytes) -> None:
+        self._frames.append(frame)
+        self._queued += len(frame)
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush())
+        if self._queued > self.limit:
+            self._space.clear()
+            await self._space.wait()
+
+    async def _flush(self) -> None:
+        try:
+            while self._frames and not self.writer.is_closing():
+                frames, self._frames, self._queued = self._frames, [], 0
+                self.writer.write(b"".join(frames))
+                await self.writer.drain()
+                if self._queued <= self.limit:
+                    self._space.set()
+        except ConnectionError as error:
+            logger.debug("Запис у сокет сховища не вдався: %s", error)
+        finally:
+            self._frames, self._queued = [], 0
+            self._flusher = None
+            self._space.set()
+
+
+class StorageServer:
+    """Serves ``services`` (name -> async facade) on a Unix socket.
+
+    A request frame is ``[id, service, method, args, kwargs]``, a reply
+    ``[id, true, result]`` or ``[id, false, [exception type, message]]``.
+    Requests on one connection are pipelined: each runs as its own task and
+    replies go back in completion order.
+    """
+
+    def __init__(self, services: Mapping[str, Any], path: Path) -> None:
+        self.services = services
+        self.path = path
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        if self.path.exists():
+            self.path.unlink()
+        # the socket is created 0600 by bind itself: no window at the default mode
+        umask = os.umask(0o177)
+        try:
+            self._server = await asyncio.start_unix_server(self._serve, path=str(self.path))
+        finally:
+            os.umask(umask)
+        logger.info("Сховище слухає %s", self.path)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        if self.path.exists():
+            self.path.unlink()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections.add(asyncio.current_task())
+        outbox = _Outbox(writer)
+        calls: set[asyncio.Task] = set()
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                task = asyncio.create_task(self._call(outbox, *frame))
+                calls.add(task)
+                task.add_done_callback(calls.discard)
+        except (ConnectionError, asyncio.IncompleteReadError) as error:
+            logger.warning("З'єднання зі сховищем розірвано: %s", error)
+        finally:
+            await asyncio.gather(*calls, return_exceptions=True)
+            self._connections.discard(asyncio.current_task())
+            writer.close()
+
+    async def _call(self, outbox: _Outbox, call_id: int, service: str, method: str, args: list, kwargs: dict) -> None:
+        try:
+            if method.startswith("_"):
+                raise AttributeError(method)
+            result = await getattr(self.services[service], method)(*args, **kwargs)
+            reply = [call_id, True, result]
+        except Exception as error:
+            logger.debug("Виклик %s.%s завершився помилкою", service, method, exc_info=True)
+            reply = [call_id, False, [type(error).__name__, str(error)]]
+        try:
+            frame = encode_frame(reply)
+        except TypeError as error:
+            frame = encode_frame([call_id, False, ["TypeError", str(error)]])
+        await outbox.send(frame)
+
+
+class StorageClient:
+    """One pipelined connection from a worker to the storage daemon; reconnects on the next call after a failure."""
+
+    def __init__(self, path: Path, *, connect_timeout: float = 30.0) -> None:
+        self.path = path
+        self.connect_timeout = connect_timeout
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._outbox: Optional[_Outbox] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connecting: Optional[asyncio.Lock] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._outbox is not None
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    async def connect(self) -> None:
+        if self._connecting is None:
+            self._connecting = asyncio.Lock()
+        async with self._connecting:
+            if self._outbox is not None:
+                return
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.connect_timeout
+            while True:
+                try:
+                    reader, writer = await asyncio.open_unix_connection(str(self.path))
+                    break
+                except (FileNotFoundError, ConnectionRefusedError):
+                    if loop.time() >= deadline:
+                        raise
+                    await asyncio.sleep(0.1)
+            self._outbox = _Outbox(writer)
+            self._reader_task = asyncio.create_task(self._read(reader))
+
+    async def call(self, service: str, method: str, *args: Any, **kwargs: Any) -> Any:
+        call_id = next(self._ids)
+        frame = encode_frame([call_id, service, method, args, kwargs])
+        outbox = self._outbox
+        if outbox is None:
+            try:
+                await self.connect()
+            except OSError as error:
+                raise StorageConnectionError(f"Storage daemon at {self.path} is unavailable: {error}") from error
+            outbox = self._outbox
+        future = asyncio.get_running_loop().create_future()
+        self._pending[call_id] = future
+        try:
+            # the reader fails every pending call when the connection drops; one that dropped
+            # before this call was registered is caught here instead
+            if outbox is None or outbox.closed:
+                raise StorageConnectionError("Storage daemon connection was lost")
+            await outbox.send(frame)
+            return await future
+        finally:
+            self._pending.pop(call_id, None)
+
+    async def _read(self, reader: asyncio.StreamReader) -> None:
+        error: BaseException = ConnectionError("Storage daemon closed the connection")
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                call_id, ok, result = frame
+                future = self._pending.get(call_id)
+                if future is None or future.done():
+                    continue
+                if ok:
+                    future.set_result(result)
+                else:
+                    future.set_exception(_rebuild(*result))
+        except (ConnectionError, asyncio.IncompleteReadError) as exc:
+            error = exc
+        finally:
+            outbox, self._outbox = self._outbox, None
+            if outbox is not None:
+                outbox.closed = True
+                outbox.writer.close()
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(StorageConnectionError(str(error)))
+
+    async def close(self) -> None:
+        if self._outbox is not None:
+            self._outbox.writer.close()
+        if self._reader_task is not None:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+
+
+def _rebuild(name: str, message: str) -> Exception:
+    cls = getattr(builtins, name, None)
+    if isinstance(cls, type) and issubclass(cls, Exception):
+        return cls(message)
+    return RemoteError(f"{name}: {message}")
+
+
+class RemoteFacade:
+    """Same awaitable interface as ``AsyncFacade``, but calls go to the storage daemon."""
+
+    def __init__(self, client: StorageClient, service: str) -> None:
+        self.client = client
+        self.service = service
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            return await self.client.call(self.service, name, *args, **kwargs)
+
+        call.__name__ = name
+        setattr(self, name, call)
+        return call
@@ -0,0 +1,327 @@
+from __future__ import annotations
+
+import gzip
+import io
+import logging
+import os
+import threading
+import time
+from bisect import bisect_right
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from services.files import (
+    PathLock,
+    append_jsonl,
+    iter_jsonl,
+    iter_lines_reversed,
+    read_json,
+    read_jsonl_at,
+    reverse_lines,
+    write_json,
+)
+
+logger = logging.getLogger(__name__)
+
+Position = Tuple[int, int]
+
+# sealed segments are compressed as independent gzip members of about this much plain data
+BLOCK_BYTES = 64 * 1024
+
+
+@dataclass(slots=True)
+class SegmentSummary:
+    segment: int
+    count: int = 0
+    amount: int = 0
+    ts_min: Optional[int] = None
+    ts_max: Optional[int] = None
+    size: int = 0
+
+    def add(self, record: Dict[str, Any]) -> None:
+        self.count += 1
+        self.amount += int(record.get("amount") or 0)
+        ts = record.get("ts")
+        if ts is not None:
+            self.ts_min = ts if self.ts_min is None else min(self.ts_min, ts)
+            self.ts_max = ts if self.ts_max is None else max(self.ts_max, ts)
+
+    def merge(self, other: "SegmentSummary") -> None:
+        self.count += other.count
+        self.amount += other.amount
+        self.size += other.size
+        for ts in (other.ts_min, other.ts_max):
+            if ts is not None:
+                self.ts_min = ts if self.ts_min is None else min(self.ts_min, ts)
+                self.ts_max = ts if self.ts_max is None else max(self.ts_max, ts)
+
+    def overlaps(self, since: Optional[int], until: Optional[int]) -> bool:
+        if self.ts_min is None:
+            return False
+        if since is not None and self.ts_max < since:
+            return False
+        if until is not None and self.ts_min >= until:
+            return False
+        return True
+
+    def within(self, since: Optional[int], until: Optional[int]) -> bool:
+        if self.ts_min is None:
+            return True
+        return (since is None or self.ts_min >= since) and (until is None or self.ts_max < until)
+
+
+def _in_window(record: Dict[str, Any], since: Optional[int], until: Optional[int]) -> bool:
+    ts = record.get("ts", 0)
+    return (since is None or ts >= since) and (until is None or ts < until)
+
+
+class SegmentedLog:
+    """Append-only JSONL log split into segments.
+
+    New records go to the active segment at ``path`` (so an existing log keeps
+    working as segment 1). When it outgrows ``max_bytes`` or ``max_age`` seconds
+    it is sealed: moved into ``<path without suffix>/NNNNNN.jsonl``, summarized
+    in ``manifest.json`` (count, amount sum, ts range) and gzip-compressed.
+    Records are addressed by ``(segment, byte offset)``; offsets are those of the
+    uncompressed segment, so they survive compression. The compressed file is a
+    chain of gzip members cut at line boundaries every ``BLOCK_BYTES``, with
+    ``NNNNNN.blocks.json`` mapping plain to compressed offsets, so ``read_at``
+    inflates one block rather than the segment up to the offset. Rotation
+    assumes this process is the only writer of the log.
+    """
+
+    def __init__(self, path: Path, *, max_bytes: int, max_age: float = 0) -> None:
+        self.path = path
+        self.dir = path.with_suffix("")
+        self.manifest_path = self.dir / "manifest.json"
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._rotation = PathLock()
+        manifest = read_json(self.manifest_path, default={})
+        self.active: int = int(manifest.get("active", 1))
+        self.active_since: float = float(manifest.get("active_since", time.time()))
+        self.sealed: List[SegmentSummary] = [SegmentSummary(**item) for item in manifest.get("sealed", [])]
+        self._blocks: Dict[int, Optional[Tuple[List[int], List[int]]]] = {}
+        self._blocks_lock = threading.Lock()
+        self._recover()
+
+    def _plain_path(self, segment: int) -> Path:
+        return self.dir / f"{segment:06d}.jsonl"
+
+    def _gz_path(self, segment: int) -> Path:
+        return self.dir / f"{segment:06d}.jsonl.gz"
+
+    def _blocks_path(self, segment: int) -> Path:
+        return self.dir / f"{segment:06d}.blocks.json"
+
+    def _recover(self) -> None:
+        if self._plain_path(self.active).exists():
+            logger.warning("Завершую перерване запечатування сегмента %s у %s", self.active, self.dir)
+            self._seal_renamed(self.active)
+        for summary in self.sealed:
+            if self._plain_path(summary.segment).exists():
+                self._compress(summary.segment)
+
+    def _save_manifest(self) -> None:
+        write_json(
+            self.manifest_path,
+            {
+                "active": self.active,
+                "active_since": self.active_since,
+                "sealed": [asdict(summary) for summary in self.sealed],
+            },
+        )
+
+    def _active_size(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _should_rotate(self) -> bool:
+        size = self._active_size()
+        if not size:
+            return False
+        if size >= self.max_bytes:
+            return True
+        return bool(self.max_age) and time.time() - self.active_since >= self.max_age
+
+    def append(self, record: Dict[str, Any]) -> Position:
+        with self._rotation.shared():
+            position = (self.active, append_jsonl(self.path, record))
+        if self._should_rotate():
+            self.rotate()
+        return position
+
+    def rotate(self) -> None:
+        with self._rotation.exclusive():
+            if not self._should_rotate():
+                return
+            segment = self.active
+            self.dir.mkdir(parents=True, exist_ok=True)
+            os.replace(self.path, self._plain_path(segment))
+            self._seal_renamed(segment)
+        self._compress(segment)
+
+    def _seal_renamed(self, segment: int) -> None:
+        summary = SegmentSummary(segment=segment)
+        for _, end, record in self._iter_segment(segment, 0):
+            summary.add(record)
+            summary.size = end
+        self.sealed.append(summary)
+        self.active = segment + 1
+        self.active_since = time.time()
+        self._save_manifest()
+        logger.info("Сегмент %s журналу %s запечатано: %s записів", segment, self.path.name, summary.count)
+
+    def _compress(self, segment: int) -> None:
+        plain = self._plain_path(segment)
+        target = self._gz_path(segment)
+        tmp = target.with_name(target.name + ".tmp")
+        blocks: List[List[int]] = []
+        with plain.open("rb") as src, tmp.open("wb") as dst:
+            position = 0
+            while chunk := src.read(BLOCK_BYTES):
+                chunk += src.readline()
+                blocks.append([position, dst.tell()])
+                dst.write(gzip.compress(chunk))
+                position += len(chunk)
+        # the index lands first: a .gz without one is a segment sealed before block indexes existed
+        write_json(self._blocks_path(segment), blocks)
+        os.replace(tmp, target)
+        plain.unlink()
+
+    def _block_index(self, segment: int) -> Optional[Tuple[List[int], List[int]]]:
+        """(plain offsets, compressed offsets) of the segment's gzip members; sealed segments never change."""
+        with self._blocks_lock:
+            if segment in self._blocks:
+                return self._blocks[segment]
+        blocks = read_json(self._blocks_path(segment), default=None)
+        index = ([plain for plain, _ in blocks], [packed for _, packed in blocks]) if blocks else None
+        with self._blocks_lock:
+            self._blocks[segment] = index
+        return index
+
+    def _open_sealed(self, segment: int):
+        target = self._gz_path(segment)
+        if not target.exists():
+            try:
+                return self._plain_path(segment).open("rb")
+            except FileNotFoundError:
+                pass  # compressed meanwhile
+        return gzip.open(target, "rb")
+
+    def _iter_segment(self, segment: int, offset: int) -> Iterator[Tuple[int, int, Dict[str, Any]]]:
+        import ujson
+
+        with self._open_sealed(segment) as file_obj:
+            file_obj.seek(offset)
+            position = offset
+            for line in file_obj:
+                start, position = position, position + len(line)
+                if line.strip():
+                    yield start, position, ujson.loads(line)
+
+    def end_position(self) -> Position:
+        with self._rotation.shared():
+            return self.active, self._active_size()
+
+    def _view(self, segment: int = 0, offset: int = 0) -> Tuple[List[SegmentSummary], int, List[Tuple[int, int, Dict[str, Any]]]]:
+        """Sealed summaries, the active segment id and its records from ``offset`` if it is ``segment``.
+
+        Taken in one critical section: a rotation between reading ``sealed``
+        and the active file would otherwise drop the segment it seals.
+        """
+        with self._rotation.shared():
+            active = self.active
+            return list(self.sealed), active, list(iter_jsonl(self.path, offset if segment == active else 0))
+
+    def iter_from(self, position: Position = (0, 0)) -> Iterator[Tuple[Position, Position, Dict[str, Any]]]:
+        segment, offset = position
+        sealed, active, items = self._view(segment, offset)
+        for summary in sealed:
+            if summary.segment < segment:
+                continue
+            start = offset if summary.segment == segment else 0
+            for begin, end, record in self._iter_segment(summary.segment, start):
+                yield (summary.segment, begin), (summary.segment, end), record
+        for begin, end, record in items:
+            yield (active, begin), (active, end), record
+
+    def read_at(self, position: Position) -> Optional[Dict[str, Any]]:
+        segment, offset = position
+        with self._rotation.shared():
+            if segment == self.active:
+                return read_jsonl_at(self.path, offset) if self.path.exists() else None
+        target = self._gz_path(segment)
+        index = self._block_index(segment) if target.exists() else None
+        if index is None:
+            # still plain (a direct seek), or compressed as one stream: inflates up to the offset
+            for _, _, record in self._iter_segment(segment, offset):
+                return record
+            return None
+        import ujson
+
+        plain_offsets, packed_offsets = index
+        block = bisect_right(plain_offsets, offset) - 1
+        with target.open("rb") as raw:
+            raw.seek(packed_offsets[block])
+            with gzip.GzipFile(fileobj=raw) as member:
+                member.seek(offset - plain_offsets[block])
+                line = member.readline()
+        return ujson.loads(line) if line.strip() else None
+
+    def tail(self, limit: int) -> List[Dict[str, Any]]:
+        import ujson
+
+        records: List[Dict[str, Any]] = []
+        if limit <= 0:
+            return records
+        with self._rotation.shared():
+            for line in iter_lines_reversed(self.path):
+                if line.endswith(b"\n") and line.strip():
+                    records.append(ujson.loads(line))
+                    if len(records) == limit:
+                        break
+            sealed = list(self.sealed)
+        for summary in reversed(sealed):
+            if len(records) >= limit:
+                break
+            with self._open_sealed(summary.segment) as file_obj:
+                content = io.BytesIO(file_obj.read())
+            for line in reverse_lines(content):
+                if line.strip():
+                    records.append(ujson.loads(line))
+                    if len(records) == limit:
+                        break
+        records.reverse()
+        return records
+
+    def iter_records(self, *, since: Optional[int] = None, until: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Records in [since, until); sealed segments outside the window are skipped by summary."""
+        sealed, _, items = self._view()
+        for summary in sealed:
+            if since is None and until is None or summary.overlaps(since, until):
+                for _, _, record in self._iter_segment(summary.segment, 0):
+                    if _in_window(record, since, until):
+                        yield record
+        for _, _, record in items:
+            if _in_window(record, since, until):
+                yield record
+
+    def aggregate(self, *, since: Optional[int] = None, until: Optional[int] = None) -> SegmentSummary:
+        """Count and amount sum over [since, until), scanning only segments the window cuts through."""
+        total = SegmentSummary(segment=0)
+        sealed, _, items = self._view()
+        for summary in sealed:
+            if summary.within(since, until):
+                total.merge(summary)
+            elif summary.overlaps(since, until):
+                for _, _, record in self._iter_segment(summary.segment, 0):
+                    if _in_window(record, since, until):
+                        total.add(record)
+        for _, _, record in items:
+            if _in_window(record, since, until):
+                total.add(record)
+        return total
@@ -1,47 +1,61 @@
 from __future__ import annotations
 
+import threading
 from dataclasses import asdict
 from pathlib import Path
 from typing import Any, Dict
 
 from config import Config
-from services.files import read_json, write_json
+from services.files import read_json, read_json_cached, write_json
 
 
 class SettingsService:
     def __init__(self, path: Path) -> None:
         self.path = path
+        self._lock = threading.Lock()
 
     def _load(self) -> Dict[str, Any]:
+        return read_json_cached(self.path, default={})
+
+    def _load_for_update(self) -> Dict[str, Any]:
         return read_json(self.path, default={})
 
     def _save(self, data: Dict[str, Any]) -> None:
         write_json(self.path, data)
 
+    def overrides(self) -> Dict[str, Any]:
+        return dict(self._load())
+
     def apply(self, config: Config) -> None:
-        data = self._load()
-        if "price_uah" in data:
-            config.guide.price_uah = int(data["price_uah"])
-        if "old_price_uah" in data:
-            config.guide.old_price_uah = int(data["old_price_uah"])
-        if "guide_url" in data:
-            config.guide.url = str(data["guide_url"])
-        if "sales_enabled" in data:
-            config.sales_enabled = bool(data["sales_enabled"])
+        apply_overrides(config, self._load())
 
     def set_price(self, price_uah: int, old_price_uah: int | None = None) -> None:
-        data = self._load()
-        data["price_uah"] = price_uah
-        if old_price_uah is not None:
-            data["old_price_uah"] = old_price_uah
-        self._save(data)
+        with self._lock:
+            data = self._load_for_update()
+            data["price_uah"] = price_uah
+            if old_price_uah is not None:
+                data["old_price_uah"] = old_price_uah
+            self._save(data)
 
     def set_guide_url(self, url: str) -> None:
-        data = self._load()
-        data["guide_url"] = url
-        self._save(data)
+        with self._lock:
+            data = self._load_for_update()
+            data["guide_url"] = url
+            self._save(data)
 
     def set_sales_enabled(self, enabled: bool) -> None:
-        data = self._load()
-        data["sales_enabled"] = enabled
-        self._save(data)
+        with self._lock:
+            data = self._load_for_update()
+            data["sales_enabled"] = enabled
+            self._save(data)
+
+
+def apply_overrides(config: Config, data: Dict[str, Any]) -> None:
+    if "price_uah" in data:
+        config.guide.price_uah = int(data["price_uah"])
+    if "old_price_uah" in data:
+        config.guide.old_price_uah = int(data["old_price_uah"])
+    if "guide_url" in data:
+        config.guide.url = str(data["guide_url"])
+    if "sales_enabled" in data:
+        config.sales_enabled = bool(data["sales_enabled"])
@@ -0,0 +1,446 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from services.access import AccessRecord
+from services.metrics import MetricsSnapshot
+from services.segments import SegmentSummary
+from services.storage import LedgerRecord, OrderRecord, PurchaseRecord
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS purchases (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    charge_id TEXT NOT NULL UNIQUE,
+    amount INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    ts INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS purchases_user ON purchases (user_id);
+CREATE INDEX IF NOT EXISTS purchases_ts ON purchases (ts);
+
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS orders_ts ON orders (ts);
+
+CREATE TABLE IF NOT EXISTS ledger (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    amount INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    charge_id TEXT,
+    comment TEXT,
+    ts INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ledger_user ON ledger (user_id);
+CREATE INDEX IF NOT EXISTS ledger_ts ON ledger (ts);
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    first_seen INTEGER,
+    username TEXT,
+    started INTEGER NOT NULL DEFAULT 0,
+    buy_clicks INTEGER NOT NULL DEFAULT 0,
+    purchased INTEGER NOT NULL DEFAULT 0,
+    blocked INTEGER NOT NULL DEFAULT 0,
+    is_blocked INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS access (
+    user_id INTEGER PRIMARY KEY,
+    has_access INTEGER NOT NULL,
+    last_charge_id TEXT NOT NULL,
+    ts INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS counters (
+    scope TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (scope, name)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS unique_users (
+    key TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (key, user_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS metric_buckets (
+    name TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (name, bucket)
+) WITHOUT ROWID;
+"""
+
+METRIC_RETENTION = 30 * 86400
+
+_SYNCHRONOUS = {"never": "OFF", "on-rename": "NORMAL", "always": "FULL"}
+
+
+class Database:
+    """One WAL-mode SQLite file shared by the services; each thread gets its own connection."""
+
+    def __init__(self, path: Path, *, fsync_policy: str = "on-rename") -> None:
+        self.path = path
+        self.synchronous = _SYNCHRONOUS[fsync_policy]
+        self._local = threading.local()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self.connection()
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+        if "is_blocked" not in columns:
+            conn.execute("ALTER TABLE users ADD COLUMN is_blocked INTEGER NOT NULL DEFAULT 0")
+            conn.execute("UPDATE users SET is_blocked = 1 WHERE blocked > 0")
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            self._local.conn = conn
+        return conn
+
+    def execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        return self.connection().execute(sql, params)
+
+    def transaction(self) -> "_Transaction":
+        return _Transaction(self.connection())
+
+    def checkpoint(self) -> None:
+        self.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+
+class _Transaction:
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def _rows(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+    return [dict(row) for row in cursor]
+
+
+def _summary(row: sqlite3.Row) -> SegmentSummary:
+    return SegmentSummary(segment=0, count=row[0], amount=row[1] or 0, ts_min=row[2], ts_max=row[3])
+
+
+class SqliteStorageService:
+    def __init__(self, db: Database) -> None:
+        self.db = db
+
+    def add_purchase(self, user_id: int, charge_id: str, amount: int, payload: str) -> PurchaseRecord:
+        record = PurchaseRecord(user_id=user_id, charge_id=charge_id, amount=amount, payload=payload, ts=int(time.time()))
+        self.db.execute(
+            "INSERT OR IGNORE INTO purchases (user_id, charge_id, amount, payload, ts) VALUES (?, ?, ?, ?, ?)",
+            (record.user_id, record.charge_id, record.amount, record.payload, record.ts),
+        )
+        return record
+
+    def add_purchase_if_new(self, user_id: int, charge_id: str, amount: int, payload: str) -> Optional[PurchaseRecord]:
+        record = PurchaseRecord(user_id=user_id, charge_id=charge_id, amount=amount, payload=payload, ts=int(time.time()))
+        cursor = self.db.execute(
+            "INSERT OR IGNORE INTO purchases (user_id, charge_id, amount, payload, ts) VALUES (?, ?, ?, ?, ?)",
+            (record.user_id, record.charge_id, record.amount, record.payload, record.ts),
+        )
+        return record if cursor.rowcount else None
+
+    def add_order(
+        self,
+        user_id: int,
+        payload: str,
+        amount: int,
+        status: str,
+        *,
+        reason: str | None = None,
+    ) -> OrderRecord:
+        record = OrderRecord(user_id=user_id, payload=payload, amount=amount, status=status, ts=int(time.time()), reason=reason)
+        self.db.execute(
+            "INSERT INTO orders (user_id, payload, amount, status, ts, reason) VALUES (?, ?, ?, ?, ?, ?)",
+            (record.user_id, record.payload, record.amount, record.status, record.ts, record.reason),
+        )
+        return record
+
+    def add_ledger_entry(self, user_id: int, amount: int, kind: str, *, charge_id: Optional[str] = None, comment: Optional[str] = None) -> LedgerRecord:
+        record = LedgerRecord(user_id=user_id, amount=amount, kind=kind, charge_id=charge_id, comment=comment, ts=int(time.time()))
+        self.db.execute(
+            "INSERT INTO ledger (user_id, amount, kind, charge_id, comment, ts) VALUES (?, ?, ?, ?, ?, ?)",
+            (record.user_id, record.amount, record.kind, record.charge_id, record.comment, record.ts),
+        )
+        return record
+
+    def _read(self, table: str, columns: str, limit: Optional[int], since: Optional[int]) -> List[Dict[str, Any]]:
+        sql = f"SELECT {columns} FROM {table}"
+        params: tuple = ()
+        if since is not None:
+            sql += " WHERE ts >= ?"
+            params = (since,)
+        sql += " ORDER BY id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params += (limit,)
+        rows = _rows(self.db.execute(sql, params))
+        rows.reverse()
+        return rows
+
+    def read_purchases(self, limit: Optional[int] = None, *, since: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._read("purchases", "user_id, charge_id, amount, payload, ts", limit, since)
+
+    def read_orders(self, limit: Optional[int] = None, *, since: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._read("orders", "user_id, payload, amount, status, ts, reason", limit, since)
+
+    def read_ledger(self, limit: Optional[int] = None, *, since: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._read("ledger", "user_id, amount, kind, charge_id, comment, ts", limit, since)
+
+    def find_purchase(self, charge_id: str) -> Dict[str, Any] | None:
+        row = self.db.execute(
+            "SELECT user_id, charge_id, amount, payload, ts FROM purchases WHERE charge_id = ?", (charge_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def charge_exists(self, charge_id: str) -> bool:
+        return self.db.execute("SELECT 1 FROM purchases WHERE charge_id = ?", (charge_id,)).fetchone() is not None
+
+    def compute_balance(self) -> int:
+        row = self.db.execute(
+            "SELECT (SELECT COALESCE(SUM(amount), 0) FROM purchases) + (SELECT COALESCE(SUM(amount), 0) FROM ledger)"
+        ).fetchone()
+        return int(row[0])
+
+    def compute_user_balance(self, user_id: int) -> int:
+        row = self.db.execute(
+            "SELECT (SELECT COALESCE(SUM(amount), 0) FROM purchases WHERE user_id = ?)"
+            " + (SELECT COALESCE(SUM(amount), 0) FROM ledger WHERE user_id = ?)",
+            (user_id, user_id),
+        ).fetchone()
+        return int(row[0])
+
+    def report(self, since: int, until: Optional[int] = None) -> Dict[str, SegmentSummary]:
+        until = until if until is not None else 2**62
+        result = {}
+        for name in ("purchases", "orders", "ledger"):
+            row = self.db.execute(
+                f"SELECT COUNT(*), SUM(amount), MIN(ts), MAX(ts) FROM {name} WHERE ts >= ? AND ts < ?",
+                (since, until),
+            ).fetchone()
+            result[name] = _summary(row)
+        return result
+
+    def flush(self) -> None:
+        self.db.checkpoint()
+
+
+_SEGMENT_FILTERS = {
+    "reachable": "is_blocked = 0",
+    "started_only": "is_blocked = 0 AND buy_clicks = 0 AND purchased = 0",
+    "clicked_not_bought": "is_blocked = 0 AND buy_clicks > 0 AND purchased = 0",
+    "purchasers": "is_blocked = 0 AND purchased > 0",
+}
+
+
+class SqliteUserService:
+    def __init__(self, db: Database) -> None:
+        self.db = db
+
+    def register_start(self, user_id: int, username: str | None) -> None:
+        self.db.execute(
+            "INSERT INTO users (user_id, first_seen, username, started) VALUES (?, ?, ?, 1)"
+            " ON CONFLICT (user_id) DO UPDATE SET username = excluded.username, started = 1, is_blocked = 0,"
+            " first_seen = COALESCE(first_seen, excluded.first_seen)"
+            " WHERE username IS NOT excluded.username OR started = 0 OR first_seen IS NULL OR is_blocked = 1",
+            (user_id, int(time.time()), username),
+        )
+
+    def _bump(self, user_id: int, column: str) -> None:
+        self.db.execute(
+            f"INSERT INTO users (user_id, {column}) VALUES (?, 1)"
+            f" ON CONFLICT (user_id) DO UPDATE SET {column} = {column} + 1",
+            (user_id,),
+        )
+
+    def mark_buy_click(self, user_id: int) -> None:
+        self._bump(user_id, "buy_clicks")
+
+    def mark_purchase(self, user_id: int) -> None:
+        self._bump(user_id, "purchased")
+
+    def mark_blocked(self, user_id: int) -> None:
+        self.db.execute(
+            "INSERT INTO users (user_id, blocked, is_blocked) VALUES (?, 1, 1)"
+            " ON CONFLICT (user_id) DO UPDATE SET blocked = blocked + 1, is_blocked = 1",
+            (user_id,),
+        )
+
+    def mark_unblocked(self, user_id: int) -> None:
+        self.db.execute("UPDATE users SET is_blocked = 0 WHERE user_id = ?", (user_id,))
+
+    def stats(self) -> Dict[str, int]:
+        row = self.db.execute(
+            "SELECT COUNT(*), SUM(started > 0), SUM(buy_clicks > 0), SUM(purchased > 0), SUM(blocked > 0) FROM users"
+        ).fetchone()
+        return {
+            "total": row[0],
+            "started": row[1] or 0,
+            "buy_clicked": row[2] or 0,
+            "purchased": row[3] or 0,
+            "blocked": row[4] or 0,
+        }
+
+    def all_user_ids(self) -> list[int]:
+        return [row[0] for row in self.db.execute("SELECT user_id FROM users ORDER BY user_id")]
+
+    def segment(self, name: str) -> list[int]:
+        where = _SEGMENT_FILTERS[name]
+        return [row[0] for row in self.db.execute(f"SELECT user_id FROM users WHERE {where} ORDER BY user_id")]
+
+    def segment_sizes(self) -> Dict[str, int]:
+        columns = ", ".join(f"SUM({where})" for where in _SEGMENT_FILTERS.values())
+        row = self.db.execute(f"SELECT {columns} FROM users").fetchone()
+        return {name: value or 0 for name, value in zip(_SEGMENT_FILTERS, row)}
+
+    def flush(self) -> None:
+        self.db.checkpoint()
+
+
+class SqliteAccessService:
+    def __init__(self, db: Database) -> None:
+        self.db = db
+
+    def load(self) -> Dict[str, dict]:
+        return {
+            str(row["user_id"]): {
+                "has_access": bool(row["has_access"]),
+                "last_charge_id": row["last_charge_id"],
+                "ts": row["ts"],
+            }
+            for row in self.db.execute("SELECT * FROM access")
+        }
+
+    def set_access(self, user_id: int, charge_id: str) -> AccessRecord:
+        record = AccessRecord(has_access=True, last_charge_id=charge_id, ts=int(time.time()))
+        self.db.execute(
+            "INSERT OR REPLACE INTO access (user_id, has_access, last_charge_id, ts) VALUES (?, 1, ?, ?)",
+            (user_id, record.last_charge_id, record.ts),
+        )
+        return record
+
+    def has_access(self, user_id: int) -> bool:
+        row = self.db.execute("SELECT has_access FROM access WHERE user_id = ?", (user_id,)).fetchone()
+        return bool(row and row[0])
+
+    def get(self, user_id: int) -> AccessRecord | None:
+        row = self.db.execute("SELECT has_access, last_charge_id, ts FROM access WHERE user_id = ?", (user_id,)).fetchone()
+        if not row:
+            return None
+        return AccessRecord(has_access=bool(row[0]), last_charge_id=row[1], ts=row[2])
+
+    def flush(self) -> None:
+        pass
+
+
+class _Counters:
+    scope = ""
+
+    def __init__(self, db: Database) -> None:
+        self.db = db
+
+    def increment(self, key: str, amount: int = 1) -> None:
+        self.db.execute(
+            "INSERT INTO counters (scope, name, value) VALUES (?, ?, ?)"
+            " ON CONFLICT (scope, name) DO UPDATE SET value = value + excluded.value",
+            (self.scope, key, amount),
+        )
+
+    def _values(self) -> Dict[str, int]:
+        return {row[0]: row[1] for row in self.db.execute("SELECT name, value FROM counters WHERE scope = ?", (self.scope,))}
+
+
+class SqliteMetricsService(_Counters):
+    """Totals in ``counters``; per-minute counts in ``metric_buckets`` for the last 30 days."""
+
+    scope = "metrics"
+
+    def _add(self, conn: sqlite3.Connection, key: str, amount: int) -> None:
+        conn.execute(
+            "INSERT INTO counters (scope, name, value) VALUES (?, ?, ?)"
+            " ON CONFLICT (scope, name) DO UPDATE SET value = value + excluded.value",
+            (self.scope, key, amount),
+        )
+        conn.execute(
+            "INSERT INTO metric_buckets (name, bucket, value) VALUES (?, ?, ?)"
+            " ON CONFLICT (name, bucket) DO UPDATE SET value = value + excluded.value",
+            (key, int(time.time()) // 60 * 60, amount),
+        )
+
+    def increment(self, key: str, amount: int = 1) -> None:
+        with self.db.transaction() as conn:
+            self._add(conn, key, amount)
+
+    def ensure_user(self, key: str, user_id: int) -> None:
+        with self.db.transaction() as conn:
+            inserted = conn.execute("INSERT OR IGNORE INTO unique_users (key, user_id) VALUES (?, ?)", (key, user_id)).rowcount
+            if inserted:
+                self._add(conn, key, 1)
+
+    def windows(self, seconds: Sequence[int]) -> Dict[str, List[int]]:
+        now = int(time.time())
+        result: Dict[str, List[int]] = {name: [0] * len(seconds) for name in self._values()}
+        for index, window in enumerate(seconds):
+            rows = self.db.execute(
+                "SELECT name, SUM(value) FROM metric_buckets WHERE bucket >= ? GROUP BY name",
+                ((now - window) // 60 * 60,),
+            )
+            for name, total in rows:
+                result.setdefault(name, [0] * len(seconds))[index] = total
+        return result
+
+    def buckets(self, key: str, seconds: int) -> List[Tuple[int, int]]:
+        width = 60 if seconds <= 86400 else 3600
+        rows = self.db.execute(
+            "SELECT bucket / ? * ?, SUM(value) FROM metric_buckets WHERE name = ? AND bucket >= ?"
+            " GROUP BY 1 ORDER BY 1",
+            (width, width, key, (int(time.time()) - seconds) // width * width),
+        )
+        return [(row[0], row[1]) for row in rows]
+
+    def snapshot(self) -> MetricsSnapshot:
+        data = self._values()
+        return MetricsSnapshot(
+            unique_users_started=data.get("unique_users_started", 0),
+            buy_clicks=data.get("buy_clicks", 0),
+            purchases_success=data.get("purchases_success", 0),
+            purchases_fail=data.get("purchases_fail", 0),
+            blocked_bot=data.get("blocked_bot", 0),
+        )
+
+    def flush(self) -> None:
+        self.db.execute("DELETE FROM metric_buckets WHERE bucket < ?", (int(time.time()) - METRIC_RETENTION,))
+
+
+class SqliteAlertService(_Counters):
+    scope = "alerts"
+
+    def snapshot(self) -> Dict[str, int]:
+        data = {"sent": 0, "failed": 0}
+        data.update(self._values())
+        return data
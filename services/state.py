@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+
+
+class StateStore:
+    """FSM states and data for every worker, held by the storage daemon (in memory, like aiogram's MemoryStorage)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._records: Dict[str, Tuple[Optional[str], Dict[str, Any]]] = {}
+
+    def get(self, key: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        with self._lock:
+            return self._records.get(key, (None, {}))
+
+    def set_state(self, key: str, state: Optional[str]) -> None:
+        with self._lock:
+            _, data = self._records.get(key, (None, {}))
+            self._store(key, state, data)
+
+    def set_data(self, key: str, data: Dict[str, Any]) -> None:
+        with self._lock:
+            state, _ = self._records.get(key, (None, {}))
+            self._store(key, state, dict(data))
+
+    def _store(self, key: str, state: Optional[str], data: Dict[str, Any]) -> None:
+        if state is None and not data:
+            self._records.pop(key, None)
+        else:
+            self._records[key] = (state, data)
+
+
+class FacadeStorage(BaseStorage):
+    """aiogram FSM storage over an (async or remote) facade of ``StateStore``."""
+
+    def __init__(self, store: Any) -> None:
+        self.store = store
+        self.key_builder = DefaultKeyBuilder(with_destiny=True, with_business_connection_id=True)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self.store.set_state(self.key_builder.build(key), state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self.store.get(self.key_builder.build(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self.store.set_data(self.key_builder.build(key), data)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self.store.get(self.key_builder.build(key))
+        return dict(data)
+
+    async def close(self) -> None:
+        pass
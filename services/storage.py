@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+import threading
 import time
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-from services.files import append_jsonl, read_json, write_json
+from services.indexes import BalanceView, ChargeIndex
+from services.segments import SegmentedLog, SegmentSummary
 
 
 @dataclass(slots=True)
@@ -38,16 +40,41 @@ class LedgerRecord:
 
 
 class StorageService:
-    def __init__(self, purchases: Path, orders: Path, ledger: Path) -> None:
+    def __init__(
+        self,
+        purchases: Path,
+        orders: Path,
+        ledger: Path,
+        balances: Path,
+        *,
+        segment_max_bytes: int = 4_000_000,
+        segment_max_age: float = 0,
+    ) -> None:
         self.purchases_path = purchases
         self.orders_path = orders
         self.ledger_path = ledger
+        self.purchases = SegmentedLog(purchases, max_bytes=segment_max_bytes, max_age=segment_max_age)
+        self.orders = SegmentedLog(orders, max_bytes=segment_max_bytes, max_age=segment_max_age)
+        self.ledger = SegmentedLog(ledger, max_bytes=segment_max_bytes, max_age=segment_max_age)
+        self.charges = ChargeIndex(self.purchases)
+        self.balances = BalanceView(balances, [self.purchases, self.ledger])
+        self._purchase_lock = threading.RLock()
 
     def add_purchase(self, user_id: int, charge_id: str, amount: int, payload: str) -> PurchaseRecord:
         record = PurchaseRecord(user_id=user_id, charge_id=charge_id, amount=amount, payload=payload, ts=int(time.time()))
-        append_jsonl(self.purchases_path, record.__dict__)
+        with self._purchase_lock:
+            self.purchases.append(asdict(record))
+            self.charges.catch_up()
+        self.balances.catch_up()
         return record
 
+    def add_purchase_if_new(self, user_id: int, charge_id: str, amount: int, payload: str) -> Optional[PurchaseRecord]:
+        """Record the purchase unless ``charge_id`` is already known; None for a repeated delivery."""
+        with self._purchase_lock:
+            if charge_id in self.charges:
+                return None
+            return self.add_purchase(user_id, charge_id, amount, payload)
+
     def add_order(
         self,
         user_id: int,
@@ -65,7 +92,7 @@ class StorageService:
             ts=int(time.time()),
             reason=reason,
         )
-        append_jsonl(self.orders_path, record.__dict__)
+        self.orders.append(asdict(record))
         return record
 
     def add_ledger_entry(self, user_id: int, amount: int, kind: str, *, charge_id: Optional[str] = None, comment: Optional[str] = None) -> LedgerRecord:
@@ -77,77 +104,48 @@ class StorageService:
             comment=comment,
             ts=int(time.time()),
         )
-        append_jsonl(self.ledger_path, record.__dict__)
+        self.ledger.append(asdict(record))
+        self.balances.catch_up()
         return record
 
-    def read_purchases(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        return _read_jsonl(self.purchases_path, limit=limit)
+    def read_purchases(self, limit: Optional[int] = None, *, since: Optional[int] = None) -> List[Dict[str, Any]]:
+        return _read_log(self.purchases, limit=limit, since=since)
 
     def find_purchase(self, charge_id: str) -> Dict[str, Any] | None:
-        if not self.purchases_path.exists():
-            return None
-        from services.files import locked_file
-        import ujson
-
-        with locked_file(self.purchases_path, "r") as file_obj:
-            for line in file_obj:
-                if not line.strip():
-                    continue
-                data = ujson.loads(line)
-                if data.get("charge_id") == charge_id:
-                    return data
-        return None
+        return self.charges.lookup(charge_id)
 
     def charge_exists(self, charge_id: str) -> bool:
-        if not self.purchases_path.exists():
-            return False
-        from services.files import locked_file
-
-        with locked_file(self.purchases_path, "r") as file_obj:
-            for line in file_obj:
-                if not line.strip():
-                    continue
-                import ujson
-
-                data = ujson.loads(line)
-                if data.get("charge_id") == charge_id:
-                    return True
-        return False
+        return charge_id in self.charges
 
-    def read_orders(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        return _read_jsonl(self.orders_path, limit=limit)
+    def read_orders(self, limit: Optional[int] = None, *, since: Optional[int] = None) -> List[Dict[str, Any]]:
+        return _read_log(self.orders, limit=limit, since=since)
 
-    def read_ledger(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        return _read_jsonl(self.ledger_path, limit=limit)
+    def read_ledger(self, limit: Optional[int] = None, *, since: Optional[int] = None) -> List[Dict[str, Any]]:
+        return _read_log(self.ledger, limit=limit, since=since)
 
     def compute_balance(self) -> int:
-        total = 0
-        for purchase in self.read_purchases():
-            total += int(purchase.get("amount", 0))
-        for entry in self.read_ledger():
-            total += int(entry.get("amount", 0))
-        return total
+        return self.balances.balance()
 
     def compute_user_balance(self, user_id: int) -> int:
-        total = 0
-        for purchase in self.read_purchases():
-            if int(purchase.get("user_id", 0)) == user_id:
-                total += int(purchase.get("amount", 0))
-        for entry in self.read_ledger():
-            if int(entry.get("user_id", 0)) == user_id:
-                total += int(entry.get("amount", 0))
-        return total
-
-
-def _read_jsonl(path: Path, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-    if not path.exists():
-        return []
-    from services.files import locked_file
-
-    with locked_file(path, "r") as file_obj:
-        lines = file_obj.readlines()
-    if limit is not None:
-        lines = lines[-limit:]
-    import ujson
+        return self.balances.user_balance(user_id)
+
+    def report(self, since: int, until: Optional[int] = None) -> Dict[str, SegmentSummary]:
+        return {
+            "purchases": self.purchases.aggregate(since=since, until=until),
+            "orders": self.orders.aggregate(since=since, until=until),
+            "ledger": self.ledger.aggregate(since=since, until=until),
+        }
+
+    def flush(self) -> None:
+        self.balances.checkpoint()
 
-    return [ujson.loads(line) for line in lines if line.strip()]
+
+def _read_log(log: SegmentedLog, limit: Optional[int] = None, since: Optional[int] = None) -> List[Dict[str, Any]]:
+    if since is None:
+        if limit is not None:
+            return log.tail(limit)
+        return [record for _, _, record in log.iter_from()]
+    records = list(log.iter_records(since=since))
+    if limit is not None:
+        return records[max(0, len(records) - limit) :]
+    return records
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from services.files import read_json, write_json
+
+SERIES_KEY = "__series"
+
+
+class RingSeries:
+    """Fixed number of ``width``-second buckets; a slot is reused once its bucket falls out of range."""
+
+    __slots__ = ("width", "size", "starts", "values")
+
+    def __init__(self, width: int, size: int) -> None:
+        self.width = width
+        self.size = size
+        self.starts = [-1] * size
+        self.values = [0] * size
+
+    def add(self, ts: float, amount: int) -> None:
+        bucket = int(ts // self.width)
+        slot = bucket % self.size
+        if bucket < self.starts[slot]:
+            return
+        if self.starts[slot] != bucket:
+            self.starts[slot] = bucket
+            self.values[slot] = 0
+        self.values[slot] += amount
+
+    def buckets(self, since: float, until: float) -> List[Tuple[int, int]]:
+        """(bucket start ts, value) for non-empty buckets overlapping [since, until), oldest first."""
+        last = int(until // self.width)
+        first = max(int(since // self.width), last - self.size + 1)
+        result = []
+        for bucket in range(first, last + 1 if until > since else first):
+            slot = bucket % self.size
+            if self.starts[slot] == bucket and self.values[slot]:
+                result.append((bucket * self.width, self.values[slot]))
+        return result
+
+    def dump(self) -> List[List[int]]:
+        return [[bucket, value] for bucket, value in zip(self.starts, self.values) if bucket >= 0 and value]
+
+    def load(self, items: List[List[int]]) -> None:
+        for bucket, value in items:
+            slot = bucket % self.size
+            if bucket > self.starts[slot]:
+                self.starts[slot] = bucket
+                self.values[slot] = value
+
+
+class CounterRegistry:
+    """Named counters aggregated in memory: lifetime totals plus minute and hour rings.
+
+    Increments only touch memory; ``flush`` writes totals and the rings to
+    ``path`` in one document when something changed. The totals stay top-level
+    keys so older readers of ``metrics.json`` keep working.
+    """
+
+    def __init__(self, path: Path, *, minutes: int = 24 * 60, hours: int = 30 * 24) -> None:
+        self.path = path
+        self.minutes = minutes
+        self.hours = hours
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._dirty = False
+        self._series: Dict[str, Tuple[RingSeries, RingSeries]] = {}
+        data = read_json(path, default={})
+        stored = data.pop(SERIES_KEY, {})
+        self.totals = {name: value for name, value in data.items() if isinstance(value, int)}
+        for name, item in stored.items():
+            minute, hour = self._rings(name)
+            minute.load(item.get("m", []))
+            hour.load(item.get("h", []))
+
+    def _rings(self, name: str) -> Tuple[RingSeries, RingSeries]:
+        rings = self._series.get(name)
+        if rings is None:
+            rings = self._series[name] = (RingSeries(60, self.minutes), RingSeries(3600, self.hours))
+        return rings
+
+    def increment(self, name: str, amount: int = 1, *, ts: Optional[float] = None) -> None:
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            self.totals[name] = self.totals.get(name, 0) + amount
+            minute, hour = self._rings(name)
+            minute.add(ts, amount)
+            hour.add(ts, amount)
+            self._dirty = True
+
+    def raise_total(self, name: str, value: int) -> None:
+        """Lift a lifetime total to at least ``value`` without adding events to the rings."""
+        with self._lock:
+            if self.totals.get(name, 0) < value:
+                self.totals[name] = value
+                self._dirty = True
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.totals)
+
+    def buckets(self, name: str, seconds: int, *, now: Optional[float] = None) -> List[Tuple[int, int]]:
+        """Per-minute buckets for the last ``seconds`` if the minute ring covers them, else per-hour."""
+        now = time.time() if now is None else now
+        with self._lock:
+            rings = self._series.get(name)
+            if rings is None:
+                return []
+            minute, hour = rings
+            ring = minute if seconds <= minute.width * minute.size else hour
+            return ring.buckets(now - seconds, now)
+
+    def count(self, name: str, seconds: int, *, now: Optional[float] = None) -> int:
+        return sum(value for _, value in self.buckets(name, seconds, now=now))
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                data: Dict[str, object] = dict(self.totals)
+                data[SERIES_KEY] = {
+                    name: {"m": minute.dump(), "h": hour.dump()} for name, (minute, hour) in self._series.items()
+                }
+                self._dirty = False
+            try:
+                write_json(self.path, data)
+            except BaseException:
+                self._dirty = True
+                raise
@@ -1,70 +1,135 @@
 from __future__ import annotations
 
+import logging
+import threading
 import time
 from pathlib import Path
-from typing import Dict
+from typing import Callable, Dict, Iterator, List, Optional, Set
 
-from services.files import read_json, write_json
+from services.journal import JournaledTable, ShardedTable
+
+logger = logging.getLogger(__name__)
+
+SEGMENTS = {
+    "reachable": "Усі, хто не заблокував бота",
+    "started_only": "Стартували, не натискали «Купити»",
+    "clicked_not_bought": "Натиснули «Купити», не купили",
+    "purchasers": "Покупці",
+}
+
+
+def is_blocked(entry: dict) -> bool:
+    return bool(entry.get("is_blocked", entry.get("blocked")))
+
+
+def segments_of(entry: dict) -> List[str]:
+    if is_blocked(entry):
+        return []
+    if entry.get("purchased"):
+        return ["reachable", "purchasers"]
+    if entry.get("buy_clicks"):
+        return ["reachable", "clicked_not_bought"]
+    return ["reachable", "started_only"]
 
 
 class UserService:
-    def __init__(self, path: Path) -> None:
-        self.path = path
+    """Users sharded by id across ``shards`` files in ``directory``; a single-file ``legacy_file`` is split on first start."""
+
+    def __init__(self, directory: Path, *, shards: int = 16, legacy_file: Optional[Path] = None) -> None:
+        self.directory = directory
+        if legacy_file is not None and ShardedTable.stored_shards(directory) is None:
+            self._migrate_legacy(legacy_file, shards)
+        self.table = ShardedTable(directory, shards)
+        self._segments: Dict[str, Set[int]] = {name: set() for name in SEGMENTS}
+        self._segment_lock = threading.Lock()
+        for user_id, entry in self.table.items():
+            for name in segments_of(entry):
+                self._segments[name].add(int(user_id))
 
-    def _load(self) -> Dict[str, dict]:
-        return read_json(self.path, default={})
+    def _migrate_legacy(self, legacy_file: Path, shards: int) -> None:
+        legacy = JournaledTable(legacy_file)
+        if not legacy_file.exists() and not legacy.journal_path.exists():
+            return
+        count = ShardedTable.build(self.directory, shards, legacy.items())
+        for path in (legacy_file, legacy.journal_path):
+            if path.exists():
+                path.rename(path.with_name(path.name + ".migrated"))
+        logger.info("Перенесено %s користувачів із %s у %s шардів", count, legacy_file, shards)
 
-    def _save(self, data: Dict[str, dict]) -> None:
-        write_json(self.path, data)
+    def _update(self, user_id: int, mutate: Callable[[dict], None]) -> None:
+        self.table.update(str(user_id), mutate)
+        with self._segment_lock:
+            entry = self.table.get(str(user_id)) or {}
+            member_of = segments_of(entry)
+            for name, members in self._segments.items():
+                if name in member_of:
+                    members.add(user_id)
+                else:
+                    members.discard(user_id)
 
     def register_start(self, user_id: int, username: str | None) -> None:
-        data = self._load()
-        user_key = str(user_id)
-        entry = data.get(user_key, {})
-        entry.setdefault("first_seen", int(time.time()))
-        entry["username"] = username
-        entry["started"] = True
-        data[user_key] = entry
-        self._save(data)
+        def mutate(entry: dict) -> None:
+            entry.setdefault("first_seen", int(time.time()))
+            entry["username"] = username
+            entry["started"] = True
+            entry["is_blocked"] = False
+
+        self._update(user_id, mutate)
 
     def mark_buy_click(self, user_id: int) -> None:
-        data = self._load()
-        user_key = str(user_id)
-        entry = data.get(user_key, {})
-        entry["buy_clicks"] = entry.get("buy_clicks", 0) + 1
-        data[user_key] = entry
-        self._save(data)
+        def mutate(entry: dict) -> None:
+            entry["buy_clicks"] = entry.get("buy_clicks", 0) + 1
+
+        self._update(user_id, mutate)
 
     def mark_purchase(self, user_id: int) -> None:
-        data = self._load()
-        user_key = str(user_id)
-        entry = data.get(user_key, {})
-        entry["purchased"] = entry.get("purchased", 0) + 1
-        data[user_key] = entry
-        self._save(data)
+        def mutate(entry: dict) -> None:
+            entry["purchased"] = entry.get("purchased", 0) + 1
+
+        self._update(user_id, mutate)
 
     def mark_blocked(self, user_id: int) -> None:
-        data = self._load()
-        user_key = str(user_id)
-        entry = data.get(user_key, {})
-        entry["blocked"] = entry.get("blocked", 0) + 1
-        data[user_key] = entry
-        self._save(data)
+        def mutate(entry: dict) -> None:
+            entry["blocked"] = entry.get("blocked", 0) + 1
+            entry["is_blocked"] = True
+
+        self._update(user_id, mutate)
+
+    def mark_unblocked(self, user_id: int) -> None:
+        def mutate(entry: dict) -> None:
+            entry["is_blocked"] = False
+
+        self._update(user_id, mutate)
 
     def stats(self) -> Dict[str, int]:
-        data = self._load()
-        total_users = len(data)
-        started = sum(1 for item in data.values() if item.get("started"))
-        buy_clicks = sum(1 for item in data.values() if item.get("buy_clicks"))
-        purchased = sum(1 for item in data.values() if item.get("purchased"))
-        blocked = sum(1 for item in data.values() if item.get("blocked"))
+        total = started = buy_clicks = purchased = blocked = 0
+        for item in self.table.values():
+            total += 1
+            started += bool(item.get("started"))
+            buy_clicks += bool(item.get("buy_clicks"))
+            purchased += bool(item.get("purchased"))
+            blocked += bool(item.get("blocked"))
         return {
-            "total": total_users,
+            "total": total,
             "started": started,
             "buy_clicked": buy_clicks,
             "purchased": purchased,
             "blocked": blocked,
         }
 
+    def iter_user_ids(self) -> Iterator[int]:
+        return (int(user_id) for user_id in self.table.keys())
+
     def all_user_ids(self) -> list[int]:
-        return [int(user_id) for user_id in self._load().keys()]
+        return list(self.iter_user_ids())
+
+    def segment(self, name: str) -> list[int]:
+        with self._segment_lock:
+            return sorted(self._segments[name])
+
+    def segment_sizes(self) -> Dict[str, int]:
+        with self._segment_lock:
+            return {name: len(members) for name, members in self._segments.items()}
+
+    def flush(self) -> None:
+        self.table.compact()
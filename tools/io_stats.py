@@ -0,0 +1,57 @@
+"""Print the data files that cost the most time, from the dump written with IO_STATS=true.
+
+The bot (or the storage daemon with WORKERS > 1) rewrites IO_STATS_FILE every
+SNAPSHOT_INTERVAL seconds and on shutdown. Run from the repository root:
+
+    python -m tools.io_stats --file logs/io_stats.json --sort wait --limit 20
+
+Times are totals since start in milliseconds: waiting for the lock (in-process
+queue plus ``flock``), holding it, parsing and serializing JSON.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+from services.files import PathIOStats, load_io_stats
+
+ORDER: Dict[str, Callable[[PathIOStats], float]] = {
+    "total": lambda entry: entry.seconds,
+    "wait": lambda entry: entry.lock_wait,
+    "held": lambda entry: entry.lock_held,
+    "parse": lambda entry: entry.parse,
+    "serialize": lambda entry: entry.serialize,
+    "read": lambda entry: entry.bytes_read,
+    "written": lambda entry: entry.bytes_written,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--file", type=Path, default=Path("logs/io_stats.json"))
+    parser.add_argument("--sort", choices=sorted(ORDER), default="total")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+    dumped, entries = load_io_stats(args.file)
+    if not dumped:
+        print(f"{args.file}: немає статистики, запустіть бота з IO_STATS=true", file=sys.stderr)
+        sys.exit(1)
+    entries.sort(key=ORDER[args.sort], reverse=True)
+    print(f"{args.file}: знімок {int(time.time()) - dumped} с тому, {len(entries)} файлів", file=sys.stderr)
+    print(
+        f"{'path':<40} {'locks':>8} {'wait ms':>9} {'max wait':>9} {'held ms':>9} {'max held':>9}"
+        f" {'parse ms':>9} {'ser ms':>9} {'read KB':>9} {'write KB':>9}"
+    )
+    for entry in entries[: args.limit]:
+        print(
+            f"{entry.path[-40:]:<40} {entry.locks:>8} {entry.lock_wait * 1000:>9.1f} {entry.max_lock_wait * 1000:>9.2f}"
+            f" {entry.lock_held * 1000:>9.1f} {entry.max_lock_held * 1000:>9.2f} {entry.parse * 1000:>9.1f}"
+            f" {entry.serialize * 1000:>9.1f} {entry.bytes_read / 1024:>9.0f} {entry.bytes_written / 1024:>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Copy the JSON/JSONL data files into the SQLite database used by STORAGE_BACKEND=sqlite.
+
+Run from the repository root with the bot stopped:
+
+    python -m tools.migrate_to_sqlite --data-dir data
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+from services.files import read_json
+from services.idset import IdSet
+from services.journal import JournaledTable, ShardedTable
+from services.segments import SegmentedLog
+from services.sqlite_backend import Database
+from services.users import is_blocked
+
+USER_COLUMNS = ("first_seen", "username", "started", "buy_clicks", "purchased", "blocked", "is_blocked")
+
+
+def _log(path: Path) -> SegmentedLog:
+    return SegmentedLog(path, max_bytes=2**62)
+
+
+def _users(data_dir: Path) -> JournaledTable | ShardedTable:
+    if ShardedTable.stored_shards(data_dir / "users") is not None:
+        return ShardedTable(data_dir / "users")
+    return JournaledTable(data_dir / "users.json")
+
+
+def migrate(data_dir: Path, target: Path) -> dict:
+    db = Database(target)
+    conn = db.connection()
+    existing = sum(
+        conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ("purchases", "orders", "ledger", "users", "access", "counters")
+    )
+    if existing:
+        raise SystemExit(f"{target} is not empty ({existing} rows), refusing to migrate twice")
+
+    counts = {}
+    with db.transaction():
+        counts["purchases"] = 0
+        for _, _, item in _log(data_dir / "purchases.jsonl").iter_from():
+            conn.execute(
+                "INSERT OR IGNORE INTO purchases (user_id, charge_id, amount, payload, ts) VALUES (?, ?, ?, ?, ?)",
+                (int(item["user_id"]), item["charge_id"], int(item["amount"]), item.get("payload", ""), int(item.get("ts", 0))),
+            )
+            counts["purchases"] += 1
+
+        counts["orders"] = 0
+        for _, _, item in _log(data_dir / "orders.jsonl").iter_from():
+            conn.execute(
+                "INSERT INTO orders (user_id, payload, amount, status, ts, reason) VALUES (?, ?, ?, ?, ?, ?)",
+                (int(item["user_id"]), item.get("payload", ""), int(item.get("amount", 0)), item.get("status", ""),
+                 int(item.get("ts", 0)), item.get("reason")),
+            )
+            counts["orders"] += 1
+
+        counts["ledger"] = 0
+        for _, _, item in _log(data_dir / "ledger.jsonl").iter_from():
+            conn.execute(
+                "INSERT INTO ledger (user_id, amount, kind, charge_id, comment, ts) VALUES (?, ?, ?, ?, ?, ?)",
+                (int(item["user_id"]), int(item["amount"]), item.get("kind", ""), item.get("charge_id"),
+                 item.get("comment"), int(item.get("ts", 0))),
+            )
+            counts["ledger"] += 1
+
+        users = _users(data_dir)
+        counts["users"] = 0
+        for user_id, entry in users.items():
+            conn.execute(
+                f"INSERT INTO users (user_id, {', '.join(USER_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (int(user_id), entry.get("first_seen"), entry.get("username"), int(bool(entry.get("started"))),
+                 int(entry.get("buy_clicks", 0)), int(entry.get("purchased", 0)), int(entry.get("blocked", 0)),
+                 int(is_blocked(entry))),
+            )
+            counts["users"] += 1
+
+        access = JournaledTable(data_dir / "access.json")
+        for user_id, record in access.items():
+            conn.execute(
+                "INSERT INTO access (user_id, has_access, last_charge_id, ts) VALUES (?, ?, ?, ?)",
+                (int(user_id), int(bool(record.get("has_access"))), record.get("last_charge_id", ""), int(record.get("ts", 0))),
+            )
+        counts["access"] = len(access)
+
+        metrics = read_json(data_dir / "metrics.json", default={})
+        unique = [(path.stem, IdSet(path)) for path in (data_dir / "unique").glob("*.ids")]
+        unique += [(name[len("__users_"):], value) for name, value in metrics.items() if name.startswith("__users_")]
+        for key, ids in unique:
+            conn.executemany(
+                "INSERT OR IGNORE INTO unique_users (key, user_id) VALUES (?, ?)",
+                ((key, int(user_id)) for user_id in ids),
+            )
+        for name, value in metrics.items():
+            if isinstance(value, int):
+                conn.execute("INSERT INTO counters (scope, name, value) VALUES ('metrics', ?, ?)", (name, value))
+
+        for name, value in read_json(data_dir / "alerts.json", default={}).items():
+            conn.execute("INSERT INTO counters (scope, name, value) VALUES ('alerts', ?, ?)", (name, int(value)))
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", type=Path, default=Path("data"))
+    parser.add_argument("--target", type=Path, default=None, help="default: <data-dir>/bot.sqlite3")
+    args = parser.parse_args()
+    target = args.target or args.data_dir / "bot.sqlite3"
+    counts = migrate(args.data_dir, target)
+    for name, count in counts.items():
+        print(f"{name}: {count}")
+    print(f"Готово: {target}. Запустіть бота з STORAGE_BACKEND=sqlite.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
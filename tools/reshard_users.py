@@ -0,0 +1,60 @@
+"""Redistribute data/users/ across a different number of shards (USER_SHARDS).
+
+Run from the repository root with the bot stopped:
+
+    python -m tools.reshard_users --shards 32 --data-dir data
+
+A single-file ``users.json`` from before sharding is picked up as the source
+when ``users/`` does not exist yet. The old layout is kept next to the new
+one as ``users.<old count>-shards`` (or ``users.json.migrated``).
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import sys
+import time
+from pathlib import Path
+
+from services.journal import JournaledTable, ShardedTable
+
+
+def reshard(data_dir: Path, shards: int) -> int:
+    directory = data_dir / "users"
+    staging = data_dir / "users.resharding"
+    if staging.exists():
+        shutil.rmtree(staging)
+    stored = ShardedTable.stored_shards(directory)
+    if stored is not None:
+        source = ShardedTable(directory)
+        count = ShardedTable.build(staging, shards, source.items())
+        backup = data_dir / f"users.{stored}-shards"
+        if backup.exists():
+            backup = data_dir / f"users.{stored}-shards.{int(time.time())}"
+        directory.rename(backup)
+        legacy = []
+    else:
+        source = JournaledTable(data_dir / "users.json")
+        count = ShardedTable.build(staging, shards, source.items())
+        legacy = [path for path in (source.path, source.journal_path) if path.exists()]
+    staging.rename(directory)
+    for path in legacy:
+        path.rename(path.with_name(path.name + ".migrated"))
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", type=int, required=True)
+    parser.add_argument("--data-dir", type=Path, default=Path("data"))
+    args = parser.parse_args()
+    if args.shards < 1:
+        parser.error("--shards must be positive")
+    started = time.perf_counter()
+    count = reshard(args.data_dir, args.shards)
+    print(f"users: {count} → {args.shards} шардів за {time.perf_counter() - started:.1f} с", file=sys.stderr)
+    print(f"Встановіть USER_SHARDS={args.shards} перед запуском бота.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
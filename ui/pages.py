@@ -3,7 +3,8 @@ from __future__ import annotations
 import base64
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from string import Formatter
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 from aiogram.types import (
     BufferedInputFile,
@@ -14,7 +15,6 @@ from aiogram.types import (
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from config import Config
-from services.content import ContentService, DEFAULT_PAGE_ONE
 
 
 @dataclass(slots=True)
@@ -23,10 +23,29 @@ class PageData:
     reply_markup: InlineKeyboardMarkup
 
 
+_keyboards: Dict[Tuple[int, int, bool, bool], InlineKeyboardMarkup] = {}
+_templates: Dict[str, Callable[[str, int], str]] = {}
+_TEMPLATE_FIELDS = ("username", "balance")
+
+
+def invalidate() -> None:
+    """Drop memoized keyboards and templates after a price or content edit."""
+    _keyboards.clear()
+    _templates.clear()
+
+
 def _build_base_keyboard(config: Config, *, forward: bool, has_admin: bool) -> InlineKeyboardMarkup:
+    key = (config.guide.price_uah, config.guide.old_price_uah, forward, has_admin)
+    markup = _keyboards.get(key)
+    if markup is None:
+        markup = _keyboards[key] = _render_base_keyboard(*key)
+    return markup
+
+
+def _render_base_keyboard(price_uah: int, old_price_uah: int, forward: bool, has_admin: bool) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(
-        text=f"✨ Купити • {config.guide.price_uah} UAH ( ~{config.guide.old_price_uah} )",
+        text=f"✨ Купити • {price_uah} UAH ( ~{old_price_uah} )",
         callback_data="buy:start",
     )
     if forward:
@@ -40,39 +59,92 @@ def _build_base_keyboard(config: Config, *, forward: bool, has_admin: bool) -> I
     return builder.as_markup()
 
 
+def _compile_template(template: str) -> Callable[[str, int], str]:
+    """Split ``template`` once so rendering only joins literals with username/balance."""
+    try:
+        parsed = list(Formatter().parse(template))
+    except ValueError:
+        return lambda username, balance: template
+    parts: List[Union[str, int]] = []
+    for literal, field, spec, conversion in parsed:
+        if literal:
+            parts.append(literal)
+        if field is None:
+            continue
+        if field not in _TEMPLATE_FIELDS or spec or conversion:
+            def render(username: str, balance: int) -> str:
+                try:
+                    return template.format(username=username, balance=balance)
+                except (KeyError, IndexError, AttributeError, ValueError):
+                    return template
+
+            return render
+        parts.append(_TEMPLATE_FIELDS.index(field))
+
+    def render(username: str, balance: int) -> str:
+        values = (username, str(balance))
+        return "".join(values[part] if isinstance(part, int) else part for part in parts)
+
+    return render
+
+
+def render_template(template: str, username: str, balance: int) -> str:
+    render = _templates.get(template)
+    if render is None:
+        if len(_templates) >= 16:
+            _templates.clear()
+        render = _templates[template] = _compile_template(template)
+    return render(username, balance)
+
+
 PLACEHOLDER_MAIN = base64.b64decode(
-    b"iVBORw0KGgoAAAANSUhEUgAAAEAAAABACAYAAACqaXHeAAAACXBIWXMAAAsTAAALEwEAmpwYAAABfElEQVR4nO2ZMU7DMBBF3yYxABWwAAmYwAMswASZgADIwCRmEAFWwAeSClSE37ZfgNJszc7rK3S2ens7mQkCIIgCIIgCIIgCIIgCIIg+EVp0pP7o26h1qzX9o7Z0n4W1nZp6/oiup8QeixcIo5dDS9ozJpFNGSg7LJkJXQNXmYwDQasWCNq1ayFFxHDxF/TxXdKtK63QLNXjMYawRCB7wzU1zbXsYULyy3GUOAFo01lvy7hVMy3slMfiE0eYwgWF5KnGc0KMxBMXNDfy8B95qtTZ2Tr8RhR9riFZlwwDHX+Gdg2YFydil1wNlHVpY40DZx1aVONQMcj0qs3A9U9aliGwHFPrlYtQDXP0qsrwABHHVaXOcAQx12lbnIBGHXTVucQEQx11VZzgCmUUo50eZ5m9N/w8ngn5InVZbuzrcDutvQcHBwcHBwcHBweHfwPD94DeaG5yZUFw9U5+XVuAGD+U/5rxGt2mMFuwJZmVjY2NjoHtn/v2w6QnlX3gZBGiKc2u8/55e7BymdSSGlHxMTExMTExMTExMTExUT8BHwDU70zHzK5YLIAAAAASUVORK5CYII="
+    b"iVBORw0KGgoAAAANSUhEUgAAAEAAAABACAIAAAAlC+aJAAAAT0lEQVR42u3PQQkAAAgEsItlFOMZ1Qi+hcEKLF3zWgQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQELguNKgEeSynsywAAAABJRU5ErkJggg=="
 )
 
 PLACEHOLDER_FAQ = base64.b64decode(
-    b"iVBORw0KGgoAAAANSUhEUgAAAEAAAABACAYAAACqaXHeAAAACXBIWXMAAAsTAAALEwEAmpwYAAABdUlEQVR4nO2ZMU7DMBBF30ZiAAmYgAxMgAGZgABMwABMwASZgABMwAAmYgBBsgUuux7r1iNINmdvYdV11e7f9zLy7t3twxAEARBEARBEARBEARBEEP4L7bU+sb0bOjZ9R7c6PoTrtXD9U5mQV5UhwETfFBqNqdw2Wkq5LXlBaBaG/QbFx+0oOOEtKGqXgjjCXOmkgXZRSBw1rULGT4LH7pfa+ubzmX2zMltYnmYg6Hk3bozeQmy0QlwrJHIZYbNm0FHnaowk5ElT7QLId62aZ4BNvtBpbaELbRpNoWGG1RT0HhvhT9/x5XFmHz8dzMqyKXj4cNJcBVvYFjuaYHBlN+jwHZXCHUoqE4MBG3gNVTejwGlfQn0m+djM2ulEHJRmfR65RXbQmAfk7qcSzGE97ZlpfZqL84AqLkXGR6oFV3ZL86A6rdVxkOqBVd2S+OgOK31cZDqhVXdkvjQDq21XGQqoEVXZL86A4rfVx0Mn4wfDnwJ3QoOYsKzv7cD19n4ODg4ODg4ODg8PP4PvN7+AHdjTszIpjqt2Xlp4RQNm/kf/e8xrVZV0mYBszKxsbGxs7N7c/37YdITyj/wMgTxFGZ3mfvlrsHKZ1JkaUeExMTExMTExMTExMTUxP5CeR0rjHeGy/1AAAAAElFTkSuQmCC"
+    b"iVBORw0KGgoAAAANSUhEUgAAAEAAAABACAIAAAAlC+aJAAAAT0lEQVR42u3PQQkAAAgEsItjLCMa0Qi+hcEKLNXzWgQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQEBAQELgtB7YEefKRb6AAAAABJRU5ErkJggg=="
 )
 
 
-def _build_media(path: Path, placeholder: bytes, filename: str, caption: str) -> InputMediaPhoto:
-    if path.exists():
-        return InputMediaPhoto(media=FSInputFile(path), caption=caption)
+@dataclass(slots=True)
+class MediaAsset:
+    path: Path
+    placeholder: bytes
+    filename: str
+
+
+MAIN_ASSET = MediaAsset(Path("assets/main.jpg"), PLACEHOLDER_MAIN, "main.jpg")
+FAQ_ASSET = MediaAsset(Path("assets/faq.jpg"), PLACEHOLDER_FAQ, "faq.jpg")
+
+
+def _build_media(asset: MediaAsset, caption: str, file_id: Optional[str]) -> InputMediaPhoto:
+    if file_id:
+        return InputMediaPhoto(media=file_id, caption=caption)
+    if asset.path.exists():
+        return InputMediaPhoto(media=FSInputFile(asset.path), caption=caption)
     return InputMediaPhoto(
-        media=BufferedInputFile(placeholder, filename=filename),
+        media=BufferedInputFile(asset.placeholder, filename=asset.filename),
         caption=caption,
     )
 
 
-def main_page(config: Config, content: ContentService, username: str, balance: int, has_admin: bool) -> PageData:
-    template = content.get_page_one()
-    try:
-        text = template.format(username=username, balance=balance)
-    except KeyError:
-        text = template
-    media = _build_media(Path("assets/main.jpg"), PLACEHOLDER_MAIN, "main.jpg", text)
+def main_page(
+    config: Config,
+    template: str,
+    username: str,
+    balance: int,
+    has_admin: bool,
+    file_id: Optional[str] = None,
+) -> PageData:
+    media = _build_media(MAIN_ASSET, render_template(template, username, balance), file_id)
     return PageData(
         media=media,
         reply_markup=_build_base_keyboard(config, forward=True, has_admin=has_admin),
     )
 
 
-def faq_page(config: Config, faq_text: str, has_admin: bool) -> PageData:
-    media = _build_media(Path("assets/faq.jpg"), PLACEHOLDER_FAQ, "faq.jpg", faq_text)
+def faq_page(config: Config, faq_text: str, has_admin: bool, file_id: Optional[str] = None) -> PageData:
+    media = _build_media(FAQ_ASSET, faq_text, file_id)
     return PageData(
         media=media,
         reply_markup=_build_base_keyboard(config, forward=False, has_admin=has_admin),